@@ -0,0 +1,124 @@
+"""
+JWT authentication with a per-process user cache.
+
+simplejwt's JWTAuthentication reads the user by primary key on every
+request. CachedJWTAuthentication keeps the column values of recently seen
+users in memory for AUTH_USER_CACHE_TTL seconds and builds a fresh User
+instance from them, so reads authenticate without touching the database.
+
+As with the category registry, changes go through a version key per user in
+Django's cache, bumped by the User signals: the current process drops its
+entry at once, the other workers within CHECK_INTERVAL seconds. A
+deactivated user or a changed password is therefore refused within a second
+everywhere; changes made without signals (queryset updates) wait for the TTL.
+
+Writes (any method other than GET, HEAD and OPTIONS) keep reading the user
+from the database and refresh the cache with it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.cache import _next_version
+
+CHECK_INTERVAL = 1.0
+
+
+def _version_key(user_id):
+    return f'auth-user-version:user:{user_id}'
+
+
+class UserCache:
+    def __init__(self, max_users=None):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # id utilisateur (claim du jeton, en texte) -> (version, vérifié à, chargé à, valeurs des colonnes)
+        self._users = OrderedDict()
+
+    def _instance(self, model, values):
+        # Instance neuve à chaque requête : une vue peut modifier request.user sans toucher au cache
+        return model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in model._meta.concrete_fields], values)
+
+    def get(self, model, user_id):
+        """Returns a User built from the cached values of `user_id`, or None when they must be reloaded."""
+        user_id = str(user_id)
+        now = time.monotonic()
+        entry = self._users.get(user_id)
+        if entry is None or now - entry[2] > settings.AUTH_USER_CACHE_TTL:
+            return None
+        if now - entry[1] >= CHECK_INTERVAL:
+            if cache.get(_version_key(user_id)) != entry[0]:
+                return None
+            with self._lock:
+                self._users[user_id] = (entry[0], now, entry[2], entry[3])
+        with self._lock:
+            if user_id in self._users:
+                self._users.move_to_end(user_id)
+        return self._instance(model, entry[3])
+
+    def version(self, user_id):
+        return cache.get_or_set(_version_key(user_id), _next_version, timeout=None)
+
+    def store(self, user, version):
+        """Caches `user`, read from the database after `version` was read (a later change wins)."""
+        now = time.monotonic()
+        values = [getattr(user, field.attname) for field in user._meta.concrete_fields]
+        with self._lock:
+            self._users[str(user.pk)] = (version, now, now, values)
+            self._users.move_to_end(str(user.pk))
+            max_users = self.max_users or settings.AUTH_USER_CACHE_MAX_USERS
+            while len(self._users) > max_users:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drops the user now in this process; other processes follow through the version key."""
+        key = _version_key(user_id)
+        cache.set(key, _next_version(cache.get(key)), timeout=None)
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving the user from the per-process cache on reads."""
+
+    def authenticate(self, request):
+        # Écritures : toujours l'état en base de l'utilisateur
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(self.user_model, user_id) if getattr(self, 'use_cache', False) else None
+        if user is None:
+            version = user_cache.version(user_id)
+            user = super().get_user(validated_token)
+            user_cache.store(user, version)
+            return user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
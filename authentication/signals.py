@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import user_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Tout de suite pour ce processus, puis au commit pour que les autres workers
+    # ne gardent pas une version relue avant la fin de la transaction
+    user_cache.invalidate(instance.pk)
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
@@ -1,3 +1,40 @@
-from django.test import TestCase
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from core.testing import QueryBudgetTestMixin
+from .authentication import user_cache
+from .models import User
+
+
+class CachedJWTAuthenticationTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(email='jwt@fintrack.com', username='jwt', password='x')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def profile(self, max_queries):
+        with self.assertMaxQueries(max_queries):
+            return self.client.get('/api/auth/profile/', SERVER_NAME='localhost')
+
+    def test_reads_resolve_the_user_from_the_cache(self):
+        self.assertEqual(self.profile(1).status_code, 200)
+        # Utilisateur en cache : le profil ne lit plus rien en base
+        response = self.profile(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], 'jwt@fintrack.com')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/auth/profile/', {'first_name': 'Ada'}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(1).json()['first_name'], 'Ada')
+
+    def test_deactivated_user_is_refused_at_once(self):
+        self.assertEqual(self.profile(1).status_code, 200)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['is_active'])
+
+        self.assertEqual(self.profile(1).status_code, 401)
@@ -1,8 +1,9 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Sum, Count
 from datetime import datetime, timedelta
+from core.cache import cached_response
+from core.querybudget import query_budget
 from .models import User
 from .serializers import UserSerializer, UserUpdateSerializer
 
@@ -20,40 +21,37 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return UserSerializer
 
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@cached_response('user_statistics')
 def user_statistics(request):
     """Returns user statistics and activity summary"""
-    from core.models import Account, Asset
-    from transactions.models import Transaction
+    from core.statistics import get_statistics
     
     user = request.user
     now = datetime.now()
+    # Compteurs tenus à jour à chaque écriture : une lecture par clé primaire
+    statistics = get_statistics(user)
     
     # Statistiques des comptes
     accounts_stats = {
-        'total_accounts': Account.objects.filter(user=user, is_active=True).count(),
-        'total_balance': Account.objects.filter(user=user, is_active=True).aggregate(
-            total=Sum('balance')
-        )['total'] or 0
+        'total_accounts': statistics.account_count,
+        'total_balance': statistics.balance_total
     }
     
     # Statistiques des assets
     assets_stats = {
-        'total_assets': Asset.objects.filter(user=user, is_active=True).count(),
-        'total_value': Asset.objects.filter(user=user, is_active=True).aggregate(
-            total=Sum('current_value')
-        )['total'] or 0
+        'total_assets': statistics.asset_count,
+        'total_value': statistics.asset_total
     }
     
     # Statistiques des transactions
     transactions_stats = {
-        'total_transactions': Transaction.objects.filter(user=user).count(),
-        'this_month_transactions': Transaction.objects.filter(
-            user=user,
-            date__gte=now.replace(day=1)
-        ).count(),
-        'first_transaction_date': Transaction.objects.filter(user=user).order_by('date').first().date if Transaction.objects.filter(user=user).exists() else None
+        'total_transactions': statistics.transaction_count,
+        'this_month_transactions': statistics.month_transaction_count,
+        'first_transaction_date': statistics.first_transaction_date,
+        'last_transaction_date': statistics.last_transaction_date
     }
     
     # Calculs d'activité
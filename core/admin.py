@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Account
+from .models import Category, Account, WealthSnapshot, UserStatistics
 
 
 @admin.register(Category)
@@ -16,3 +16,18 @@ class AccountAdmin(admin.ModelAdmin):
     list_filter = ['type', 'is_active', 'created_at']
     search_fields = ['name', 'user__email']
     ordering = ['user', 'name']
+
+
+@admin.register(WealthSnapshot)
+class WealthSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'assets_total', 'accounts_total', 'updated_at']
+    list_filter = ['date']
+    search_fields = ['user__email']
+    ordering = ['user', '-date']
+
+
+@admin.register(UserStatistics)
+class UserStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'account_count', 'balance_total', 'asset_count', 'asset_total', 'transaction_count', 'updated_at']
+    search_fields = ['user__email']
+    ordering = ['user']
@@ -0,0 +1,144 @@
+"""
+Async API views that run independent read queries concurrently.
+
+Django's async ORM (aget, aaggregate, ...) still runs every query through
+sync_to_async on the request's single sync thread, so asyncio.gather over it
+would execute them one after another. `gather_queries` hands each callable to
+a pool of ASYNC_QUERY_THREADS threads instead. Each thread keeps its own
+database connection, persistent under CONN_MAX_AGE and checked before and
+after use like at the end of a request, so the queries really overlap.
+
+The queries of the pool threads are counted into the request's query
+budget (`request.query_recorder`, set by QueryBudgetMiddleware): each call
+records on its own QueryRecorder, added to the request's once gathered.
+
+Connections of other threads do not see the writes of an open transaction
+(tests, atomic blocks): the callables then run in turn on the request's own
+connection, as they also do when ASYNC_CONCURRENT_QUERIES is off.
+
+`async_api_view` gives such views what DRF gives the sync ones: the API's
+authentication classes, GET only, the response cache under the user's data
+version (same keys as the sync endpoint, see cache.py) and JSON rendering.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .cache import response_cache_key, stats
+from .querybudget import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_QUERY_THREADS, thread_name_prefix='fintrack-query')
+        return _executor
+
+
+def _run_on_pool(func, recorder):
+    # Connexion propre à ce thread du pool : gardée d'une requête à l'autre selon CONN_MAX_AGE
+    close_old_connections()
+    try:
+        with connection.execute_wrapper(recorder):
+            return func()
+    finally:
+        close_old_connections()
+
+
+def _run_in_turn(calls):
+    return {name: func() for name, func in calls.items()}
+
+
+async def gather_queries(request, calls):
+    """Runs {name: callable} independent read-only callables; returns {name: result}."""
+    if not getattr(request, 'concurrent_queries', False) or len(calls) < 2:
+        return await sync_to_async(_run_in_turn)(calls)
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    recorders = [QueryRecorder() for _ in calls]
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, _run_on_pool, func, recorder)
+        for func, recorder in zip(calls.values(), recorders)
+    ))
+    request_recorder = getattr(request, 'query_recorder', None)
+    if request_recorder is not None:
+        for recorder in recorders:
+            request_recorder.add(recorder)
+    return dict(zip(calls, results))
+
+
+def _render(data, status=200, headers=None):
+    response = HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def _prepare(request, prefix):
+    """Authenticates the request and looks up the cache; returns (api request, cache key, cached data) or an error response."""
+    authenticators = [authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    api_request = Request(request, authenticators=authenticators)
+    try:
+        user = api_request.user
+    except exceptions.APIException as exc:
+        return _error(api_request, authenticators, exc)
+    if not user or not user.is_authenticated:
+        return _error(api_request, authenticators, exceptions.NotAuthenticated())
+
+    api_request.concurrent_queries = settings.ASYNC_CONCURRENT_QUERIES and not connection.in_atomic_block
+    key = response_cache_key(prefix, api_request)
+    return api_request, key, cache.get(key)
+
+
+def _error(api_request, authenticators, exc):
+    # Comme DRF : 401 avec l'en-tête WWW-Authenticate du premier authentificateur, sinon 403
+    if not authenticators:
+        return _render({'detail': exc.detail}, status=exceptions.PermissionDenied.status_code)
+    header = authenticators[0].authenticate_header(api_request)
+    return _render({'detail': exc.detail}, status=exc.status_code, headers={'WWW-Authenticate': header})
+
+
+def async_api_view(prefix, timeout=None):
+    """Turns `async def view(request) -> Response` into an authenticated, cached async GET endpoint."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return _render({'detail': f'Method "{request.method}" not allowed.'}, status=405, headers={'Allow': 'GET'})
+
+            prepared = await sync_to_async(_prepare)(request, prefix)
+            if isinstance(prepared, HttpResponse):
+                return prepared
+            api_request, key, data = prepared
+            if data is not None:
+                stats['hits'] += 1
+                logger.debug('Response cache hit: %s', key)
+                return _render(data, headers={'X-Cache': 'HIT'})
+
+            stats['misses'] += 1
+            logger.debug('Response cache miss: %s', key)
+            response = await view(api_request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+            return _render(response.data, status=response.status_code, headers={'X-Cache': 'MISS'})
+        return wrapper
+    return decorator
+
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import search, signals  # noqa: F401
+        post_migrate.connect(search.ensure_sqlite_indexes, sender=self)
@@ -0,0 +1,40 @@
+"""
+Async variant of the portfolio performance endpoint.
+
+Same response, cache entries and parameters as AssetViewSet.portfolio_performance;
+its three independent queries run concurrently (see aio.py).
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .aio import async_api_view, gather_queries
+from .views import query_dates
+from . import valuations
+
+
+@async_api_view('portfolio_performance')
+async def portfolio_performance(request):
+    """Async AssetViewSet.portfolio_performance"""
+    dates, error = query_dates(request, 'start', 'end')
+    if error:
+        return error
+    end = dates['end'] or timezone.localdate()
+    start = dates['start'] or end - timedelta(days=365)
+    if start >= end:
+        return Response({'start': 'Must be before end.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    results = await gather_queries(request, {
+        'composition': lambda: valuations.composition(user),
+        'assets': lambda: valuations.opening_values(user, start),
+        'rows': lambda: valuations.valuation_rows(user, start, end),
+    })
+    total_value, composition = results['composition']
+    return Response({
+        'total_value': total_value,
+        'composition': composition,
+        'performance': valuations.performance(user, start, end, assets=results['assets'], rows=results['rows']),
+    })
@@ -0,0 +1,102 @@
+"""
+Per-user versioned response cache.
+
+Every user has a data version stored in Django's cache. Writes to the user's
+transactions, budgets, accounts, assets or categories bump it (see the
+signals modules), and cached responses are keyed by that version, so a write
+makes every older entry unreachable without having to find and delete it.
+Default categories are shared by all users and bump a global version instead.
+
+Versions are millisecond timestamps, so they also tell when the user's data
+last changed, and a version lost on eviction never comes back with an old value.
+Inside a transaction the version is bumped again on commit, so a response
+computed by another worker from the not yet committed state under the new
+version does not outlive the commit.
+"""
+import hashlib
+import logging
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'data-version:global'
+
+# Compteurs du processus courant, exposés par /health/
+stats = Counter(hits=0, misses=0, invalidations=0)
+
+
+def _user_version_key(user_id):
+    return f'data-version:user:{user_id}'
+
+
+def _next_version(previous=None):
+    return max(int(time.time() * 1000), (previous or 0) + 1)
+
+
+def get_data_version(user_id):
+    """Returns the (user, global) data versions, initializing missing ones."""
+    user_key = _user_version_key(user_id)
+    versions = cache.get_many([user_key, GLOBAL_VERSION_KEY])
+    missing = {key: _next_version() for key in (user_key, GLOBAL_VERSION_KEY) if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions[user_key], versions[GLOBAL_VERSION_KEY]
+
+
+def _bump(key):
+    cache.set(key, _next_version(cache.get(key)), timeout=None)
+
+
+def bump_data_version(user_id=None):
+    """Invalidates the cached responses of a user, or of everybody when `user_id` is None."""
+    key = GLOBAL_VERSION_KEY if user_id is None else _user_version_key(user_id)
+    # Tout de suite pour ce processus, puis au commit pour que les autres workers
+    # ne gardent pas une réponse calculée avant la fin de la transaction
+    _bump(key)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(key))
+    stats['invalidations'] += 1
+    logger.debug('Response cache invalidated for %s', 'all users' if user_id is None else f'user {user_id}')
+
+
+def response_cache_key(prefix, request):
+    user_version, global_version = get_data_version(request.user.pk)
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return f'response:{prefix}:{request.user.pk}:{user_version}.{global_version}:{digest}'
+
+
+def cached_response(prefix, timeout=None):
+    """Caches the data of a successful GET response under the user's data version."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = response_cache_key(prefix, request)
+            data = cache.get(key)
+            if data is not None:
+                stats['hits'] += 1
+                logger.debug('Response cache hit: %s', key)
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            stats['misses'] += 1
+            logger.debug('Response cache miss: %s', key)
+            response = view(*args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,88 @@
+"""
+Conditional GET support (ETag / If-None-Match, Last-Modified / If-Modified-Since).
+
+Validators come from the per-user data version of core.cache, so they cost a
+cache read and no query. The check runs in `initial()`, right after
+authentication, and answers 304 before the queryset is evaluated or anything
+is serialized. Validators also change at local midnight, because several
+actions (dashboard, budgets) depend on the current date.
+
+HTTP dates have a one second resolution: Last-Modified is the version rounded
+up to the next second, and is only sent once that second is over, so a later
+write always moves it forward.
+"""
+import hashlib
+import math
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_data_version
+
+
+class NotModified(Exception):
+    pass
+
+
+def compute_validators(request):
+    """Returns the (etag, last_modified timestamp) of a GET request."""
+    user_version, global_version = get_data_version(request.user.pk)
+    today = timezone.localdate()
+    renderer = getattr(request, 'accepted_renderer', None)
+    source = ':'.join([
+        str(request.user.pk),
+        f'{user_version}.{global_version}',
+        today.isoformat(),
+        getattr(renderer, 'format', '') or '',
+        request.get_full_path(),
+    ])
+    etag = 'W/' + quote_etag(hashlib.md5(source.encode()).hexdigest())
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min)).timestamp()
+    last_modified = math.ceil(max(user_version / 1000, global_version / 1000, start_of_day))
+    return etag, last_modified
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        candidates = {_strip_weak(tag.strip()) for tag in if_none_match.split(',')}
+        return '*' in candidates or _strip_weak(etag) in candidates
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+class ConditionalRequestMixin:
+    """Answers 304 Not Modified to GET/HEAD requests whose validators still match."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method in ('GET', 'HEAD') and request.user.is_authenticated:
+            self.validators = compute_validators(request)
+            if is_not_modified(request, *self.validators):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            # Seconde en cours : une autre écriture pourrait encore donner la même date
+            if last_modified <= timezone.now().timestamp():
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Authorization'])
+        return response
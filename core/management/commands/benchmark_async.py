@@ -0,0 +1,126 @@
+import asyncio
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import async_views as core_async_views
+from core.cache import bump_data_version
+from core.views import AssetViewSet
+from transactions import async_views
+from transactions.views import TransactionViewSet
+
+User = get_user_model()
+
+ENDPOINTS = [
+    ('dashboard_stats', '/api/transactions/dashboard_stats/',
+     TransactionViewSet.as_view({'get': 'dashboard_stats'}), async_views.dashboard_stats),
+    ('analytics', '/api/transactions/analytics/',
+     TransactionViewSet.as_view({'get': 'analytics'}), async_views.analytics),
+    ('portfolio_performance', '/api/assets/portfolio_performance/',
+     AssetViewSet.as_view({'get': 'portfolio_performance'}), core_async_views.portfolio_performance),
+]
+
+
+def _percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Compare the latency of the sync and async dashboard, analytics and portfolio endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user whose data is served (defaults to the first user)')
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per endpoint and mode')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Simulated network round trip added to every query, in milliseconds')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} not found")
+        else:
+            user = User.objects.order_by('pk').first()
+            if not user:
+                raise CommandError('No user to benchmark')
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        if options['latency']:
+            self.simulate_latency(options['latency'] / 1000)
+
+        factory = RequestFactory()
+        authorization = f'Bearer {AccessToken.for_user(user)}'
+
+        def request(path):
+            # Cache des réponses invalidé : chaque requête recalcule ses chiffres
+            bump_data_version(user.pk)
+            return factory.get(path, HTTP_AUTHORIZATION=authorization)
+
+        self.stdout.write(f'{user.email}, {options["iterations"]} requests per endpoint and mode, '
+                          f'{options["latency"]:g} ms per query')
+        self.stdout.write(f'{"endpoint":<24}{"mode":<20}{"median ms":>10}{"p95 ms":>10}')
+        for name, path, sync_view, async_view in ENDPOINTS:
+            sync_view(request(path))  # échauffement : connexions, registres en mémoire
+            medians = {}
+            for mode, timings in [
+                ('sync', self.time_sync(sync_view, lambda: request(path), options['iterations'])),
+                ('async, in turn', self.time_async(async_view, lambda: request(path), options['iterations'], False)),
+                ('async, concurrent', self.time_async(async_view, lambda: request(path), options['iterations'], True)),
+            ]:
+                medians[mode] = statistics.median(timings)
+                self.stdout.write(f'{name:<24}{mode:<20}{medians[mode]:>10.1f}{_percentile(timings, 0.95):>10.1f}')
+            speedup = medians['sync'] / medians['async, concurrent'] if medians['async, concurrent'] else 0
+            self.stdout.write(f'{"":<24}{"speedup":<20}{speedup:>9.2f}x')
+
+        self.stdout.write(self.style.SUCCESS('Successfully benchmarked the async endpoints'))
+
+    def simulate_latency(self, seconds):
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        # Chaque thread (pool des vues async compris) a sa connexion : ajouté à leur ouverture
+        connection_created.connect(add_delay, weak=False)
+        add_delay(None, connection)
+
+    def time_sync(self, view, make_request, iterations):
+        timings = []
+        for _ in range(iterations):
+            request = make_request()
+            started = time.perf_counter()
+            response = view(request)
+            timings.append((time.perf_counter() - started) * 1000)
+            self.check_response(response)
+        return timings
+
+    def time_async(self, view, make_request, iterations, concurrent):
+        async def run():
+            timings = []
+            for _ in range(iterations):
+                request = make_request()
+                started = time.perf_counter()
+                response = await view(request)
+                timings.append((time.perf_counter() - started) * 1000)
+                self.check_response(response)
+            return timings
+
+        with override_settings(ASYNC_CONCURRENT_QUERIES=concurrent):
+            return asyncio.run(run())
+
+    def check_response(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'Endpoint answered {response.status_code}')
+        if response.get('X-Cache') != 'MISS':
+            raise CommandError('Response served from the cache')
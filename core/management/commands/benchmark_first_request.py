@@ -0,0 +1,100 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+from argparse import SUPPRESS
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+PATHS = ['/api/categories/', '/api/transactions/', '/api/transactions/dashboard_stats/']
+
+
+class Command(BaseCommand):
+    help = 'Compare the first-request latency of a fresh process with and without warm-up'
+    # Pas de checks : ils importeraient l'URLconf et fausseraient la mesure à froid
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user making the requests (defaults to the first user)')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per endpoint and mode')
+        parser.add_argument('--path', action='append', help='Endpoint to request (repeatable)')
+        parser.add_argument('--child', choices=['cold', 'warm'], help=SUPPRESS)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} not found")
+        else:
+            user = User.objects.order_by('pk').first()
+            if not user:
+                raise CommandError('No user to benchmark')
+
+        if options['child']:
+            self.stdout.write(json.dumps(self.first_requests(user, options['child'], options['path'][0])))
+            return
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+
+        self.stdout.write(f'{user.email}, {options["runs"]} fresh processes per endpoint and mode')
+        self.stdout.write(f'{"endpoint":<38}{"mode":<6}{"warm-up ms":>12}{"1st ms":>10}{"2nd ms":>10}')
+        for path in options['path'] or PATHS:
+            firsts = {}
+            for mode in ('cold', 'warm'):
+                runs = [self.spawn(user, mode, path) for _ in range(options['runs'])]
+                firsts[mode] = statistics.median(run['first'] for run in runs)
+                warm_up = statistics.median(run['warm_up'] for run in runs)
+                second = statistics.median(run['second'] for run in runs)
+                self.stdout.write(f'{path:<38}{mode:<6}{warm_up:>12.1f}{firsts[mode]:>10.1f}{second:>10.1f}')
+            speedup = firsts['cold'] / firsts['warm'] if firsts['warm'] else 0
+            self.stdout.write(f'{"":<38}{"speedup":<18}{speedup:>9.2f}x')
+
+        self.stdout.write(self.style.SUCCESS('Successfully benchmarked the first requests'))
+
+    def spawn(self, user, mode, path):
+        """Runs the requests in a fresh process, as a newly forked worker would."""
+        from core.cache import bump_data_version
+        # Cache des réponses invalidé : la première requête calcule sa réponse
+        bump_data_version(user.pk)
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_first_request',
+                   '--user', user.email, '--child', mode, '--path', path]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f'Benchmark process failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def first_requests(self, user, mode, path):
+        """Times the first two requests of this process, after warm-up in `warm` mode."""
+        from django.db import connections
+        from django.test import Client, override_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        # Comme un worker : middlewares chargés avec l'application, connexions fermées au fork
+        client.handler.load_middleware()
+        connections.close_all()
+
+        warm_up = 0
+        if mode == 'warm':
+            from core.warmup import warm_up as run_warm_up
+            warm_up = run_warm_up()['seconds'] * 1000
+
+        def timed_get():
+            started = time.perf_counter()
+            response = client.get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{path} answered {response.status_code}')
+            return elapsed
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            first = timed_get()
+            # Importé après la première requête, pour ne rien préchauffer
+            from core.cache import bump_data_version
+            bump_data_version(user.pk)
+            second = timed_get()
+        return {'warm_up': warm_up, 'first': first, 'second': second}
@@ -0,0 +1,177 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core import snapshots, valuations
+from core.models import Account
+from transactions import ledger
+from transactions.analytics import AnalyticsEngine
+from transactions.budgets import BudgetEngine
+from transactions.dashboard import DashboardEngine
+from transactions.models import Transaction
+from transactions.pagination import TransactionKeysetPagination
+
+User = get_user_model()
+
+TRANSACTION = 'transactions_transaction'
+ROLLUP = 'transactions_monthlyrollup'
+
+
+class SelectRecorder:
+    """Execute wrapper keeping the SELECT statements (SQL and parameters) run by a hot path."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def transaction_pages(user):
+    """First two pages of the transaction list in cursor mode, as the view paginates them."""
+    factory = APIRequestFactory()
+    queryset = Transaction.objects.filter(user=user).select_related('category', 'account')
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        paginator = TransactionKeysetPagination()
+        paginator.paginate_queryset(queryset, Request(factory.get('/api/transactions/', {'pagination': 'cursor'})))
+        next_link = paginator.get_next_link()
+        if next_link:
+            TransactionKeysetPagination().paginate_queryset(queryset, Request(factory.get(next_link)))
+
+
+def hot_paths(user, account):
+    """(name, code run, {table: expected index}) of the hot endpoints, calling the code they call."""
+    today = timezone.localdate()
+    dashboard = DashboardEngine(user)
+    analytics = AnalyticsEngine(user)
+    budgets = BudgetEngine(user)
+    indexes = {
+        'month_totals': {ROLLUP: 'rollup_user_month_idx'},
+        'asset_total': {'core_asset': 'asset_user_active_value_idx'},
+        'account_total': {'core_account': 'account_user_active_idx'},
+        'wealth_snapshots': {'core_wealthsnapshot': None},
+        'asset_values': {'core_asset': 'asset_user_active_value_idx'},
+        'grouped_totals': {ROLLUP: 'rollup_user_month_idx'},
+        'biggest_expense': {TRANSACTION: 'txn_user_day_type_idx'},
+    }
+    paths = [('transactions.list.cursor', lambda: transaction_pages(user), {TRANSACTION: 'txn_user_keyset_idx'})]
+    paths += [(f'dashboard.{name}', getattr(dashboard, name), indexes[name]) for name in DashboardEngine.QUERIES]
+    paths += [(f'analytics.{name}', getattr(analytics, name), indexes[name]) for name in AnalyticsEngine.QUERIES]
+    paths += [
+        ('budgets.evaluate', budgets.evaluate,
+         {'transactions_budget': 'budget_user_active_idx', ROLLUP: 'rollup_user_month_idx'}),
+        # Trié par pk : n'importe quel index sur user convient
+        ('assets.opening_values', lambda: valuations.opening_values(user, today - timedelta(days=365)),
+         {'core_asset': None}),
+        ('assets.valuation_rows', lambda: valuations.valuation_rows(user, today - timedelta(days=365), today),
+         {'core_assetvaluation': 'valuation_user_date_idx'}),
+        ('snapshots.monthly_series', lambda: snapshots.monthly_series(user, today.replace(day=1)),
+         {'core_wealthsnapshot': None}),
+    ]
+    if account is not None:
+        paths += [
+            ('accounts.balance_at', lambda: ledger.balance_at(account, today), {TRANSACTION: 'txn_account_keyset_idx'}),
+            ('accounts.balance_history', lambda: ledger.daily_balances(account, today - timedelta(days=30), today),
+             {TRANSACTION: 'txn_account_keyset_idx'}),
+        ]
+    return paths
+
+
+def explain(sql, params, vendor):
+    prefix = 'EXPLAIN QUERY PLAN' if vendor == 'sqlite' else 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def analyze_plan(plan, table, vendor):
+    """Returns (full scans, sorts) found in an EXPLAIN output."""
+    full_scans, sorts = [], []
+    for line in plan.splitlines():
+        text = line.strip()
+        if vendor == 'sqlite':
+            if 'SCAN ' in text and 'USING' not in text and f'SCAN {table}' in text:
+                full_scans.append(text)
+            if 'TEMP B-TREE' in text:
+                sorts.append(text)
+        else:
+            if 'Seq Scan on' in text and f' {table}' in text:
+                full_scans.append(text)
+            if text.lstrip('-> ').startswith('Sort'):
+                sorts.append(text)
+    return full_scans, sorts
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the queries behind the hot endpoints and check they use their indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user whose data is explained (defaults to the first user)')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Unsupported database vendor: {vendor}')
+
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if not user:
+                raise CommandError(f"User {options['user']} not found")
+        else:
+            user = User.objects.order_by('pk').first()
+            if not user:
+                raise CommandError('No user to explain')
+        account = Account.objects.filter(user=user).order_by('pk').first()
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Juger la disponibilité d'un index, pas le choix du planner sur une petite table
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, run, expected in hot_paths(user, account):
+                # Les requêtes exécutées par le vrai code, puis expliquées une à une
+                recorder = SelectRecorder()
+                with connection.execute_wrapper(recorder):
+                    run()
+                plans = [explain(sql, params, vendor) for sql, params in recorder.queries]
+
+                problems, notes = [], []
+                for table, expected_index in expected.items():
+                    table_plans = [plan for plan in plans if table in plan]
+                    if not table_plans:
+                        # Rien à lire pour cet utilisateur (pas de budget, pas de compte...)
+                        notes.append(f'no query on {table} for this user')
+                        continue
+                    if expected_index is not None and not any(expected_index in plan for plan in table_plans):
+                        problems.append(f'index {expected_index} not used')
+                    for plan in table_plans:
+                        full_scans, plan_sorts = analyze_plan(plan, table, vendor)
+                        problems += [f'full scan: {line}' for line in full_scans]
+                        notes += [f'sort: {line}' for line in plan_sorts]
+
+                if problems:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'✗ {name}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name}'))
+                for line in problems:
+                    self.stdout.write(f'    {line}')
+                for line in notes:
+                    self.stdout.write(self.style.WARNING(f'    {line}'))
+                if options['verbosity'] > 1:
+                    for plan in plans:
+                        for line in plan.splitlines():
+                            self.stdout.write(f'      {line}')
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries lost their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All hot queries use their indexes'))
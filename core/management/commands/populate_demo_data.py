@@ -2,7 +2,8 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from django.db.models import Sum
 from core.models import Category, Account, CategoryType, AccountType, Asset, AssetType
-from transactions.models import Transaction, Budget, BudgetPeriod
+from transactions.models import Transaction, Budget, BudgetPeriod, RecurrenceFrequency, RecurringSchedule
+from transactions import recurring
 from datetime import datetime, timedelta, date
 from decimal import Decimal
 import random
@@ -118,36 +119,22 @@ class Command(BaseCommand):
             },
         ]
         
-        # Générer transactions récurrentes
-        current_date = start_date
-        while current_date <= end_date:
-            for trans_data in recurring_transactions:
-                transaction_date = current_date.replace(day=min(current_date.day, 28))
-                # Vérifier si la transaction récurrente existe déjà
-                if not Transaction.objects.filter(
-                    date=transaction_date,
-                    description=trans_data['description'],
-                    amount=trans_data['amount'],
-                    user=demo_user,
-                    is_recurring=True
-                ).exists():
-                    Transaction.objects.create(
-                        amount=trans_data['amount'],
-                        date=transaction_date,
-                        description=trans_data['description'],
-                        category=trans_data['category'],
-                        account=trans_data['account'],
-                        user=demo_user,
-                        is_recurring=trans_data['is_recurring'],
-                        metadata={'frequency': trans_data['frequency']}
-                    )
-                    transactions_created += 1
-            
-            # Passer au mois suivant
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
+        # Générer transactions récurrentes : un échéancier par transaction, occurrences créées en lot
+        first_date = start_date.date().replace(day=min(start_date.day, 28))
+        for trans_data in recurring_transactions:
+            RecurringSchedule.objects.get_or_create(
+                user=demo_user,
+                description=trans_data['description'],
+                defaults={
+                    'account': trans_data['account'],
+                    'category': trans_data['category'],
+                    'amount': trans_data['amount'],
+                    'frequency': RecurrenceFrequency(trans_data['frequency'].upper()),
+                    'start_date': first_date,
+                }
+            )
+        created, _ = recurring.run(until=end_date.date(), users=User.objects.filter(pk=demo_user.pk))
+        transactions_created += created
         
         # 5. Ajouter des transactions spécifiques pour les 30 derniers jours (juin-juillet 2025)
         # Récupérer les catégories par nom pour être sûr
@@ -323,6 +310,13 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'✓ {transactions_created} transactions created'))
         
+        # Les transactions ont fait bouger les soldes : remettre les soldes affichés
+        # (le solde d'ouverture absorbe la différence)
+        for acc_data in accounts_data:
+            account = Account.objects.get(name=acc_data['name'], user=demo_user)
+            account.balance = acc_data['balance']
+            account.save()
+        
         # 6. Créer des budgets (données identiques à l'app mobile)
         budgets_data = [
             {'category': expense_categories[0], 'limit': 600.00},  # Alimentation
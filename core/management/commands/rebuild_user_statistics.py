@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from core import statistics
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user statistics counters from accounts, assets and transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the statistics of this user email')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['user']:
+            users = User.objects.filter(email=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f"User {options['user']} not found"))
+                return
+
+        written = statistics.rebuild(users=users)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {written} user statistics rows'))
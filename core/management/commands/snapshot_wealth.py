@@ -0,0 +1,22 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Record the daily net worth snapshot of every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Snapshot date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users processed per batch')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        written = snapshots.take_snapshots(day=day, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully recorded {written} wealth snapshots'))
@@ -0,0 +1,94 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .querybudget import QueryRecorder, get_query_budget
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+def _attach(recorder):
+    connection.execute_wrappers.append(recorder)
+
+
+def _detach(recorder):
+    connection.execute_wrappers.remove(recorder)
+
+
+class QueryBudgetMiddleware:
+    """Counts the SQL queries of each request and logs the ones over their view's budget.
+
+    The body of a streaming response runs its queries after the view has
+    returned: they are counted while the body is consumed, and the budget is
+    checked once it is done (the headers only report the queries of the view).
+
+    Under ASGI the ORM runs on the request's sync thread, where the recorder
+    is attached; the queries that core.aio.gather_queries runs on its pool
+    threads are added through `request.query_recorder`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = request.query_recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        return self.finish(request, recorder, response)
+
+    async def __acall__(self, request):
+        recorder = request.query_recorder = QueryRecorder()
+        # Connexions par thread : le compteur se branche sur celle du thread sync de la requête
+        await sync_to_async(_attach)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_detach)(recorder)
+        return self.finish(request, recorder, response)
+
+    def finish(self, request, recorder, response):
+        if settings.QUERY_BUDGET_HEADERS:
+            response['X-DB-Queries'] = str(recorder.count)
+            response['X-DB-Time'] = f'{recorder.duration * 1000:.1f}'
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.record_stream(request, recorder, response.streaming_content)
+        else:
+            self.check_budget(request, recorder)
+        return response
+
+    def record_stream(self, request, recorder, content):
+        iterator = iter(content)
+        try:
+            while True:
+                with connection.execute_wrapper(recorder):
+                    chunk = next(iterator, _END)
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            self.check_budget(request, recorder)
+
+    def check_budget(self, request, recorder):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return
+        budget = get_query_budget(match.func, request.method)
+        if budget is not None and recorder.count > budget:
+            repeated = '; '.join(
+                f'{count}x {shape[:300]}' for shape, count in recorder.repeated_shapes()
+            )
+            logger.warning(
+                'Query budget exceeded: %s %s ran %d queries (budget %d) in %.1f ms. Repeated: %s',
+                request.method, request.path, recorder.count, budget,
+                recorder.duration * 1000, repeated or 'none',
+            )
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def snapshot_existing_users(apps, schema_editor):
+    Account = apps.get_model('core', 'Account')
+    Asset = apps.get_model('core', 'Asset')
+    WealthSnapshot = apps.get_model('core', 'WealthSnapshot')
+
+    def totals(model, field):
+        rows = model.objects.filter(is_active=True).values('user_id').annotate(total=Sum(field)).order_by()
+        return {row['user_id']: row['total'] for row in rows}
+
+    assets = totals(Asset, 'current_value')
+    accounts = totals(Account, 'balance')
+    today = timezone.localdate()
+    WealthSnapshot.objects.bulk_create([
+        WealthSnapshot(
+            user_id=user_id,
+            date=today,
+            assets_total=assets.get(user_id) or 0,
+            accounts_total=accounts.get(user_id) or 0,
+        )
+        for user_id in set(assets) | set(accounts)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_asset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WealthSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('assets_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('accounts_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(snapshot_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_wealthsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='account_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-current_value'], name='asset_user_active_value_idx'),
+        ),
+    ]
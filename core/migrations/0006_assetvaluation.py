@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_valuations(apps, schema_editor):
+    # Point de départ de l'historique : prix d'achat à la date d'achat, valeur actuelle aujourd'hui
+    Asset = apps.get_model('core', 'Asset')
+    AssetValuation = apps.get_model('core', 'AssetValuation')
+    today = timezone.localdate()
+    valuations = []
+    for asset in Asset.objects.order_by('pk').iterator(chunk_size=2000):
+        if asset.purchase_price and asset.purchase_date and asset.purchase_date < today:
+            valuations.append(AssetValuation(
+                asset_id=asset.pk, user_id=asset.user_id, date=asset.purchase_date, value=asset.purchase_price
+            ))
+        valuations.append(AssetValuation(asset_id=asset.pk, user_id=asset.user_id, date=today, value=asset.current_value))
+    AssetValuation.objects.bulk_create(valuations, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_account_opening_balance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='core.asset')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['user', 'date'], name='valuation_user_date_idx')],
+                'unique_together': {('asset', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_valuations, migrations.RunPython.noop),
+    ]
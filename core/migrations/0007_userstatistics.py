@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('core', '0006_assetvaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatistics',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('account_count', models.IntegerField(default=0, help_text='Active accounts')),
+                ('balance_total', models.DecimalField(decimal_places=2, default=0, help_text='Balance of active accounts', max_digits=14)),
+                ('asset_count', models.IntegerField(default=0, help_text='Active assets')),
+                ('asset_total', models.DecimalField(decimal_places=2, default=0, help_text='Value of active assets', max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('month', models.DateField(blank=True, help_text='Local month counted by month_transaction_count', null=True)),
+                ('month_transaction_count', models.IntegerField(default=0)),
+                ('first_transaction_date', models.DateTimeField(blank=True, null=True)),
+                ('last_transaction_date', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'User statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from core import search
+
+
+def create_search_index(apps, schema_editor):
+    # Configuration française sans accents (PostgreSQL), puis index plein texte des actifs
+    search.create_text_search_config(schema_editor)
+    search.create_index(schema_editor, 'core_asset', [('name', 'A'), ('description', 'B')])
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor, 'core_asset')
+    search.drop_text_search_config(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_userstatistics'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -30,6 +32,15 @@ class Category(models.Model):
         
     def __str__(self):
         return f"{self.name} ({self.type})"
+    
+    def is_used(self):
+        """Whether transactions or budgets use the category (its type is then fixed)."""
+        return self.transaction_set.exists() or self.budget_set.exists()
+    
+    def clean(self):
+        # Les montants sont signés selon le type : on ne le change pas sous des transactions existantes
+        if self.pk and Category.objects.filter(pk=self.pk).exclude(type=self.type).exists() and self.is_used():
+            raise ValidationError({'type': "Cannot change the type of a category used by transactions or budgets."})
 
 
 class AccountType(models.TextChoices):
@@ -42,7 +53,9 @@ class AccountType(models.TextChoices):
 
 class Account(models.Model):
     name = models.CharField(max_length=100)
+    # balance = opening_balance + somme des transactions, tenu à jour par transactions/ledger.py
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    opening_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     type = models.CharField(max_length=15, choices=AccountType.choices)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
@@ -51,9 +64,46 @@ class Account(models.Model):
     
     class Meta:
         unique_together = ['name', 'user']
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_active=True), name='account_user_active_idx'),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.user.email})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_balance = instance.__dict__.get('balance')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """A balance set by hand corrects the opening balance; otherwise the stored balance is never rewritten."""
+        if self._state.adding:
+            self.opening_balance = self.balance
+            super().save(*args, **kwargs)
+            self._loaded_balance = self.balance
+            return
+        
+        loaded = getattr(self, '_loaded_balance', None)
+        self.balance = self._meta.get_field('balance').to_python(self.balance)
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        # Le solde peut avoir bougé en base depuis le chargement (transactions) : ne pas l'écraser
+        update_fields = [name for name in update_fields if name not in ('balance', 'opening_balance')] or ['updated_at']
+        with transaction.atomic():
+            if loaded is not None and self.balance != loaded:
+                delta = self.balance - loaded
+                Account.objects.filter(pk=self.pk).update(
+                    balance=F('balance') + delta,
+                    opening_balance=F('opening_balance') + delta,
+                )
+                self.balance, self.opening_balance = Account.objects.values_list(
+                    'balance', 'opening_balance'
+                ).get(pk=self.pk)
+            self._loaded_balance = self.balance
+            super().save(*args, update_fields=update_fields, **kwargs)
 
 
 class AssetType(models.TextChoices):
@@ -95,6 +145,13 @@ class Asset(models.Model):
     class Meta:
         unique_together = ['name', 'user']
         ordering = ['-current_value']
+        indexes = [
+            models.Index(
+                fields=['user', '-current_value'],
+                condition=models.Q(is_active=True),
+                name='asset_user_active_value_idx',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.asset_type}) - €{self.current_value}"
@@ -110,3 +167,64 @@ class Asset(models.Model):
         if self.purchase_price and self.purchase_price > 0:
             return ((self.current_value - self.purchase_price) / self.purchase_price) * 100
         return None
+
+
+class AssetValuation(models.Model):
+    """Value of an asset on a day; the latest one matches Asset.current_value."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='valuations')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    date = models.DateField()
+    value = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['asset', 'date']
+        ordering = ['date']
+        indexes = [
+            # Valorisations d'un utilisateur sur une fenêtre (performance du portefeuille)
+            models.Index(fields=['user', 'date'], name='valuation_user_date_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.asset_id} {self.date}: €{self.value}"
+
+
+class WealthSnapshot(models.Model):
+    """Daily net worth of a user, split between asset values and account balances."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    date = models.DateField()
+    assets_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    accounts_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['date']
+        
+    def __str__(self):
+        return f"{self.user_id} {self.date}: €{self.total}"
+    
+    @property
+    def total(self):
+        return self.assets_total + self.accounts_total
+
+
+class UserStatistics(models.Model):
+    """Per-user counters behind the profile statistics, maintained from writes (see core/statistics.py)."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    account_count = models.IntegerField(default=0, help_text="Active accounts")
+    balance_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Balance of active accounts")
+    asset_count = models.IntegerField(default=0, help_text="Active assets")
+    asset_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Value of active assets")
+    transaction_count = models.IntegerField(default=0)
+    month = models.DateField(null=True, blank=True, help_text="Local month counted by month_transaction_count")
+    month_transaction_count = models.IntegerField(default=0)
+    first_transaction_date = models.DateTimeField(null=True, blank=True)
+    last_transaction_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "User statistics"
+        
+    def __str__(self):
+        return f"{self.user_id}: {self.transaction_count} transactions, {self.account_count} accounts"
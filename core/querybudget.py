@@ -0,0 +1,70 @@
+"""
+Per-request SQL query accounting.
+
+`QueryRecorder` is a database execute wrapper that counts and times queries
+and groups them by shape (the SQL with its literals replaced by `?`), which
+makes N+1 patterns stand out. The middleware and the test helper both build
+on it.
+
+Views declare their budget with a `query_budgets` dict on the view class,
+keyed by action name (`list`, `retrieve`, `overview`, ...), or with the
+`query_budget` decorator for function views. Anything else falls back to
+QUERY_BUDGET_DEFAULT. A budget of None disables the check (work proportional
+to the input, like statement imports).
+"""
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def sql_shape(sql):
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql).replace('%s', '?'))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def add(self, other):
+        """Adds the queries counted by another recorder (a pool thread of the same request)."""
+        self.count += other.count
+        self.duration += other.duration
+        self.shapes.update(other.shapes)
+
+    def repeated_shapes(self, limit=3):
+        return [(shape, count) for shape, count in self.shapes.most_common(limit) if count > 1]
+
+
+def query_budget(limit):
+    """Declares the query budget of a function view (place it above @api_view)."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view_func, method):
+    """Returns the budget declared for the view handling a request."""
+    if hasattr(view_func, 'query_budget'):
+        return view_func.query_budget
+    view_class = getattr(view_func, 'cls', None)
+    budgets = getattr(view_class, 'query_budgets', None) or {}
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return budgets.get(action, settings.QUERY_BUDGET_DEFAULT)
@@ -0,0 +1,130 @@
+"""
+Per-process category registry.
+
+Holds the default categories and, per user, the user's own categories as
+`CategoryInfo` tuples keyed by id, so the hot paths (sign rule, serializer
+validation, rollups, category list) stop querying core_category.
+
+Coherence across worker processes goes through version keys in Django's
+cache, bumped on commit by the Category signals. A process re-reads a version
+at most every CHECK_INTERVAL seconds, and at once when a lookup misses, so a
+category created by another worker is found immediately and a change made
+elsewhere is seen within a second. Changes made by the current process are
+visible immediately.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import _next_version
+
+CategoryInfo = namedtuple('CategoryInfo', 'id name type color icon user_id is_default created_at')
+
+DEFAULTS_SCOPE = None
+CHECK_INTERVAL = 1.0
+
+
+def _version_key(scope):
+    if scope is DEFAULTS_SCOPE:
+        return 'category-version:defaults'
+    return f'category-version:user:{scope}'
+
+
+class CategoryRegistry:
+    def __init__(self, max_users=None):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # scope (DEFAULTS_SCOPE ou id utilisateur) -> (version, vérifié à, {id: CategoryInfo})
+        self._scopes = OrderedDict()
+
+    def _load(self, scope):
+        from .models import Category
+        queryset = Category.objects.filter(user_id=scope) if scope is not DEFAULTS_SCOPE else Category.objects.filter(user__isnull=True)
+        return {row['id']: CategoryInfo(**row) for row in queryset.values(*CategoryInfo._fields)}
+
+    def _categories(self, scope, force=False):
+        now = time.monotonic()
+        entry = self._scopes.get(scope)
+        if entry is not None and not force and now - entry[1] < CHECK_INTERVAL:
+            return entry[2]
+
+        version = cache.get_or_set(_version_key(scope), _next_version, timeout=None)
+        if entry is not None and entry[0] == version:
+            categories = entry[2]
+        else:
+            categories = self._load(scope)
+
+        with self._lock:
+            self._scopes[scope] = (version, now, categories)
+            self._scopes.move_to_end(scope)
+            self._trim()
+        return categories
+
+    def _trim(self):
+        max_users = self.max_users or settings.CATEGORY_REGISTRY_MAX_USERS
+        while len(self._scopes) > max_users + 1:
+            oldest = next(iter(self._scopes))
+            if oldest is DEFAULTS_SCOPE:
+                self._scopes.move_to_end(oldest)
+                continue
+            del self._scopes[oldest]
+
+    def preload(self, user_ids=()):
+        """Loads the default categories and those of `user_ids` in one query each; returns the number of users loaded."""
+        from .models import Category
+        self._categories(DEFAULTS_SCOPE, force=True)
+        user_ids = list(dict.fromkeys(user_ids))[:self.max_users or settings.CATEGORY_REGISTRY_MAX_USERS]
+        if not user_ids:
+            return 0
+
+        # Versions lues avant les catégories : une modification concurrente l'emporte
+        keys = {user_id: _version_key(user_id) for user_id in user_ids}
+        versions = cache.get_many(keys.values())
+        missing = {key: _next_version() for key in keys.values() if key not in versions}
+        if missing:
+            cache.set_many(missing, timeout=None)
+            versions.update(missing)
+
+        categories = {user_id: {} for user_id in user_ids}
+        for row in Category.objects.filter(user_id__in=user_ids).values(*CategoryInfo._fields):
+            categories[row['user_id']][row['id']] = CategoryInfo(**row)
+
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                self._scopes[user_id] = (versions[keys[user_id]], now, categories[user_id])
+                self._scopes.move_to_end(user_id)
+            self._trim()
+        return len(user_ids)
+
+    def get(self, category_id, user_id=None):
+        """Returns the CategoryInfo of a default category or of one of the user's categories, else None."""
+        for force in (False, True):
+            info = self._categories(DEFAULTS_SCOPE, force).get(category_id)
+            if info is None and user_id is not None:
+                info = self._categories(user_id, force).get(category_id)
+            if info is not None:
+                return info
+        return None
+
+    def visible(self, user_id):
+        """Returns the categories offered to a user: default ones and their own."""
+        defaults = [info for info in self._categories(DEFAULTS_SCOPE).values() if info.is_default]
+        return defaults + list(self._categories(user_id).values())
+
+    def invalidate(self, user_id=None):
+        """Called once a category change is committed; `user_id` None means the default categories."""
+        key = _version_key(user_id)
+        cache.set(key, _next_version(cache.get(key)), timeout=None)
+        with self._lock:
+            self._scopes.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+
+registry = CategoryRegistry()
@@ -0,0 +1,222 @@
+"""
+Full-text search behind the `?search=` parameter.
+
+Searched text is indexed per model (FULL_TEXT_INDEXES, column -> weight):
+
+- PostgreSQL: a generated `search_vector` tsvector column with a GIN index,
+  built with the `fintrack_french` text search configuration (French
+  stemming, accents folded by `unaccent`). Matches use `@@` on the index and
+  are ranked with ts_rank.
+- SQLite (local runs, tests): an FTS5 external-content table
+  `<table>_fts` (unicode61 tokenizer, diacritics removed) kept in sync by
+  triggers, so bulk_create and queryset updates are indexed too. Matches are
+  ranked with bm25 using the same weights. FTS5 has no French stemmer: every
+  term is matched as a prefix instead.
+
+Other backends keep DRF's SearchFilter (ICONTAINS on `search_fields`).
+Each search term is a prefix (search as you type) and all terms must match.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+TEXT_SEARCH_CONFIG = 'fintrack_french'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+MAX_SEARCH_TERMS = 10
+
+FULL_TEXT_INDEXES = {
+    'transactions.Transaction': [('description', 'A')],
+    'core.Asset': [('name', 'A'), ('description', 'B')],
+}
+
+# Poids par défaut de ts_rank (D, C, B, A), repris pour bm25 sous SQLite
+RANK_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+_TERMS = re.compile(r'\w+')
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def _install_postgresql(schema_editor, table, columns):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector '
+        f'GENERATED ALWAYS AS ({vector}) STORED'
+    )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING gin ({SEARCH_VECTOR_COLUMN})'
+    )
+
+
+def _install_sqlite(cursor, table, columns):
+    """Creates the FTS5 table and its triggers if missing; returns True when something was created."""
+    fts = fts_table(table)
+    names = ', '.join(column for column, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _ in columns)
+    statements = {
+        fts: (
+            f'CREATE VIRTUAL TABLE {fts} USING fts5({names}, content={table}, content_rowid=id, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        ),
+        f'{fts}_insert': (
+            f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END'
+        ),
+        f'{fts}_delete': (
+            f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END"
+        ),
+        f'{fts}_update': (
+            f'CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+            f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END'
+        ),
+    }
+    cursor.execute(
+        f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(statements))})",
+        list(statements),
+    )
+    existing = {name for name, in cursor.fetchall()}
+    missing = [sql for name, sql in statements.items() if name not in existing]
+    for sql in missing:
+        cursor.execute(sql)
+    if missing:
+        # Triggers perdus (table recréée par une migration SQLite) : réindexer le contenu
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return bool(missing)
+
+
+def create_text_search_config(schema_editor):
+    """Creates the French, accent-insensitive text search configuration (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    schema_editor.execute(
+        f"DO $$ BEGIN "
+        f"IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TEXT_SEARCH_CONFIG}') THEN "
+        f"CREATE TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG} (COPY = french); "
+        f"ALTER TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG} "
+        f"ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem; "
+        f"END IF; END $$"
+    )
+
+
+def drop_text_search_config(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {TEXT_SEARCH_CONFIG}')
+
+
+def create_index(schema_editor, table, columns):
+    """Creates the full-text index of `table` over [(column, weight)] (migrations)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _install_postgresql(schema_editor, table, columns)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            _install_sqlite(cursor, table, columns)
+
+
+def drop_index(schema_editor, table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+        schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS {SEARCH_VECTOR_COLUMN}')
+    elif vendor == 'sqlite':
+        fts = fts_table(table)
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def ensure_sqlite_indexes(using=None, **kwargs):
+    """post_migrate: recreates FTS5 triggers dropped when SQLite migrations rebuild a table."""
+    from django.apps import apps
+    from django.db import connections
+
+    db = connections[using or 'default']
+    if db.vendor != 'sqlite':
+        return
+    tables = set(db.introspection.table_names())
+    with db.cursor() as cursor:
+        for label, columns in FULL_TEXT_INDEXES.items():
+            table = apps.get_model(label)._meta.db_table
+            if table in tables:
+                _install_sqlite(cursor, table, columns)
+
+
+def search_terms(text):
+    return _TERMS.findall(text or '')[:MAX_SEARCH_TERMS]
+
+
+class TableSQL(RawSQL):
+    """RawSQL whose `{table}` placeholder is the queryset's base table alias."""
+
+    def as_sql(self, compiler, connection):
+        table = compiler.quote_name_unless_alias(compiler.query.get_initial_alias())
+        return '(%s)' % self.sql.format(table=table), self.params
+
+
+def full_text_filter(queryset, terms):
+    """Filters `queryset` on the full-text index of its model and annotates `search_rank`.
+
+    Returns None when the model or the database has no full-text index.
+    """
+    columns = FULL_TEXT_INDEXES.get(queryset.model._meta.label)
+    if not columns or not terms:
+        return None
+    table = queryset.model._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        match = TableSQL(
+            f'{{table}}.{SEARCH_VECTOR_COLUMN} @@ to_tsquery(%s::regconfig, %s)',
+            (TEXT_SEARCH_CONFIG, query), output_field=BooleanField(),
+        )
+        rank = TableSQL(
+            f'ts_rank({{table}}.{SEARCH_VECTOR_COLUMN}, to_tsquery(%s::regconfig, %s))',
+            (TEXT_SEARCH_CONFIG, query), output_field=FloatField(),
+        )
+        return queryset.filter(match).annotate(search_rank=rank)
+
+    if connection.vendor == 'sqlite':
+        fts = fts_table(table)
+        query = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(RANK_WEIGHTS[weight]) for _, weight in columns)
+        # bm25 est négatif, d'autant plus que la ligne est pertinente
+        rank = TableSQL(
+            f'SELECT -bm25({fts}, {weights}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {{table}}.id',
+            (query,), output_field=FloatField(),
+        )
+        return (
+            queryset
+            .filter(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (query,)))
+            .annotate(search_rank=rank)
+        )
+    return None
+
+
+class FullTextSearchFilter(SearchFilter):
+    """SearchFilter backed by the full-text index of the model when there is one.
+
+    Goes after OrderingFilter: without an explicit ?ordering=, results come
+    by relevance first, then in the view's ordering.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        results = full_text_filter(queryset, search_terms(text))
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            results = results.order_by('-search_rank', *queryset.query.order_by)
+        return results
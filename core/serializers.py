@@ -1,3 +1,5 @@
+from decimal import Decimal
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Category, Account, Asset
 
@@ -8,6 +10,12 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'icon', 'color', 'type', 'is_default', 'created_at']
         read_only_fields = ['id', 'is_default', 'created_at']
         
+    def validate_type(self, value):
+        # Les montants sont signés selon le type : on ne le change pas sous des transactions existantes
+        if self.instance is not None and value != self.instance.type and self.instance.is_used():
+            raise serializers.ValidationError("Cannot change the type of a category used by transactions or budgets.")
+        return value
+        
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
@@ -16,8 +24,8 @@ class CategorySerializer(serializers.ModelSerializer):
 class AccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = Account
-        fields = ['id', 'name', 'balance', 'type', 'is_active', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'balance', 'opening_balance', 'type', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'opening_balance', 'created_at', 'updated_at']
         
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -39,4 +47,15 @@ class AssetSerializer(serializers.ModelSerializer):
         
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class AssetRevaluationSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    current_value = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    date = serializers.DateField(required=False)
+    
+    def validate_date(self, value):
+        if value > timezone.localdate():
+            raise serializers.ValidationError("Valuation date cannot be in the future.")
+        return value
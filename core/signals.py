@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.dispatch import receiver
+from .models import Account, Asset, Category
+from .cache import bump_data_version
+from .registry import registry
+from . import snapshots, statistics, valuations
+
+
+def deleted_by_cascade_from(origin, *labels):
+    """True when a delete signal comes from deleting an object of one of `labels`."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label in labels
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=Account)
+def update_wealth_snapshot_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    snapshots.take_snapshot(instance.user_id)
+
+
+@receiver(post_save, sender=Asset)
+def record_asset_valuation(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and instance.purchase_price and instance.purchase_date and instance.purchase_date < timezone.localdate():
+        valuations.record_purchase(instance)
+    valuations.record_valuations([instance])
+
+
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=Account)
+def update_wealth_snapshot_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_by_cascade_from(origin, settings.AUTH_USER_MODEL):
+        return
+    snapshots.take_snapshot(instance.user_id)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def update_statistics_accounts(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or (origin is not None and deleted_by_cascade_from(origin, settings.AUTH_USER_MODEL)):
+        return
+    statistics.refresh_accounts(instance.user_id)
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def update_statistics_assets(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or (origin is not None and deleted_by_cascade_from(origin, settings.AUTH_USER_MODEL)):
+        return
+    statistics.refresh_assets(instance.user_id)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalidate_user_cache(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    # Catégorie par défaut : visible par tous les utilisateurs
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, instance, **kwargs):
+    # Tout de suite pour ce processus, puis au commit pour que les autres workers
+    # ne gardent pas une version relue avant la fin de la transaction
+    registry.invalidate(instance.user_id)
+    user_id = instance.user_id
+    transaction.on_commit(lambda: registry.invalidate(user_id))
@@ -0,0 +1,113 @@
+"""
+Maintenance of the WealthSnapshot time series.
+
+A snapshot stores the totals of active assets and active accounts of a user
+for one day. The current day is rewritten whenever an Asset or Account
+changes, or on commit when the ledger moves an account balance, and
+`take_snapshots` fills a day for every user in batches.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import DateField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Account, Asset, WealthSnapshot
+
+User = get_user_model()
+
+
+def _totals_by_user(model, field, user_ids):
+    rows = (
+        model.objects
+        .filter(user_id__in=user_ids, is_active=True)
+        .values('user_id')
+        .annotate(total=Sum(field))
+        .order_by()
+    )
+    return {row['user_id']: row['total'] for row in rows}
+
+
+def _write(user_ids, day):
+    assets = _totals_by_user(Asset, 'current_value', user_ids)
+    accounts = _totals_by_user(Account, 'balance', user_ids)
+    snapshots = [
+        WealthSnapshot(
+            user_id=user_id,
+            date=day,
+            assets_total=assets.get(user_id) or 0,
+            accounts_total=accounts.get(user_id) or 0,
+        )
+        for user_id in user_ids
+    ]
+    WealthSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['assets_total', 'accounts_total', 'updated_at'],
+    )
+    return len(snapshots)
+
+
+def _refresh_accounts(user_ids, day):
+    """Rewrites the accounts total of the existing `day` snapshots in one UPDATE; returns how many there were."""
+    balances = (
+        Account.objects.filter(user_id=OuterRef('user_id'), is_active=True)
+        .order_by().values('user_id').annotate(total=Sum('balance')).values('total')[:1]
+    )
+    return WealthSnapshot.objects.filter(user_id__in=user_ids, date=day).update(
+        accounts_total=Coalesce(Subquery(balances), Value(Decimal('0'))),
+        updated_at=timezone.now(),
+    )
+
+
+def _write_accounts(user_ids, day):
+    # Seuls les soldes ont bougé : une requête, sauf pour la première écriture du jour
+    if _refresh_accounts(user_ids, day) < len(user_ids):
+        _write(user_ids, day)
+
+
+def take_snapshot(user_id, day=None):
+    """Rewrites the snapshot of one user for `day` (today by default)."""
+    _write([user_id], day or timezone.localdate())
+
+
+def take_snapshots_on_commit(user_ids):
+    """Rewrites the accounts total of today's snapshot of `user_ids` once the current transaction commits."""
+    user_ids = sorted(user_ids)
+    if user_ids:
+        # Après le commit : les soldes déplacés par le ledger sont alors définitifs
+        transaction.on_commit(lambda: _write_accounts(user_ids, timezone.localdate()))
+
+
+def take_snapshots(day=None, batch_size=500):
+    """Writes the snapshot of `day` for every user. Returns the number of rows written."""
+    day = day or timezone.localdate()
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    written = 0
+    last_id = 0
+    while True:
+        batch = list(user_ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return written
+        written += _write(batch, day)
+        last_id = batch[-1]
+
+
+def monthly_series(user, since):
+    """Returns the last snapshot of each month from `since`, oldest first."""
+    month_ends = (
+        WealthSnapshot.objects
+        .filter(user=user, date__gte=since)
+        .annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('month')
+        .annotate(last=Max('date'))
+        .values('last')
+    )
+    return list(
+        WealthSnapshot.objects
+        .filter(user=user, date__in=month_ends)
+        .order_by('date')
+    )
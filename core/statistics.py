@@ -0,0 +1,209 @@
+"""
+Maintenance of the UserStatistics counters.
+
+The row of a user holds what the profile statistics endpoint shows, so the
+endpoint reads one row by primary key. Writes keep it current:
+
+- account and asset totals are recomputed inside a single UPDATE (correlated
+  subqueries on the user's rows) whenever an account or asset changes, or a
+  transaction moves an account balance;
+- transaction counters move with F() expressions, and the first/last dates
+  with Least/Greatest, or a MIN/MAX subquery when a transaction goes away;
+  bulk creations spanning several users update all their rows at once;
+- the current-month counter is recounted when the month has changed.
+
+`rebuild` recomputes rows from scratch (repair command, missing rows).
+"""
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import Account, Asset, UserStatistics
+
+User = get_user_model()
+
+
+def _transaction_model():
+    return apps.get_model('transactions', 'Transaction')
+
+
+def _aggregate(queryset, expression):
+    """Correlated subquery of one aggregate over the rows of the updated user."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(user_id=OuterRef('user_id'))
+            .order_by().values('user_id').annotate(value=expression).values('value')[:1]
+        ),
+        Value(0),
+    )
+
+
+def _account_values():
+    active = Account.objects.filter(is_active=True)
+    return {
+        'account_count': _aggregate(active, Count('id')),
+        'balance_total': _aggregate(active, Sum('balance')),
+    }
+
+
+def _asset_values():
+    active = Asset.objects.filter(is_active=True)
+    return {
+        'asset_count': _aggregate(active, Count('id')),
+        'asset_total': _aggregate(active, Sum('current_value')),
+    }
+
+
+def _month_count(month):
+    return _aggregate(_transaction_model().objects.filter(month=month), Count('id'))
+
+
+def _update(user_id, values):
+    updated = UserStatistics.objects.filter(pk=user_id).update(updated_at=timezone.now(), **values)
+    if not updated:
+        rebuild(User.objects.filter(pk=user_id))
+
+
+def refresh_accounts(user_id):
+    _update(user_id, _account_values())
+
+
+def refresh_assets(user_id):
+    _update(user_id, _asset_values())
+
+
+def record_transactions(user_id, added=(), removed=()):
+    """Applies created (`added`) and deleted (`removed`) transactions, given as (date, month) pairs.
+
+    The account totals are refreshed in the same UPDATE, the ledger having
+    moved their balances.
+    """
+    added, removed = list(added), list(removed)
+    this_month = timezone.localdate().replace(day=1)
+    month_delta = sum(1 for _, month in added if month == this_month) - sum(1 for _, month in removed if month == this_month)
+    values = {
+        'transaction_count': F('transaction_count') + len(added) - len(removed),
+        'month': Value(this_month),
+        'month_transaction_count': Case(
+            When(month=this_month, then=F('month_transaction_count') + month_delta),
+            default=_month_count(this_month),
+        ),
+        **_account_values(),
+    }
+    if removed:
+        # La transaction supprimée était peut-être la première ou la dernière
+        transactions = _transaction_model().objects.all()
+        values['first_transaction_date'] = Subquery(
+            transactions.filter(user_id=OuterRef('user_id')).order_by('date').values('date')[:1]
+        )
+        values['last_transaction_date'] = Subquery(
+            transactions.filter(user_id=OuterRef('user_id')).order_by('-date').values('date')[:1]
+        )
+    elif added:
+        first = min(date for date, _ in added)
+        last = max(date for date, _ in added)
+        values['first_transaction_date'] = Least(Coalesce(F('first_transaction_date'), Value(first)), Value(first))
+        values['last_transaction_date'] = Greatest(Coalesce(F('last_transaction_date'), Value(last)), Value(last))
+    _update(user_id, values)
+
+
+def _per_user(values, output_field=None):
+    return Case(*[When(user_id=user_id, then=Value(value)) for user_id, value in values.items()], output_field=output_field)
+
+
+def record_added(added):
+    """Applies created transactions of several users, given as {user_id: [(date, month)]}, in one UPDATE."""
+    added = {user_id: list(rows) for user_id, rows in added.items() if rows}
+    if len(added) <= 1:
+        for user_id, rows in added.items():
+            record_transactions(user_id, added=rows)
+        return
+    this_month = timezone.localdate().replace(day=1)
+    firsts = {user_id: min(date for date, _ in rows) for user_id, rows in added.items()}
+    lasts = {user_id: max(date for date, _ in rows) for user_id, rows in added.items()}
+    first, last = _per_user(firsts), _per_user(lasts)
+    month_deltas = {user_id: sum(1 for _, month in rows if month == this_month) for user_id, rows in added.items()}
+    updated = UserStatistics.objects.filter(pk__in=added).update(
+        updated_at=timezone.now(),
+        transaction_count=F('transaction_count') + _per_user({user_id: len(rows) for user_id, rows in added.items()}),
+        month=Value(this_month),
+        month_transaction_count=Case(
+            When(month=this_month, then=F('month_transaction_count') + _per_user(month_deltas)),
+            default=_month_count(this_month),
+        ),
+        first_transaction_date=Least(Coalesce(F('first_transaction_date'), first), first),
+        last_transaction_date=Greatest(Coalesce(F('last_transaction_date'), last), last),
+        **_account_values(),
+    )
+    if updated < len(added):
+        rebuild(User.objects.filter(pk__in=added).exclude(pk__in=UserStatistics.objects.values('pk')))
+
+
+def get_statistics(user):
+    """Returns the statistics row of a user, rebuilt if missing, month counter rolled over if needed."""
+    statistics = UserStatistics.objects.filter(pk=user.pk).first()
+    this_month = timezone.localdate().replace(day=1)
+    if statistics is None:
+        rebuild(User.objects.filter(pk=user.pk))
+        return UserStatistics.objects.get(pk=user.pk)
+    if statistics.month != this_month:
+        UserStatistics.objects.filter(pk=user.pk).update(month=this_month, month_transaction_count=_month_count(this_month))
+        statistics.refresh_from_db()
+    return statistics
+
+
+def _grouped(queryset, **aggregates):
+    rows = queryset.values('user_id').annotate(**aggregates).order_by()
+    return {row.pop('user_id'): row for row in rows}
+
+
+def _write(user_ids):
+    this_month = timezone.localdate().replace(day=1)
+    Transaction = _transaction_model()
+    accounts = _grouped(Account.objects.filter(user_id__in=user_ids, is_active=True), count=Count('id'), total=Sum('balance'))
+    assets = _grouped(Asset.objects.filter(user_id__in=user_ids, is_active=True), count=Count('id'), total=Sum('current_value'))
+    transactions = _grouped(Transaction.objects.filter(user_id__in=user_ids), count=Count('id'), first=Min('date'), last=Max('date'))
+    months = _grouped(Transaction.objects.filter(user_id__in=user_ids, month=this_month), count=Count('id'))
+
+    rows = []
+    for user_id in user_ids:
+        account = accounts.get(user_id, {})
+        asset = assets.get(user_id, {})
+        transaction = transactions.get(user_id, {})
+        rows.append(UserStatistics(
+            user_id=user_id,
+            account_count=account.get('count', 0),
+            balance_total=account.get('total') or 0,
+            asset_count=asset.get('count', 0),
+            asset_total=asset.get('total') or 0,
+            transaction_count=transaction.get('count', 0),
+            month=this_month,
+            month_transaction_count=months.get(user_id, {}).get('count', 0),
+            first_transaction_date=transaction.get('first'),
+            last_transaction_date=transaction.get('last'),
+        ))
+    UserStatistics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[
+            'account_count', 'balance_total', 'asset_count', 'asset_total', 'transaction_count',
+            'month', 'month_transaction_count', 'first_transaction_date', 'last_transaction_date', 'updated_at',
+        ],
+    )
+    return len(rows)
+
+
+def rebuild(users=None, batch_size=500):
+    """Recomputes the statistics rows of `users` (every user when None). Returns the number of rows written."""
+    user_ids = (users if users is not None else User.objects.all()).order_by('pk').values_list('pk', flat=True)
+    written = 0
+    last_id = 0
+    while True:
+        batch = list(user_ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return written
+        written += _write(batch)
+        last_id = batch[-1]
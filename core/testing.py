@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connections
+
+from .querybudget import QueryRecorder
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting that a block stays within a query budget."""
+
+    @contextmanager
+    def assertMaxQueries(self, limit, using='default'):
+        recorder = QueryRecorder()
+        with connections[using].execute_wrapper(recorder):
+            yield recorder
+        if recorder.count > limit:
+            repeated = '\n'.join(f'  {count}x {shape}' for shape, count in recorder.repeated_shapes())
+            self.fail(
+                f'{recorder.count} queries executed, budget is {limit}.'
+                + (f'\nRepeated shapes:\n{repeated}' if repeated else '')
+            )
+
+
+def create_user(name):
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.create_user(email=f'{name}@fintrack.com', username=name, password='x')
+
+
+def create_account(user, name='Courant', balance=0):
+    from .models import Account, AccountType
+    return Account.objects.create(name=name, type=AccountType.CHECKING, balance=Decimal(balance), user=user)
+
+
+def create_category(user, name, category_type='EXPENSE'):
+    from .models import Category
+    return Category.objects.create(name=name, type=category_type, user=user)
+
+
+def create_transaction(account, category, amount, date=None, description=None):
+    """Creates a transaction of the account's user; `amount` is signed by the category type."""
+    from django.utils import timezone
+    from transactions.models import Transaction
+    return Transaction.objects.create(
+        amount=Decimal(amount), date=date or timezone.now(), description=description or category.name,
+        category=category, account=account, user=account.user,
+    )
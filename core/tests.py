@@ -1,3 +1,474 @@
-from django.test import TestCase
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from transactions.models import Budget, Transaction
+
+from .aio import gather_queries
+from .cache import GLOBAL_VERSION_KEY, _user_version_key, get_data_version
+from .models import (
+    Account, AccountType, Asset, AssetType, AssetValuation, Category, CategoryType, UserStatistics, WealthSnapshot,
+)
+from .middleware import QueryBudgetMiddleware
+from .querybudget import sql_shape
+from .registry import CategoryRegistry, registry
+from .testing import QueryBudgetTestMixin, create_account, create_category, create_transaction, create_user
+from .warmup import warm_up
+from . import snapshots, statistics
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='budget@fintrack.com', username='budget', password='x')
+        for name in ('Courant', 'Livret', 'PEA'):
+            Account.objects.create(name=name, type=AccountType.CHECKING, user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_sql_shape_replaces_literals(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' AND n > 4.5 LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ? LIMIT ?',
+        )
+
+    @override_settings(QUERY_BUDGET_HEADERS=True)
+    def test_headers_report_query_count(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get('/api/accounts/', SERVER_NAME='localhost')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-DB-Queries'], '2')
+        self.assertIn('X-DB-Time', response)
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0)
+    def test_exceeded_budget_is_logged(self):
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            self.client.get('/api/accounts/', SERVER_NAME='localhost')
+
+        self.assertIn('Query budget exceeded: GET /api/accounts/', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_HEADERS=True)
+    def test_async_requests_count_their_pool_queries(self):
+        def select_one():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                return cursor.fetchone()[0]
+
+        async def view(request):
+            await sync_to_async(select_one)()
+            # Comme hors transaction : chaque appel sur un thread du pool, avec sa connexion
+            request.concurrent_queries = True
+            results = await gather_queries(request, {'first': select_one, 'second': select_one})
+            return HttpResponse(str(sum(results.values())))
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertEqual(response.content, b'2')
+        self.assertEqual(response['X-DB-Queries'], '3')
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('cache')
+        self.account = create_account(self.user)
+        self.food = create_category(self.user, 'Courses')
+        self.client.force_authenticate(self.user)
+
+    def get_dashboard(self):
+        response = self.client.get('/api/transactions/dashboard_stats/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_writes_invalidate_cached_responses(self):
+        self.assertEqual(self.get_dashboard()['X-Cache'], 'MISS')
+        self.assertEqual(self.get_dashboard()['X-Cache'], 'HIT')
+
+        create_transaction(self.account, self.food, '40')
+        response = self.get_dashboard()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['current_month']['expenses'], 40.0)
+
+        self.client.patch(f'/api/accounts/{self.account.pk}/', {'name': 'Joint'}, SERVER_NAME='localhost')
+        self.assertEqual(self.get_dashboard()['X-Cache'], 'MISS')
+
+    def test_version_is_bumped_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_transaction(self.account, self.food, '40')
+            # Réponse calculée par un autre worker avant le commit
+            during, _ = get_data_version(self.user.pk)
+        after, _ = get_data_version(self.user.pk)
+
+        self.assertGreater(after, during)
+
+    def test_default_categories_bump_every_user(self):
+        _, before = get_data_version(self.user.pk)
+        Category.objects.create(name='Impôts', type=CategoryType.EXPENSE, is_default=True)
+        _, after = get_data_version(self.user.pk)
+
+        self.assertGreater(after, before)
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('conditional')
+        self.account = create_account(self.user)
+        self.food = create_category(self.user, 'Courses')
+        self.client.force_authenticate(self.user)
+
+    def get(self, path='/api/transactions/', **headers):
+        return self.client.get(path, SERVER_NAME='localhost', headers=headers)
+
+    def set_version(self, milliseconds):
+        cache.set_many({_user_version_key(self.user.pk): milliseconds, GLOBAL_VERSION_KEY: 0}, timeout=None)
+
+    def test_etag_answers_304_until_a_write(self):
+        for path in ('/api/transactions/', f'/api/accounts/{self.account.pk}/', '/api/transactions/dashboard_stats/'):
+            etag = self.get(path)['ETag']
+            response = self.get(path, if_none_match=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+        etag = self.get()['ETag']
+        create_transaction(self.account, self.food, '40')
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_is_rounded_up(self):
+        second = int(timezone.now().timestamp()) - 2
+        self.set_version(second * 1000 + 300)
+        last_modified = self.get()['Last-Modified']
+        self.assertEqual(self.get(if_modified_since=last_modified).status_code, 304)
+
+        # Nouvelle écriture dans la même seconde
+        self.set_version(second * 1000 + 700)
+        self.assertEqual(self.get(if_modified_since=last_modified).status_code, 304)
+        self.set_version((second + 1) * 1000 + 100)
+        self.assertEqual(self.get(if_modified_since=last_modified).status_code, 200)
+
+    def test_last_modified_is_withheld_during_the_current_second(self):
+        self.set_version(int(timezone.now().timestamp() * 1000))
+        response = self.get()
+
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+
+class WealthSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('snapshots')
+
+    def today_snapshot(self, user=None):
+        return WealthSnapshot.objects.get(user=user or self.user, date=timezone.localdate())
+
+    def test_asset_and_account_writes_rewrite_today(self):
+        account = create_account(self.user, balance='1200')
+        asset = Asset.objects.create(name='ETF', asset_type=AssetType.STOCKS, current_value=Decimal('300'), user=self.user)
+        snapshot = self.today_snapshot()
+        self.assertEqual((snapshot.assets_total, snapshot.accounts_total), (Decimal('300.00'), Decimal('1200.00')))
+
+        asset.is_active = False
+        asset.save()
+        account.delete()
+        snapshot = self.today_snapshot()
+        self.assertEqual((snapshot.assets_total, snapshot.accounts_total), (0, 0))
+        self.assertEqual(WealthSnapshot.objects.filter(user=self.user).count(), 1)
+
+    def test_command_fills_a_day_for_every_user(self):
+        other = create_user('snapshots-other')
+        create_account(other, balance='50')
+        day = timezone.localdate() - timedelta(days=3)
+
+        call_command('snapshot_wealth', date=day.isoformat(), batch_size=1, stdout=StringIO())
+
+        self.assertEqual(WealthSnapshot.objects.filter(date=day).count(), User.objects.count())
+        self.assertEqual(WealthSnapshot.objects.get(user=other, date=day).accounts_total, Decimal('50.00'))
+
+    def test_monthly_series_keeps_the_last_day_of_each_month(self):
+        for day, total in [(date(2026, 1, 5), 10), (date(2026, 1, 28), 20), (date(2026, 2, 3), 30), (date(2025, 12, 31), 5)]:
+            WealthSnapshot.objects.create(user=self.user, date=day, accounts_total=total)
+
+        series = snapshots.monthly_series(self.user, since=date(2026, 1, 1))
+
+        self.assertEqual([(snapshot.date, snapshot.accounts_total) for snapshot in series],
+                         [(date(2026, 1, 28), 20), (date(2026, 2, 3), 30)])
+
+
+class CategoryRegistryTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.user = create_user('registry')
+        self.other = create_user('registry-other')
+        self.default = Category.objects.create(name='Alimentation', type=CategoryType.EXPENSE, is_default=True)
+        self.hidden = Category.objects.create(name='Ancienne', type=CategoryType.EXPENSE)
+        self.own = create_category(self.user, 'Salaire', CategoryType.INCOME)
+        self.foreign = create_category(self.other, 'Privée')
+        self.client.force_authenticate(self.user)
+
+    def test_visible_categories(self):
+        self.assertEqual([info.id for info in registry.visible(self.user.pk)], [self.default.pk, self.own.pk])
+        self.assertEqual(registry.get(self.own.pk, self.user.pk).type, CategoryType.INCOME)
+        self.assertIsNotNone(registry.get(self.default.pk))
+        self.assertIsNone(registry.get(self.foreign.pk, self.user.pk))
+
+    def test_other_process_sees_committed_changes(self):
+        other_process = CategoryRegistry()
+        self.assertEqual(len(other_process.visible(self.user.pk)), 2)
+
+        # Création dans ce processus : l'autre la trouve dès qu'il la cherche
+        with self.captureOnCommitCallbacks(execute=True):
+            created = create_category(self.user, 'Loisirs')
+        self.assertEqual(other_process.get(created.pk, self.user.pk).name, 'Loisirs')
+
+        # Renommage : version relue après CHECK_INTERVAL
+        with self.captureOnCommitCallbacks(execute=True):
+            created.name = 'Sorties'
+            created.save()
+        with mock.patch('core.registry.time.monotonic', return_value=time.monotonic() + 5):
+            self.assertEqual(other_process.get(created.pk, self.user.pk).name, 'Sorties')
+
+    def test_list_is_served_from_the_registry(self):
+        registry.visible(self.user.pk)
+        with self.assertMaxQueries(0):
+            response = self.client.get('/api/categories/', {'type': 'INCOME'}, SERVER_NAME='localhost')
+        self.assertEqual([category['id'] for category in response.json()['results']], [self.own.pk])
+
+        names = lambda **params: [
+            category['name'] for category in self.client.get('/api/categories/', params, SERVER_NAME='localhost').json()['results']
+        ]
+        self.assertEqual(names(), ['Alimentation', 'Salaire'])
+        self.assertEqual(names(is_default='true'), ['Alimentation'])
+        self.assertEqual(names(search='ALIM'), ['Alimentation'])
+        self.assertEqual(self.client.get('/api/categories/', {'type': 'AUTRE'}, SERVER_NAME='localhost').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/categories/{self.foreign.pk}/', SERVER_NAME='localhost').status_code, 404)
+
+
+class CategoryTypeTests(APITestCase):
+    def setUp(self):
+        self.user = create_user('category-type')
+        self.account = create_account(self.user)
+        self.category = create_category(self.user, 'Remboursements')
+        self.client.force_authenticate(self.user)
+
+    def patch_type(self, category_type):
+        return self.client.patch(f'/api/categories/{self.category.pk}/', {'type': category_type}, SERVER_NAME='localhost')
+
+    def test_type_of_an_unused_category_can_change(self):
+        self.assertEqual(self.patch_type(CategoryType.INCOME).status_code, 200)
+
+        transaction = create_transaction(self.account, Category.objects.get(pk=self.category.pk), '30')
+        self.assertEqual(transaction.amount, Decimal('30'))
+        self.assertEqual(transaction.category_type, CategoryType.INCOME)
+
+    def test_type_of_a_used_category_is_fixed(self):
+        create_transaction(self.account, self.category, '30')
+
+        response = self.patch_type(CategoryType.INCOME)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('type', response.json())
+        self.assertEqual(Transaction.objects.get(category=self.category).amount, Decimal('-30.00'))
+        self.category.type = CategoryType.INCOME
+        with self.assertRaises(ValidationError):
+            self.category.full_clean()
+        # Autres champs toujours modifiables
+        response = self.client.patch(f'/api/categories/{self.category.pk}/', {'type': CategoryType.EXPENSE, 'color': '#ff0000'},
+                                     SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+
+    def test_budgeted_category_is_fixed(self):
+        Budget.objects.create(category=self.category, user=self.user, monthly_limit=Decimal('100'))
+
+        self.assertEqual(self.patch_type(CategoryType.INCOME).status_code, 400)
+
+
+class ExplainHotPathsTests(TestCase):
+    def test_hot_paths_use_their_indexes(self):
+        user = create_user('explain')
+        account = create_account(user)
+        food = create_category(user, 'Courses')
+        for days_ago in range(25):
+            create_transaction(account, food, '12', timezone.now() - timedelta(days=days_ago))
+        Asset.objects.create(name='ETF', asset_type=AssetType.STOCKS, current_value=Decimal('100'), user=user)
+        out = StringIO()
+
+        call_command('explain_hot_paths', user=user.email, stdout=out)
+
+        self.assertIn('✓ transactions.list.cursor', out.getvalue())
+        self.assertIn('✓ accounts.balance_history', out.getvalue())
+        self.assertIn('All hot queries use their indexes', out.getvalue())
+
+
+class PortfolioPerformanceTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='portfolio@fintrack.com', username='portfolio', password='x')
+        self.today = timezone.localdate()
+        self.stocks = Asset.objects.create(
+            name='ETF', asset_type=AssetType.STOCKS, current_value=Decimal('100'), user=self.user
+        )
+        self.gold = Asset.objects.create(
+            name='Or', asset_type=AssetType.PRECIOUS_METALS, current_value=Decimal('50'), user=self.user
+        )
+        # ETF : 100 -> 120 -> 90 -> 110 ; or stable à 50
+        for days_ago, value in ((30, '100'), (20, '120'), (10, '90')):
+            AssetValuation.objects.create(
+                asset=self.stocks, user=self.user, date=self.today - timedelta(days=days_ago), value=Decimal(value)
+            )
+        AssetValuation.objects.create(
+            asset=self.gold, user=self.user, date=self.today - timedelta(days=30), value=Decimal('50')
+        )
+        self.client.force_authenticate(self.user)
+
+    def revalue(self, payload):
+        return self.client.post('/api/assets/revalue/', payload, format='json', SERVER_NAME='localhost')
+
+    def test_revalue_updates_assets_and_history(self):
+        response = self.revalue([
+            {'id': self.stocks.id, 'current_value': '110'},
+            {'id': self.gold.id, 'current_value': '45', 'date': str(self.today - timedelta(days=40))},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.stocks.refresh_from_db()
+        self.gold.refresh_from_db()
+        self.assertEqual(self.stocks.current_value, Decimal('110'))
+        # Valorisation plus ancienne que la dernière connue : historique seulement
+        self.assertEqual(self.gold.current_value, Decimal('50'))
+        self.assertTrue(AssetValuation.objects.filter(asset=self.gold, value=Decimal('45')).exists())
+
+    def test_revalue_query_count_does_not_grow_with_assets(self):
+        assets = [
+            Asset.objects.create(name=f'Action {i}', asset_type=AssetType.STOCKS, current_value=Decimal('10'), user=self.user)
+            for i in range(20)
+        ]
+        with self.assertMaxQueries(12):
+            response = self.revalue([{'id': asset.id, 'current_value': '11'} for asset in assets])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Asset.objects.filter(user=self.user, current_value=Decimal('11')).count(), 20)
+
+    def test_revalue_rejects_unknown_assets(self):
+        response = self.revalue([{'id': self.stocks.id, 'current_value': '1'}, {'id': 0, 'current_value': '1'}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+
+    def test_performance_returns_and_drawdown(self):
+        self.revalue([{'id': self.stocks.id, 'current_value': '110'}])
+        response = self.client.get(
+            '/api/assets/portfolio_performance/',
+            {'start': str(self.today - timedelta(days=30))},
+            SERVER_NAME='localhost',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        performance = response.json()['performance']
+        self.assertEqual(performance['start_value'], 150.0)
+        self.assertEqual(performance['end_value'], 160.0)
+        self.assertEqual(performance['gain_loss'], 10.0)
+        self.assertEqual([point['value'] for point in performance['series']], [150.0, 170.0, 140.0, 160.0])
+        # Plus forte baisse : 170 -> 140
+        self.assertEqual(performance['max_drawdown'], round((140 / 170 - 1) * 100, 2))
+        stocks = next(asset for asset in performance['assets'] if asset['id'] == self.stocks.id)
+        self.assertEqual(stocks['return_percentage'], 10.0)
+        self.assertEqual(stocks['max_drawdown'], -25.0)
+        composition = {item['type']: item for item in response.json()['composition']}
+        self.assertEqual(composition['STOCKS']['value'], 110.0)
+
+
+class UserStatisticsTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='stats@fintrack.com', username='stats', password='x')
+        self.account = Account.objects.create(
+            name='Courant', type=AccountType.CHECKING, balance=Decimal('1000'), user=self.user
+        )
+        Asset.objects.create(name='ETF', asset_type=AssetType.STOCKS, current_value=Decimal('500'), user=self.user)
+        category = Category.objects.create(name='Courses', type=CategoryType.EXPENSE, user=self.user)
+        now = timezone.now()
+        self.transactions = [
+            Transaction.objects.create(
+                amount=Decimal('-40'), date=now - timedelta(days=days_ago), description='Courses',
+                category=category, account=self.account, user=self.user,
+            )
+            for days_ago in (400, 0)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def test_counters_follow_writes(self):
+        self.transactions[0].delete()
+
+        row = UserStatistics.objects.get(pk=self.user.pk)
+        self.assertEqual(row.transaction_count, 1)
+        self.assertEqual(row.balance_total, Decimal('960'))
+        self.assertEqual(row.first_transaction_date, self.transactions[1].date)
+
+        # Les compteurs tenus au fil de l'eau valent un recalcul complet
+        statistics.rebuild(User.objects.filter(pk=self.user.pk))
+        rebuilt = UserStatistics.objects.get(pk=self.user.pk)
+        for field in ('account_count', 'balance_total', 'asset_count', 'asset_total', 'transaction_count',
+                      'month_transaction_count', 'first_transaction_date', 'last_transaction_date'):
+            self.assertEqual(getattr(row, field), getattr(rebuilt, field), field)
+
+    def test_endpoint_reads_one_row(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get('/api/auth/profile/statistics/', SERVER_NAME='localhost')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['accounts'], {'total_accounts': 1, 'total_balance': 920.0})
+        self.assertEqual(data['assets'], {'total_assets': 1, 'total_value': 500.0})
+        self.assertEqual(data['transactions']['total_transactions'], 2)
+        self.assertEqual(data['transactions']['this_month_transactions'], 1)
+
+
+class AssetSearchTests(QueryBudgetTestMixin, APITestCase):
+    def test_name_matches_rank_first(self):
+        user = User.objects.create_user(email='assets@fintrack.com', username='assets', password='x')
+        Asset.objects.create(
+            name='Livret', asset_type=AssetType.SAVINGS_ACCOUNT, current_value=Decimal('900'),
+            description='Épargne de précaution', user=user,
+        )
+        Asset.objects.create(name='Épargne salariale', asset_type=AssetType.STOCKS, current_value=Decimal('100'), user=user)
+        self.client.force_authenticate(user)
+
+        response = self.client.get('/api/assets/', {'search': 'epargne'}, SERVER_NAME='localhost')
+
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Épargne salariale', 'Livret'])
+
+
+class WarmUpTests(QueryBudgetTestMixin, APITestCase):
+    def test_categories_are_served_without_queries(self):
+        cache.clear()
+        user = User.objects.create_user(email='warm@fintrack.com', username='warm', password='x')
+        Account.objects.create(name='Courant', type=AccountType.CHECKING, user=user)
+        category = Category.objects.create(name='Loyer', type=CategoryType.EXPENSE, user=user)
+        registry.clear()
+
+        summary = warm_up()
+
+        self.assertGreater(summary['routes'], 0)
+        self.assertGreater(summary['serializers'], 0)
+        self.assertEqual(summary['category_users'], 1)
+        with self.assertMaxQueries(0):
+            self.assertEqual(registry.get(category.pk, user.pk).name, 'Loyer')
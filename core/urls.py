@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import CategoryViewSet, AccountViewSet, AssetViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
@@ -8,5 +9,7 @@ router.register(r'accounts', AccountViewSet, basename='account')
 router.register(r'assets', AssetViewSet, basename='asset')
 
 urlpatterns = [
+    # Variante async (requêtes indépendantes en parallèle, voir aio.py)
+    path('async/assets/portfolio_performance/', async_views.portfolio_performance, name='async-portfolio-performance'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Asset valuation history and portfolio performance.
+
+Every change of an asset's value is kept as an AssetValuation row (one per
+asset and day). `revalue` applies many new values at once: one bulk_update
+of the assets and one bulk upsert of their history, in a single transaction.
+
+`performance` reads the valuations of a window in two independent queries
+(opening_values: the value of each asset when the window opens, then
+valuation_rows: the rows inside it), lays them out as an assets x dates
+matrix, forward-fills it and computes values, returns, gain/loss and
+drawdown with NumPy array operations instead of Python loops.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .models import Asset, AssetType, AssetValuation
+from . import snapshots, statistics
+
+ASSET_TYPE_LABELS = dict(AssetType.choices)
+
+
+def record_valuations(assets, day=None):
+    """Upserts the current value of `assets` as their valuation of `day` (today by default)."""
+    day = day or timezone.localdate()
+    AssetValuation.objects.bulk_create(
+        [AssetValuation(asset_id=asset.pk, user_id=asset.user_id, date=day, value=asset.current_value) for asset in assets],
+        update_conflicts=True,
+        unique_fields=['asset', 'date'],
+        update_fields=['value'],
+    )
+
+
+def record_purchase(asset):
+    """Records the purchase price of a new asset as its valuation on the purchase date."""
+    AssetValuation.objects.get_or_create(
+        asset=asset, date=asset.purchase_date,
+        defaults={'user_id': asset.user_id, 'value': asset.purchase_price},
+    )
+
+
+def revalue(user, rows):
+    """Applies [{'asset': Asset, 'value': Decimal, 'date': date}] in one transaction.
+
+    The valuation history gets one row per asset and date; current_value only
+    moves for valuations at least as recent as the latest one recorded.
+    Returns the updated assets.
+    """
+    today = timezone.localdate()
+    latest = dict(
+        AssetValuation.objects
+        .filter(asset_id__in=[row['asset'].pk for row in rows])
+        .values('asset_id')
+        .annotate(latest=Max('date'))
+        .order_by()
+        .values_list('asset_id', 'latest')
+    )
+
+    valuations = {}
+    current = {}
+    for row in rows:
+        asset, day = row['asset'], row.get('date') or today
+        valuations[(asset.pk, day)] = AssetValuation(asset_id=asset.pk, user_id=user.pk, date=day, value=row['value'])
+        if latest.get(asset.pk) is None or day >= latest[asset.pk]:
+            if asset.pk not in current or day >= current[asset.pk][0]:
+                current[asset.pk] = (day, row['value'], asset)
+
+    now = timezone.now()
+    updated = []
+    for _, value, asset in current.values():
+        asset.current_value = value
+        asset.updated_at = now
+        updated.append(asset)
+
+    with transaction.atomic():
+        Asset.objects.bulk_update(updated, ['current_value', 'updated_at'])
+        AssetValuation.objects.bulk_create(
+            list(valuations.values()),
+            update_conflicts=True,
+            unique_fields=['asset', 'date'],
+            update_fields=['value'],
+        )
+        # bulk_update n'envoie pas post_save : patrimoine, statistiques et caches à la main
+        snapshots.take_snapshot(user.pk)
+        statistics.refresh_assets(user.pk)
+        bump_data_version(user.pk)
+    return updated
+
+
+def composition(user):
+    """Returns the value, count and share of each asset type, grouped in SQL."""
+    rows = list(
+        Asset.objects.filter(user=user, is_active=True)
+        .values('asset_type')
+        .annotate(value=Sum('current_value'), count=Count('id'))
+        .order_by('-value')
+    )
+    total = sum(row['value'] for row in rows)
+    return total, [
+        {
+            'type': row['asset_type'],
+            'name': ASSET_TYPE_LABELS.get(row['asset_type'], row['asset_type']),
+            'value': float(row['value']),
+            'count': row['count'],
+            'percentage': float(row['value'] / total * 100) if total > 0 else 0,
+        }
+        for row in rows
+    ]
+
+
+def max_drawdown(values):
+    """Returns the largest peak-to-trough fall of a value series, as a negative percentage."""
+    if values.size == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, values / peaks - 1, 0)
+    return float(drawdowns.min() * 100)
+
+
+def _change(start, end):
+    gain = end - start
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(start > 0, gain / start * 100, 0.0)
+    return gain, returns
+
+
+def opening_values(user, start):
+    """Returns the user's active assets with their value when the window opens (`opening_value`)."""
+    opening = AssetValuation.objects.filter(asset=OuterRef('pk'), date__lte=start).order_by('-date').values('value')[:1]
+    return list(
+        Asset.objects.filter(user=user, is_active=True)
+        .annotate(opening_value=Subquery(opening))
+        .order_by('pk')
+        .values('pk', 'name', 'asset_type', 'opening_value')
+    )
+
+
+def valuation_rows(user, start, end):
+    """Returns the (asset_id, date, value) valuations of the user's active assets inside (start, end]."""
+    return list(
+        AssetValuation.objects
+        .filter(user=user, asset__is_active=True, date__gt=start, date__lte=end)
+        .order_by()
+        .values_list('asset_id', 'date', 'value')
+    )
+
+
+def performance(user, start=None, end=None, assets=None, rows=None):
+    """Returns the value series, returns, gain/loss and drawdown of the user's active assets over [start, end].
+
+    `assets` and `rows` are the results of opening_values and valuation_rows
+    when already read (async views run them concurrently).
+    """
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=365)
+    if assets is None:
+        assets = opening_values(user, start)
+    if rows is None:
+        rows = valuation_rows(user, start, end)
+
+    # Matrice actifs x dates : valeur à l'ouverture en colonne 0, puis une colonne par date de valorisation
+    dates = np.array(sorted({start} | {day for _, day, _ in rows}), dtype='datetime64[D]')
+    index = {asset['pk']: position for position, asset in enumerate(assets)}
+    matrix = np.full((len(assets), len(dates)), np.nan)
+    matrix[:, 0] = [float(asset['opening_value']) if asset['opening_value'] is not None else np.nan for asset in assets]
+    if rows:
+        asset_ids, days, values = zip(*rows)
+        matrix[
+            [index[asset_id] for asset_id in asset_ids],
+            np.searchsorted(dates, np.array(days, dtype='datetime64[D]')),
+        ] = np.array(values, dtype=float)
+
+    # Report de la dernière valeur connue ; un actif sans valeur encore n'existe pas (0)
+    known = ~np.isnan(matrix)
+    last_known = np.maximum.accumulate(np.where(known, np.arange(len(dates)), 0), axis=1)
+    filled = np.take_along_axis(matrix, last_known, axis=1)
+    filled = np.nan_to_num(filled, nan=0.0)
+
+    # Point de départ de chaque actif : sa première valeur dans la fenêtre (un achat n'est pas un gain)
+    first_known = np.where(known.any(axis=1), known.argmax(axis=1), 0)
+    asset_start = filled[np.arange(len(assets)), first_known]
+    asset_end = filled[:, -1]
+    gains, returns = _change(asset_start, asset_end)
+
+    totals = filled.sum(axis=0)
+    total_gain, total_return = _change(np.array([asset_start.sum()]), np.array([asset_end.sum()]))
+
+    types = np.array([asset['asset_type'] for asset in assets])
+    by_type = []
+    for asset_type in np.unique(types):
+        mask = types == asset_type
+        type_start, type_end = asset_start[mask].sum(), asset_end[mask].sum()
+        type_gain, type_return = _change(np.array([type_start]), np.array([type_end]))
+        by_type.append({
+            'type': str(asset_type),
+            'name': ASSET_TYPE_LABELS.get(str(asset_type), str(asset_type)),
+            'start_value': round(float(type_start), 2),
+            'end_value': round(float(type_end), 2),
+            'gain_loss': round(float(type_gain[0]), 2),
+            'return_percentage': round(float(type_return[0]), 2),
+            'max_drawdown': round(max_drawdown(filled[mask].sum(axis=0)), 2),
+        })
+
+    return {
+        'start': start,
+        'end': end,
+        'start_value': round(float(asset_start.sum()), 2),
+        'end_value': round(float(asset_end.sum()), 2),
+        'gain_loss': round(float(total_gain[0]), 2),
+        'return_percentage': round(float(total_return[0]), 2),
+        'max_drawdown': round(max_drawdown(totals), 2),
+        'series': [
+            {'date': str(day), 'value': round(float(value), 2)}
+            for day, value in zip(dates, totals)
+        ],
+        'by_type': by_type,
+        'assets': [
+            {
+                'id': asset['pk'],
+                'name': asset['name'],
+                'type': asset['asset_type'],
+                'start_value': round(float(asset_start[position]), 2),
+                'end_value': round(float(asset_end[position]), 2),
+                'gain_loss': round(float(gains[position]), 2),
+                'return_percentage': round(float(returns[position]), 2),
+                'max_drawdown': round(max_drawdown(filled[position]), 2),
+            }
+            for position, asset in enumerate(assets)
+        ],
+    }
@@ -1,15 +1,37 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db import models
-from django.db.models import Sum
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .cache import cached_response
+from .conditional import ConditionalRequestMixin
+from .registry import registry
+from .search import FullTextSearchFilter
 from .models import Category, Account, Asset
-from .serializers import CategorySerializer, AccountSerializer, AssetSerializer
+from .serializers import CategorySerializer, AccountSerializer, AssetSerializer, AssetRevaluationSerializer
+from . import valuations
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def query_dates(request, *names):
+    """Parses the date query parameters `names`; returns (dates, None) or (None, a 400 response)."""
+    dates = {}
+    for name in names:
+        value = request.query_params.get(name)
+        try:
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return None, Response({name: 'Must be a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+    return dates, None
+
+
+class CategoryViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -17,13 +39,33 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name']
     
     def get_queryset(self):
-        user = self.request.user
-        return Category.objects.filter(
-            models.Q(user=user) | models.Q(user__isnull=True, is_default=True)
-        ).distinct()
+        # Ids visibles lus dans le registre : recherche par clé primaire, sans OR ni DISTINCT
+        visible = registry.visible(self.request.user.pk)
+        return Category.objects.filter(pk__in=[category.id for category in visible])
+    
+    def list(self, request, *args, **kwargs):
+        """Lists the default and own categories from the registry, without querying core_category."""
+        categories = self.filter_categories(request, registry.visible(request.user.pk))
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(categories, many=True).data)
+    
+    def filter_categories(self, request, categories):
+        """Applies the ?type=, ?is_default= and ?search= filters of the list to registry entries."""
+        filterset = DjangoFilterBackend().get_filterset(request, Category.objects.none(), self)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        for name in self.filterset_fields:
+            value = filterset.form.cleaned_data.get(name)
+            if value not in (None, ''):
+                categories = [category for category in categories if getattr(category, name) == value]
+        for term in SearchFilter().get_search_terms(request):
+            categories = [category for category in categories if term.lower() in category.name.lower()]
+        return categories
 
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     serializer_class = AccountSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -31,53 +73,123 @@ class AccountViewSet(viewsets.ModelViewSet):
     search_fields = ['name']
     ordering_fields = ['name', 'balance', 'created_at']
     ordering = ['name']
+    query_budgets = {'balance_history': 3}
     
     def get_queryset(self):
         return Account.objects.filter(user=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """Returns the balance at the end of ?date=, or the daily balances from ?start= to ?end= (last 30 days by default)"""
+        from transactions import ledger
+        account = self.get_object()
+        
+        dates, error = query_dates(request, 'date', 'start', 'end')
+        if error:
+            return error
+        
+        if dates['date']:
+            return Response({
+                'account': account.id,
+                'date': dates['date'],
+                'balance': float(ledger.balance_at(account, dates['date'])),
+            })
+        
+        end = dates['end'] or timezone.localdate()
+        start = dates['start'] or end - timedelta(days=29)
+        if start > end:
+            return Response({'start': 'Must be before end.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= settings.BALANCE_HISTORY_MAX_DAYS:
+            return Response(
+                {'start': f'The period cannot exceed {settings.BALANCE_HISTORY_MAX_DAYS} days.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'account': account.id,
+            'start': start,
+            'end': end,
+            'balances': [
+                {'date': day, 'balance': float(balance)}
+                for day, balance in ledger.daily_balances(account, start, end)
+            ],
+        })
 
 
-class AssetViewSet(viewsets.ModelViewSet):
+class AssetViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     serializer_class = AssetSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['asset_type', 'is_active']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'current_value', 'created_at']
     ordering = ['-current_value']
+    query_budgets = {'portfolio_summary': 4, 'portfolio_performance': 5, 'revalue': 10}
     
     def get_queryset(self):
         return Asset.objects.filter(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response('portfolio_summary')
     def portfolio_summary(self, request):
         """Returns portfolio summary with total value and composition"""
-        user = request.user
-        assets = Asset.objects.filter(user=user, is_active=True)
+        total_value, composition = valuations.composition(request.user)
         
-        total_value = assets.aggregate(total=Sum('current_value'))['total'] or 0
+        return Response({
+            'total_value': total_value,
+            'asset_count': sum(item['count'] for item in composition),
+            'composition': composition
+        })
+    
+    @action(detail=False, methods=['get'])
+    @cached_response('portfolio_performance')
+    def portfolio_performance(self, request):
+        """Returns composition, value series, returns, gain/loss and drawdown between ?start= and ?end= (last year by default)"""
+        dates, error = query_dates(request, 'start', 'end')
+        if error:
+            return error
+        end = dates['end'] or timezone.localdate()
+        start = dates['start'] or end - timedelta(days=365)
+        if start >= end:
+            return Response({'start': 'Must be before end.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Group by asset type
-        composition = {}
-        for asset in assets:
-            asset_type = asset.get_asset_type_display()
-            if asset_type not in composition:
-                composition[asset_type] = {
-                    'name': asset_type,
-                    'value': 0,
-                    'count': 0
-                }
-            composition[asset_type]['value'] += float(asset.current_value)
-            composition[asset_type]['count'] += 1
+        total_value, composition = valuations.composition(request.user)
+        return Response({
+            'total_value': total_value,
+            'composition': composition,
+            'performance': valuations.performance(request.user, start, end),
+        })
+    
+    @action(detail=False, methods=['post'])
+    def revalue(self, request):
+        """Sets the value of several assets at once and appends their valuation history"""
+        rows = request.data.get('valuations') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'valuations': 'Expected a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.ASSET_REVALUATION_MAX_ROWS:
+            return Response(
+                {'valuations': f'At most {settings.ASSET_REVALUATION_MAX_ROWS} valuations per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Add percentage
-        for asset_type in composition:
-            if total_value > 0:
-                composition[asset_type]['percentage'] = (composition[asset_type]['value'] / float(total_value)) * 100
-            else:
-                composition[asset_type]['percentage'] = 0
+        serializer = AssetRevaluationSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            errors = [{'index': index, 'errors': item} for index, item in enumerate(serializer.errors) if item]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
         
+        assets = self.get_queryset().in_bulk({row['id'] for row in serializer.validated_data})
+        errors = [
+            {'index': index, 'errors': {'id': ['Asset not found.']}}
+            for index, row in enumerate(serializer.validated_data) if row['id'] not in assets
+        ]
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated = valuations.revalue(request.user, [
+            {'asset': assets[row['id']], 'value': row['current_value'], 'date': row.get('date')}
+            for row in serializer.validated_data
+        ])
         return Response({
-            'total_value': total_value,
-            'asset_count': assets.count(),
-            'composition': list(composition.values())
+            'valuations': len(serializer.validated_data),
+            'assets': AssetSerializer(updated, many=True).data,
         })
@@ -0,0 +1,91 @@
+"""
+Warm-up of a server process before it takes traffic.
+
+Without it, the first request served by a fresh worker imports the URLconf
+and every view module, compiles the URL patterns, builds its serializer's
+fields from the model metadata and loads the category registry, all on the
+user's time. `warm_up` does that work up front: it resolves every route,
+instantiates the serializer of every API view and action, and preloads the
+default categories and those of the WARMUP_CATEGORY_USERS most recently
+active users.
+
+gunicorn.conf.py runs it once in the master when the application is
+preloaded (the forked workers, recycled ones included, inherit the result)
+and in each worker otherwise. It closes its database connections at the end
+so no connection is shared across fork.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .models import UserStatistics
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+def _callbacks(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _callbacks(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_routes():
+    """Compiles every URL pattern; returns the view callbacks."""
+    resolver = get_resolver()
+    resolver.reverse_dict  # remplit les tables de reverse() et compile les motifs
+    return list(_callbacks(resolver.url_patterns))
+
+
+def warm_serializers(callbacks):
+    """Builds the fields of the serializer of every DRF view and action; returns the number of serializers."""
+    serializers = set()
+    for callback in callbacks:
+        view_class = getattr(callback, 'cls', None)
+        if view_class is None:
+            continue
+        view = view_class(**getattr(callback, 'initkwargs', {}))
+        view.request, view.format_kwarg, view.kwargs = None, None, {}
+        for action in set((getattr(callback, 'actions', None) or {}).values()) or {None}:
+            view.action = action
+            try:
+                serializer_class = view.get_serializer_class()
+            except Exception:
+                # Vue sans sérialiseur, ou qui a besoin de la requête pour le choisir
+                continue
+            if serializer_class in serializers:
+                continue
+            try:
+                serializer_class().fields
+            except Exception:
+                logger.warning('Warm-up could not build %s', serializer_class.__name__, exc_info=True)
+                continue
+            serializers.add(serializer_class)
+    return len(serializers)
+
+
+def warm_categories():
+    """Loads the default categories and those of the most recently active users; returns the number of users."""
+    user_ids = UserStatistics.objects.order_by('-updated_at').values_list('user_id', flat=True)
+    return registry.preload(user_ids[:settings.WARMUP_CATEGORY_USERS])
+
+
+def warm_up():
+    """Warms the current process; returns a summary of what was loaded."""
+    started = time.perf_counter()
+    try:
+        callbacks = warm_routes()
+        summary = {
+            'routes': len(callbacks),
+            'serializers': warm_serializers(callbacks),
+            'category_users': warm_categories(),
+        }
+    finally:
+        connections.close_all()
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
@@ -2,6 +2,7 @@ from django.http import JsonResponse
 from django.db import connection
 from django.conf import settings
 import os
+from core.cache import stats as cache_stats
 
 def health_check(request):
     """Health check endpoint pour diagnostiquer les problèmes"""
@@ -24,5 +25,6 @@ def health_check(request):
         'status': 'healthy' if 'Connected' in db_status else 'unhealthy',
         'database': db_status,
         'environment': env_vars,
+        'response_cache': dict(cache_stats),
         'debug': settings.DEBUG,
     })
\ No newline at end of file
@@ -36,6 +36,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,11 +94,73 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Budget de requêtes SQL par défaut d'une vue (voir core/querybudget.py)
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGET_HEADERS = False
+
+# Durée de vie des réponses mises en cache (invalidées par version de données utilisateur)
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Vues async (/api/async/...) : requêtes indépendantes lancées en parallèle, chacune sur sa
+# connexion dans un pool de threads (voir core/aio.py)
+ASYNC_CONCURRENT_QUERIES = True
+ASYNC_QUERY_THREADS = 8
+
+# Registre des catégories en mémoire : nombre d'utilisateurs gardés par processus
+CATEGORY_REGISTRY_MAX_USERS = 1000
+
+# Utilisateurs authentifiés gardés en mémoire par processus (lectures sans requête SQL) et durée de vie (secondes)
+AUTH_USER_CACHE_MAX_USERS = 10000
+AUTH_USER_CACHE_TTL = 60
+
+# Préchauffage des workers (voir core/warmup.py) : utilisateurs les plus récemment actifs dont les catégories sont chargées
+WARMUP_CATEGORY_USERS = 200
+
+# Suggestions de libellés (GET /api/transactions/suggest/) : index en mémoire par utilisateur,
+# nombre d'utilisateurs gardés par processus, durée de vie d'un index (secondes) et nombre de résultats
+SUGGESTIONS_MAX_USERS = 1000
+SUGGESTIONS_TTL = 3600
+SUGGESTIONS_DEFAULT_LIMIT = 8
+SUGGESTIONS_MAX_LIMIT = 20
+
+# Création de transactions en masse (POST /api/transactions/bulk/)
+BULK_TRANSACTIONS_MAX_ROWS = 5000
+BULK_TRANSACTIONS_BATCH_SIZE = 500
+
+# Prévision de trésorerie (GET /api/transactions/forecast/) : mois d'historique lus et horizon maximal
+FORECAST_HISTORY_MONTHS = 24
+FORECAST_MAX_MONTHS = 12
+
+# Transactions récurrentes (commande run_recurring) : utilisateurs traités par transaction
+RECURRING_USERS_PER_CHUNK = 500
+
+# Import de relevés bancaires : lignes lues et insérées par lot
+IMPORT_CHUNK_SIZE = 2000
+
+# Export en flux : lignes lues par aller-retour base et lignes par bloc envoyé
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_STREAM_ROWS = 500
+
+# Derniers franchissements de seuil renvoyés par GET /api/budgets/alert_events/
+BUDGET_ALERT_EVENTS_LIMIT = 100
+
+# Revalorisation d'actifs en masse (POST /api/assets/revalue/)
+ASSET_REVALUATION_MAX_ROWS = 1000
+
+# Historique de solde d'un compte (GET /api/accounts/{id}/balance_history/) : nombre de jours maximum
+BALANCE_HISTORY_MAX_DAYS = 366
+
 AUTH_USER_MODEL = 'authentication.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -14,6 +14,9 @@ DATABASES = {
     )
 }
 
+# En-têtes X-DB-Queries / X-DB-Time sur chaque réponse
+QUERY_BUDGET_HEADERS = True
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 LOGGING = {
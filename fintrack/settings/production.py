@@ -25,6 +25,32 @@ DATABASES = {
     )
 }
 
+# Cache partagé entre les workers (versions de données utilisateur, cache JWT, réponses, suggestions).
+# Redis dès que REDIS_URL est défini : partagé entre les machines, éviction LRU sans parcours du disque.
+# Sinon cache fichier, limité à une seule machine et qui liste son répertoire à chaque écriture (voir
+# DEPLOY.md) : MAX_ENTRIES explicite, la valeur par défaut de Django (300) ferait évincer les clés de
+# version en continu au-delà de quelques dizaines d'utilisateurs
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+            'LOCATION': os.environ.get('CACHE_LOCATION', '/tmp/fintrack-cache'),
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000)),
+                # Limite atteinte : 1/10 des entrées, tirées au hasard, sont supprimées
+                'CULL_FREQUENCY': int(os.environ.get('CACHE_CULL_FREQUENCY', 10)),
+            },
+        }
+    }
+
 # Security settings
 SECURE_SSL_REDIRECT = os.environ.get('SECURE_SSL_REDIRECT', 'True') == 'True'
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -0,0 +1,95 @@
+"""
+Gunicorn settings for FinTrack (read by start.sh).
+
+Workers are sized from the CPUs and memory available to the container
+(cgroup limits included): 2 x CPUs + 1 workers, as many as fit in memory at
+GUNICORN_WORKER_MEMORY_MB each. When memory allows fewer workers than that,
+each worker gets threads (gthread) to keep the same concurrency, requests
+mostly waiting on the database. SERVER_MODE=asgi uses uvicorn workers.
+WEB_CONCURRENCY and GUNICORN_THREADS override the computed values.
+
+The application is preloaded and warmed up once in the master (see
+core/warmup.py) before the port is opened, so every worker, recycled ones
+included, starts warm. Workers are recycled after GUNICORN_MAX_REQUESTS
+requests, plus a random jitter so they do not all restart at once.
+"""
+import math
+import os
+
+MIB = 1024 * 1024
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_count():
+    """CPUs usable by this process, cgroup quota included."""
+    count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    quota = (_read('/sys/fs/cgroup/cpu.max') or 'max').split()
+    if quota[0] != 'max':
+        count = min(count, math.ceil(int(quota[0]) / int(quota[1])))
+    return max(1, count)
+
+
+def memory_bytes():
+    """Memory available to this process, cgroup limit included."""
+    total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read(path)
+        if limit and limit.isdigit():
+            total = min(total, int(limit))
+    return total
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+asgi = os.environ.get('SERVER_MODE') == 'asgi'
+cpu_workers = 2 * cpu_count() + 1
+memory_workers = max(1, memory_bytes() // (_env_int('GUNICORN_WORKER_MEMORY_MB', 200) * MIB))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = _env_int('WEB_CONCURRENCY', min(cpu_workers, memory_workers))
+threads = _env_int('GUNICORN_THREADS', 1 if asgi else math.ceil(cpu_workers / workers))
+if asgi:
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = 30
+keepalive = 5
+
+
+def _warm_up(log):
+    from core.warmup import warm_up
+    try:
+        log.info('Warm-up done: %s', warm_up())
+    except Exception:
+        # Un préchauffage raté ne doit pas empêcher le démarrage
+        log.exception('Warm-up failed')
+
+
+def on_starting(server):
+    server.log.info(
+        'FinTrack: %s worker(s) %s x %s thread(s) (%s CPU, %s MiB)',
+        server.cfg.workers, server.cfg.worker_class_str, server.cfg.threads, cpu_count(), memory_bytes() // MIB,
+    )
+    # Application préchargée : préchauffée une fois ici, héritée par chaque worker au fork
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
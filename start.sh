@@ -7,6 +7,12 @@ echo "🚀 Starting FinTrack API..."
 echo "📋 Running post-deployment setup..."
 python post_deploy.py
 
-# Démarrer le serveur Gunicorn
+# Démarrer le serveur Gunicorn (workers, préchargement et préchauffage : gunicorn.conf.py)
+# WSGI par défaut, ASGI (workers uvicorn) avec SERVER_MODE=asgi
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "🌐 Starting Gunicorn server (ASGI, uvicorn workers)..."
+    exec gunicorn fintrack.asgi:application -c gunicorn.conf.py
+fi
+
 echo "🌐 Starting Gunicorn server..."
-exec gunicorn fintrack.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+exec gunicorn fintrack.wsgi:application -c gunicorn.conf.py
\ No newline at end of file
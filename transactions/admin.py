@@ -1,11 +1,11 @@
 from django.contrib import admin
-from .models import Transaction, Budget
+from .models import Transaction, Budget, BudgetProgress, BudgetAlertEvent, MonthlyRollup, RecurringSchedule
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['description', 'amount', 'date', 'category', 'account', 'user', 'is_recurring']
-    list_filter = ['category__type', 'is_recurring', 'date', 'created_at']
+    list_filter = ['category_type', 'is_recurring', 'date', 'created_at']
     search_fields = ['description', 'user__email', 'category__name']
     ordering = ['-date', '-created_at']
     date_hierarchy = 'date'
@@ -17,3 +17,35 @@ class BudgetAdmin(admin.ModelAdmin):
     list_filter = ['period', 'is_active', 'created_at']
     search_fields = ['category__name', 'user__email']
     ordering = ['user', 'category__name']
+
+
+@admin.register(BudgetProgress)
+class BudgetProgressAdmin(admin.ModelAdmin):
+    list_display = ['budget', 'period_key', 'spent', 'percentage', 'status', 'user', 'updated_at']
+    list_filter = ['status', 'period_key']
+    search_fields = ['budget__category__name', 'user__email']
+    ordering = ['user', 'budget']
+
+
+@admin.register(BudgetAlertEvent)
+class BudgetAlertEventAdmin(admin.ModelAdmin):
+    list_display = ['budget', 'period_key', 'previous_status', 'status', 'percentage', 'user', 'created_at']
+    list_filter = ['status', 'period_key']
+    search_fields = ['budget__category__name', 'user__email']
+    ordering = ['-created_at']
+
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'month', 'category', 'category_type', 'total', 'count']
+    list_filter = ['category_type', 'month']
+    search_fields = ['user__email', 'category__name']
+    ordering = ['user', '-month']
+
+
+@admin.register(RecurringSchedule)
+class RecurringScheduleAdmin(admin.ModelAdmin):
+    list_display = ['description', 'amount', 'frequency', 'interval', 'next_date', 'user', 'is_active']
+    list_filter = ['frequency', 'is_active']
+    search_fields = ['description', 'user__email']
+    ordering = ['user', 'next_date']
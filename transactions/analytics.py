@@ -0,0 +1,126 @@
+"""
+Grouped aggregation behind TransactionViewSet.analytics.
+
+Months are calendar months in the configured time zone (the same TruncMonth
+buckets the rollups are built on). Everything is computed from one grouped
+query over MonthlyRollup plus one query for the biggest expense, whatever the
+number of months or categories. The two queries are independent: the async
+variant of the endpoint runs them concurrently (QUERIES, see core.aio).
+"""
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import MonthlyRollup, Transaction
+from . import rollups
+
+MAX_MONTHS = 120
+
+
+def month_buckets(count, now=None):
+    """Returns the last `count` calendar months, oldest first, current month included."""
+    this_month = rollups.month_of(now or timezone.now())
+    return [rollups.shift_month(this_month, -i) for i in reversed(range(count))]
+
+
+class AnalyticsEngine:
+    QUERIES = ('grouped_totals', 'biggest_expense')
+
+    def __init__(self, user, months=6, now=None):
+        self.user = user
+        self.period_months = max(1, min(months, MAX_MONTHS))
+        self.months = month_buckets(self.period_months, now)
+
+    @property
+    def start_month(self):
+        return self.months[0]
+
+    def grouped_totals(self):
+        """Returns rows of (month, category_type, category name, total) for the period."""
+        return list(
+            MonthlyRollup.objects
+            .filter(user=self.user, month__gte=self.start_month)
+            .values('month', 'category_type', 'category__name')
+            .annotate(total=Sum('total'))
+            .order_by('category__name')
+        )
+
+    def biggest_expense(self):
+        return (
+            Transaction.objects
+            .filter(
+                user=self.user,
+                local_date__gte=self.start_month,
+                category_type='EXPENSE',
+            )
+            .select_related('category')
+            .order_by('amount')
+            .first()
+        )
+
+    def compute(self, results=None):
+        results = dict(results or {})
+        for name in self.QUERIES:
+            if name not in results:
+                results[name] = getattr(self, name)()
+
+        monthly_totals = {}
+        category_totals = {}
+        for row in results['grouped_totals']:
+            key = (row['month'], row['category_type'])
+            monthly_totals[key] = monthly_totals.get(key, 0) + row['total']
+            if row['category_type'] == 'EXPENSE':
+                amounts = category_totals.setdefault(row['category__name'], {})
+                amounts[row['month']] = amounts.get(row['month'], 0) + row['total']
+
+        # 1. Monthly income vs expenses
+        monthly_data = [
+            {
+                'month': month.strftime('%b'),
+                'income': float(monthly_totals.get((month, 'INCOME'), 0)),
+                'expenses': float(abs(monthly_totals.get((month, 'EXPENSE'), 0)))
+            }
+            for month in self.months
+        ]
+
+        # 2. Category trends
+        category_trends = [
+            {
+                'category': category_name,
+                'data': [
+                    {'month': month.strftime('%b'), 'amount': float(abs(amounts.get(month, 0)))}
+                    for month in self.months
+                ]
+            }
+            for category_name, amounts in category_totals.items()
+        ]
+
+        # 3. Financial insights
+        total_income = sum((total for (_, kind), total in monthly_totals.items() if kind == 'INCOME'), 0)
+        total_expenses = sum((total for (_, kind), total in monthly_totals.items() if kind == 'EXPENSE'), 0)
+
+        savings = total_income + total_expenses  # expenses are negative
+        avg_monthly_savings = savings / self.period_months
+        savings_rate = (savings / total_income * 100) if total_income > 0 else 0
+
+        biggest_expense = results['biggest_expense']
+        biggest_expense_data = None
+        if biggest_expense:
+            biggest_expense_data = {
+                'amount': float(abs(biggest_expense.amount)),
+                'description': biggest_expense.description,
+                'category': biggest_expense.category.name,
+                'date': biggest_expense.date.strftime('%Y-%m-%d')
+            }
+
+        return {
+            'monthly_data': monthly_data,
+            'category_trends': category_trends,
+            'insights': {
+                'avg_monthly_savings': float(avg_monthly_savings),
+                'savings_rate': float(savings_rate),
+                'biggest_expense': biggest_expense_data,
+                'total_income': float(total_income),
+                'total_expenses': float(abs(total_expenses)),
+                'period_months': self.period_months
+            }
+        }
@@ -0,0 +1,40 @@
+"""
+Async variants of the dashboard and analytics endpoints.
+
+Same responses, cache entries and parameters as TransactionViewSet's
+actions; their independent queries run concurrently (see core/aio.py).
+"""
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.aio import async_api_view, gather_queries
+from .analytics import AnalyticsEngine
+from .dashboard import DashboardEngine
+
+
+def _engine_queries(engine):
+    return {name: getattr(engine, name) for name in engine.QUERIES}
+
+
+@async_api_view('dashboard_stats')
+async def dashboard_stats(request):
+    """Async TransactionViewSet.dashboard_stats"""
+    try:
+        wealth_months = int(request.query_params.get('wealth_months', 6))
+    except ValueError:
+        return Response({'wealth_months': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    engine = DashboardEngine(request.user, wealth_months=wealth_months)
+    return Response(engine.compute(await gather_queries(request, _engine_queries(engine))))
+
+
+@async_api_view('analytics')
+async def analytics(request):
+    """Async TransactionViewSet.analytics"""
+    try:
+        period_months = int(request.query_params.get('months', 6))
+    except ValueError:
+        return Response({'months': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    engine = AnalyticsEngine(request.user, months=period_months)
+    return Response(engine.compute(await gather_queries(request, _engine_queries(engine))))
@@ -0,0 +1,309 @@
+"""
+Budget evaluation behind BudgetViewSet.alerts and overview.
+
+A MONTHLY budget is compared with the spending of the current calendar month,
+a YEARLY budget with the spending of the current calendar year (months in the
+configured time zone, as in the rollups). Spent-to-date for every budget of a
+user comes from one grouped query over MonthlyRollup, summing the current
+month and the current year side by side with Case/When.
+
+BudgetProgress keeps that result per budget so alerts is a single read.
+Transaction writes lock the progress rows of the changed categories and
+write `spent`, percentage and status in one UPDATE per budget
+(`record_spending`); a progress row from a past period is recomputed from
+the rollups instead (`sync_progress`), as is a missing one the next time
+alerts reads it. Every status change is recorded as a BudgetAlertEvent.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, Sum, Value, When
+from django.utils import timezone
+
+from core.models import CategoryType
+
+from .models import Budget, BudgetAlertEvent, BudgetPeriod, BudgetProgress, BudgetStatus, MonthlyRollup
+from . import rollups
+
+WARNING_PERCENTAGE = 80
+EXCEEDED_PERCENTAGE = 100
+
+
+def budget_status(percentage):
+    if percentage > EXCEEDED_PERCENTAGE:
+        return BudgetStatus.EXCEEDED
+    if percentage > WARNING_PERCENTAGE:
+        return BudgetStatus.WARNING
+    return BudgetStatus.GOOD
+
+
+def percentage_of(spent, limit):
+    return (spent / limit * 100) if limit > 0 else 0
+
+
+def current_progress(budget):
+    """Returns the progress loaded with the budget (select_related), None when there is none."""
+    try:
+        return budget.progress
+    except BudgetProgress.DoesNotExist:
+        return None
+
+
+class BudgetEngine:
+    def __init__(self, user, now=None):
+        self.user = user
+        self.now = now or timezone.now()
+        self.month = rollups.month_of(self.now)
+        self.year = self.month.replace(month=1)
+
+    def period_window(self, period):
+        """Returns (first month, first month after) of the current window of a budget period."""
+        if period == BudgetPeriod.YEARLY:
+            return self.year, self.year.replace(year=self.year.year + 1)
+        return self.month, rollups.shift_month(self.month, 1)
+
+    def period_key(self, period):
+        if period == BudgetPeriod.YEARLY:
+            return f'{self.year:%Y}'
+        return f'{self.month:%Y-%m}'
+
+    def days_left(self, period):
+        _, end = self.period_window(period)
+        return (rollups.start_of_day(end) - self.now).days
+
+    def active_budgets(self):
+        return list(
+            Budget.objects.filter(user=self.user, is_active=True)
+            .select_related('category')
+            .order_by('category__name')
+        )
+
+    def spent_by_category(self, category_ids):
+        """Returns {category_id: (spent this month, spent this year)} as positive amounts."""
+        if not category_ids:
+            return {}
+        zero = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        rows = (
+            MonthlyRollup.objects
+            .filter(user=self.user, category_id__in=category_ids, month__gte=self.year, month__lte=self.month)
+            .values('category_id')
+            .annotate(
+                month_total=Sum(Case(When(month=self.month, then='total'), default=zero)),
+                year_total=Sum('total'),
+            )
+            .order_by()
+        )
+        return {row['category_id']: (abs(row['month_total']), abs(row['year_total'])) for row in rows}
+
+    def evaluate(self, budgets=None):
+        """Returns one status dict per active budget, for its own period window."""
+        budgets = self.active_budgets() if budgets is None else budgets
+        spent = self.spent_by_category({budget.category_id for budget in budgets})
+
+        results = []
+        for budget in budgets:
+            month_spent, year_spent = spent.get(budget.category_id, (Decimal('0'), Decimal('0')))
+            spent_abs = year_spent if budget.period == BudgetPeriod.YEARLY else month_spent
+            limit = budget.monthly_limit
+            percentage = percentage_of(spent_abs, limit)
+            results.append({
+                'budget': budget,
+                'spent': spent_abs,
+                'limit': limit,
+                'remaining': limit - spent_abs,
+                'percentage': percentage,
+                'status': budget_status(percentage),
+                'days_left': self.days_left(budget.period),
+            })
+        return results
+
+    def alerts(self):
+        """Returns the budgets whose stored progress is not `good` (same thresholds as budget_status)."""
+        budgets = list(
+            Budget.objects.filter(user=self.user, is_active=True)
+            .select_related('category', 'progress')
+            .order_by('category__name')
+        )
+        stale = [
+            budget for budget in budgets
+            if (current_progress(budget) is None
+                or current_progress(budget).period_key != self.period_key(budget.period))
+        ]
+        if stale:
+            # Nouveau mois ou nouvelle année : repartir des rollups
+            self.sync_progress(stale)
+
+        alerts = []
+        for budget in budgets:
+            progress = budget.progress
+            if progress.status != BudgetStatus.GOOD:
+                alerts.append({
+                    'budget_id': budget.id,
+                    'category': budget.category.name,
+                    'period': budget.period,
+                    'spent': progress.spent,
+                    'limit': budget.monthly_limit,
+                    'percentage': round(progress.percentage, 1),
+                    'status': progress.status,
+                })
+        return alerts
+
+    def update_progress(self, budget, progress, spent):
+        """Sets `spent` on the budget progress; returns the BudgetAlertEvent to record if the status changed."""
+        percentage = float(percentage_of(spent, budget.monthly_limit))
+        status = budget_status(percentage)
+        period_key = self.period_key(budget.period)
+        previous_status = progress.status if progress.pk and progress.period_key == period_key else None
+
+        progress.period_key = period_key
+        progress.spent = spent
+        progress.percentage = percentage
+        progress.status = status
+        if status == (previous_status or BudgetStatus.GOOD):
+            return None
+        return BudgetAlertEvent(
+            budget=budget,
+            user_id=budget.user_id,
+            period_key=period_key,
+            previous_status=previous_status,
+            status=status,
+            spent=spent,
+            percentage=percentage,
+        )
+
+    def sync_progress(self, budgets):
+        """Recomputes the progress of `budgets` over their current period from the rollups."""
+        spent = self.spent_by_category({budget.category_id for budget in budgets})
+        created, updated, events = [], [], []
+        for budget in budgets:
+            month_spent, year_spent = spent.get(budget.category_id, (Decimal('0'), Decimal('0')))
+            progress = current_progress(budget) or BudgetProgress(budget=budget, user_id=budget.user_id)
+            total = year_spent if budget.period == BudgetPeriod.YEARLY else month_spent
+            event = self.update_progress(budget, progress, total)
+            if event is not None:
+                events.append(event)
+            (updated if progress.pk else created).append(progress)
+
+        # Requêtes groupées : au changement de mois tous les budgets repartent d'ici
+        now = timezone.now()
+        for progress in updated:
+            progress.updated_at = now
+        BudgetProgress.objects.bulk_update(updated, ['period_key', 'spent', 'percentage', 'status', 'updated_at'])
+        BudgetProgress.objects.bulk_create(created)
+        BudgetAlertEvent.objects.bulk_create(events)
+        return [current_progress(budget) for budget in budgets]
+
+    def record_spending(self, changes):
+        """Applies {(category_id, month): amount} changes of the user's transactions to their budgets."""
+        categories = {category_id for category_id, _ in changes}
+        # Lignes verrouillées jusqu'à la fin de la transaction d'écriture : `spent` se calcule ici et
+        # s'écrit avec le pourcentage et le statut en une requête
+        progresses = list(
+            BudgetProgress.objects.select_for_update(of=('self',))
+            .filter(budget__user=self.user, budget__category_id__in=categories, budget__is_active=True)
+            .select_related('budget')
+        )
+        stale, events = [], []
+        now = timezone.now()
+        for progress in progresses:
+            budget = progress.budget
+            if progress.period_key != self.period_key(budget.period):
+                stale.append(budget)
+                continue
+            start, end = self.period_window(budget.period)
+            # Les dépenses sont négatives : une dépense de plus fait monter `spent`
+            delta = -sum(
+                (amount for (category_id, month), amount in changes.items()
+                 if category_id == budget.category_id and start <= month < end),
+                Decimal('0'),
+            )
+            if not delta:
+                continue
+            event = self.update_progress(budget, progress, progress.spent + delta)
+            progress.updated_at = now
+            BudgetProgress.objects.filter(pk=progress.pk).update(
+                spent=progress.spent, percentage=progress.percentage, status=progress.status, updated_at=now,
+            )
+            if event is not None:
+                events.append(event)
+        BudgetAlertEvent.objects.bulk_create(events)
+        if stale:
+            self.sync_progress(stale)
+
+    def overview(self, results=None):
+        """Returns the summary, per-budget status and chart data of BudgetViewSet.overview."""
+        results = self.evaluate() if results is None else results
+        budget_overview = []
+        expense_data = []
+        total_allocated = Decimal('0')
+        total_spent = Decimal('0')
+
+        for result in results:
+            budget = result['budget']
+            category = budget.category
+            budget_overview.append({
+                'id': budget.id,
+                'category': {
+                    'id': category.id,
+                    'name': category.name,
+                    'color': category.color,
+                    'icon': category.icon
+                },
+                'period': budget.period,
+                'allocated': float(result['limit']),
+                'spent': float(result['spent']),
+                'remaining': float(result['remaining']),
+                'percentage': round(float(result['percentage']), 1),
+                'status': result['status'],
+                'days_left': result['days_left']
+            })
+            if result['spent'] > 0:
+                expense_data.append({
+                    'name': category.name,
+                    'value': float(result['spent']),
+                    'color': category.color
+                })
+            total_allocated += result['limit']
+            total_spent += result['spent']
+
+        overall_percentage = (total_spent / total_allocated * 100) if total_allocated > 0 else 0
+        return {
+            'summary': {
+                'total_allocated': float(total_allocated),
+                'total_spent': float(total_spent),
+                'total_remaining': float(total_allocated - total_spent),
+                'overall_percentage': round(float(overall_percentage), 1),
+                'over_budget_count': sum(1 for result in results if result['status'] == 'exceeded'),
+                'budget_count': len(results)
+            },
+            'budgets': budget_overview,
+            'expense_chart_data': expense_data
+        }
+
+
+def record_spending(changes):
+    """Applies [(user_id, category_id, month, amount)] transaction changes to the budget progress."""
+    by_user = defaultdict(lambda: defaultdict(Decimal))
+    for user_id, category_id, month, amount in changes:
+        by_user[user_id][(category_id, month)] += amount
+    if len(by_user) > 1:
+        # Plusieurs utilisateurs (échéances récurrentes) : seulement ceux qui ont un budget concerné
+        with_budgets = set(
+            Budget.objects.filter(
+                user_id__in=by_user, is_active=True,
+                category_id__in={category_id for changes in by_user.values() for category_id, _ in changes},
+            ).values_list('user_id', flat=True).distinct()
+        )
+        by_user = {user_id: changes for user_id, changes in by_user.items() if user_id in with_budgets}
+    for user_id, user_changes in by_user.items():
+        # Modification sans effet sur les montants (libellé, compte...) : rien à faire
+        user_changes = {key: amount for key, amount in user_changes.items() if amount}
+        if user_changes:
+            BudgetEngine(user_id).record_spending(user_changes)
+
+
+def expense_change(values, sign=1):
+    """Returns the budget change of a transaction given as a dict of tracked fields, [] for income."""
+    if values['category_type'] != CategoryType.EXPENSE:
+        return []
+    return [(values['user_id'], values['category_id'], values['month'], values['amount'] * sign)]
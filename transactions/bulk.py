@@ -0,0 +1,82 @@
+"""
+Bulk transaction creation.
+
+Rows are validated field by field with a light serializer, then category and
+account ownership is checked for the whole batch in two queries. The sign
+rule is applied in memory and rows are inserted with batched bulk_create in
+a single atomic transaction: either every row is created or none is.
+
+bulk_create sends no post_save, so the `transactions_bulk_created` signal
+keeps the monthly rollups and the cache versions up to date.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from core.models import Category, Account
+from .models import Transaction
+from .signals import transactions_bulk_created
+
+
+class TransactionRowSerializer(serializers.ModelSerializer):
+    category_id = serializers.IntegerField()
+    account_id = serializers.IntegerField()
+
+    class Meta:
+        model = Transaction
+        fields = ['amount', 'date', 'description', 'category_id', 'account_id', 'is_recurring', 'metadata']
+
+
+def validate_rows(user, rows):
+    """Returns (validated rows, per-row errors as [{index, errors}])."""
+    row_serializer = TransactionRowSerializer()
+    errors = {}
+    rows_data = []
+    for index, row in enumerate(rows):
+        try:
+            rows_data.append(row_serializer.run_validation(row))
+        except serializers.ValidationError as exc:
+            errors[index] = exc.detail if isinstance(exc.detail, dict) else {'non_field_errors': exc.detail}
+            rows_data.append(None)
+
+    category_ids = {row['category_id'] for row in rows_data if row}
+    account_ids = {row['account_id'] for row in rows_data if row}
+    categories = {
+        category.pk: category
+        for category in Category.objects.filter(Q(user=user) | Q(user__isnull=True), pk__in=category_ids)
+    }
+    owned_accounts = set(Account.objects.filter(user=user, pk__in=account_ids).values_list('pk', flat=True))
+
+    for index, row in enumerate(rows_data):
+        if row is None:
+            continue
+        if row['category_id'] not in categories:
+            errors.setdefault(index, {})['category_id'] = ['Category not found.']
+        if row['account_id'] not in owned_accounts:
+            errors.setdefault(index, {})['account_id'] = ['Account not found.']
+        if index not in errors:
+            row['category'] = categories[row['category_id']]
+
+    return rows_data, [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+
+def create_transactions(user, rows):
+    """Validates and inserts `rows`. Returns (created transactions, errors); nothing is created on error."""
+    rows_data, errors = validate_rows(user, rows)
+    if errors:
+        return [], errors
+
+    instances = []
+    for row in rows_data:
+        category = row.pop('category')
+        row['amount'] = Transaction.signed_amount(row['amount'], category.type)
+        instance = Transaction(user=user, **row)
+        instance.category = category
+        instance.set_denormalized_fields(category.type)
+        instances.append(instance)
+
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(instances, batch_size=settings.BULK_TRANSACTIONS_BATCH_SIZE)
+        transactions_bulk_created.send(sender=Transaction, user_id=user.pk, instances=created)
+    return created, []
@@ -0,0 +1,114 @@
+"""
+Figures behind TransactionViewSet.dashboard_stats.
+
+Each query is a method of DashboardEngine named in QUERIES; they are
+independent of one another, so the async variant of the endpoint can run them
+concurrently (core.aio.gather_queries). `compute` lays out the response from
+their results, running the missing ones in turn.
+"""
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.models import Account, Asset, AssetType
+from core import snapshots
+from .analytics import MAX_MONTHS, month_buckets
+from . import rollups
+
+ASSET_TYPE_LABELS = dict(AssetType.choices)
+
+
+def _change(current, previous):
+    return (current - previous) / abs(previous) * 100 if previous else 0
+
+
+class DashboardEngine:
+    QUERIES = ('month_totals', 'asset_total', 'account_total', 'wealth_snapshots', 'asset_values')
+
+    def __init__(self, user, wealth_months=6, now=None):
+        self.user = user
+        self.this_month = rollups.month_of(now or timezone.now())
+        self.previous_month = rollups.shift_month(self.this_month, -1)
+        self.months = month_buckets(max(1, min(wealth_months, MAX_MONTHS)), now)
+
+    def month_totals(self):
+        """Income and expenses of the current and previous months, from the monthly rollups."""
+        return rollups.totals_by_month(self.user, since=self.previous_month)
+
+    def asset_total(self):
+        return Asset.objects.filter(user=self.user, is_active=True).aggregate(total=Sum('current_value'))['total'] or 0
+
+    def account_total(self):
+        return Account.objects.filter(user=self.user, is_active=True).aggregate(total=Sum('balance'))['total'] or 0
+
+    def wealth_snapshots(self):
+        """Last wealth snapshot of each month of the evolution chart."""
+        return snapshots.monthly_series(self.user, since=self.months[0])
+
+    def asset_values(self):
+        return list(Asset.objects.filter(user=self.user, is_active=True).values_list('asset_type', 'current_value'))
+
+    def compute(self, results=None):
+        results = dict(results or {})
+        for name in self.QUERIES:
+            if name not in results:
+                results[name] = getattr(self, name)()
+
+        totals = results['month_totals']
+
+        def rollup_total(month, category_type):
+            return totals.get((month, category_type), (0, 0))[0] or 0
+
+        current_income = rollup_total(self.this_month, 'INCOME')
+        current_expenses = rollup_total(self.this_month, 'EXPENSE')
+        previous_income = rollup_total(self.previous_month, 'INCOME')
+        previous_expenses = rollup_total(self.previous_month, 'EXPENSE')
+        transactions_count = sum(
+            count for (month, _), (_, count) in totals.items() if month == self.this_month
+        )
+
+        # Patrimoine total (assets + comptes)
+        total_accounts = results['account_total']
+        total_wealth = results['asset_total'] + total_accounts
+
+        # Épargne ce mois (revenus - dépenses), les dépenses sont négatives
+        current_savings = current_income + current_expenses
+        previous_savings = previous_income + previous_expenses
+
+        # Évolution du patrimoine : dernier snapshot de chaque mois, mois courant en direct
+        wealth_by_month = {snapshot.date.replace(day=1): snapshot.total for snapshot in results['wealth_snapshots']}
+        wealth_by_month[self.months[-1]] = total_wealth
+        wealth_evolution = [
+            {'month': month.strftime('%b'), 'wealth': round(float(wealth_by_month[month]), 2)}
+            for month in self.months
+            if month in wealth_by_month
+        ]
+        previous_wealth = wealth_by_month.get(self.months[-2]) if len(self.months) > 1 else None
+        wealth_change = ((total_wealth - previous_wealth) / previous_wealth * 100) if previous_wealth else 0
+
+        # Composition du patrimoine par type d'actif, les comptes comme "Liquidités"
+        asset_composition = {}
+        for asset_type, value in results['asset_values']:
+            name = ASSET_TYPE_LABELS.get(asset_type, asset_type)
+            asset_composition[name] = asset_composition.get(name, 0) + float(value)
+        if total_accounts > 0:
+            asset_composition['Liquidités'] = float(total_accounts)
+        composition = [
+            {'name': name, 'size': value, 'index': index}
+            for index, (name, value) in enumerate(asset_composition.items())
+        ]
+
+        return {
+            'current_month': {
+                'total_wealth': float(total_wealth),
+                'wealth_change': float(wealth_change),
+                'income': float(current_income),
+                'income_change': float(_change(current_income, previous_income)) if previous_income > 0 else 0.0,
+                'expenses': float(abs(current_expenses)),
+                'expenses_change': float(_change(abs(current_expenses), abs(previous_expenses))),
+                'savings': float(current_savings),
+                'savings_change': float(_change(current_savings, previous_savings)),
+                'transactions_count': transactions_count
+            },
+            'wealth_evolution': wealth_evolution,
+            'wealth_composition': composition
+        }
@@ -0,0 +1,165 @@
+"""
+Cash-flow forecast behind TransactionViewSet.forecast.
+
+The projected balance of the coming months is the current balance of the
+user's active accounts plus, for every month:
+
+- the occurrences of the active recurring schedules falling in it (including
+  due ones not materialized yet), at their exact amount;
+- for every category, its seasonal average: the mean of the same calendar
+  month over the history (at most FORECAST_HISTORY_MONTHS complete months,
+  from the first to the last month with transactions), or the mean of all
+  history months when that calendar month was never seen.
+
+The history is read in one query (occurrences created by a schedule left
+out, the schedules stand for them; transactions only flagged is_recurring
+stay in the averages, nothing projects them) and laid out as NumPy arrays: amounts in integer
+cents, day index since the start of the history and category code. Totals
+per category and month, seasonal averages and the projection are array
+operations, whatever the number of transactions. The current month only
+counts its remaining days.
+"""
+from calendar import monthrange
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.models import Account
+from core.registry import registry
+from .models import RecurringSchedule, Transaction
+from . import recurring, rollups
+
+
+def _month_numbers(days):
+    """Months since 1970-01 of a datetime64[D] array (month of the year = value % 12)."""
+    return days.astype('datetime64[M]').astype(np.int64)
+
+
+def load_history(user, start, end):
+    """Returns (cents, day index since `start`, category ids) of the transactions in [start, end) not made by a schedule."""
+    rows = list(
+        Transaction.objects
+        .filter(user=user, local_date__gte=start, local_date__lt=end, schedule__isnull=True)
+        .order_by()
+        .values_list('amount', 'local_date', 'category_id')
+    )
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    amounts, days, category_ids = zip(*rows)
+    cents = np.fromiter((int(amount * 100) for amount in amounts), dtype=np.int64, count=len(rows))
+    day_index = (np.array(days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    return cents, day_index, np.array(category_ids, dtype=np.int64)
+
+
+def seasonal_averages(totals, history_months):
+    """Returns the (categories x 12) average in cents of each category per calendar month.
+
+    `totals` is categories x history months, `history_months` the month numbers of its columns.
+    """
+    seen = history_months[None, :] % 12 == np.arange(12)[:, None]
+    counts = seen.sum(axis=1)
+    sums = totals @ seen.T
+    return np.where(counts > 0, sums / np.maximum(counts, 1), totals.mean(axis=1, keepdims=True))
+
+
+class ForecastEngine:
+    def __init__(self, user, months=6, today=None):
+        self.user = user
+        self.months = max(1, min(months, settings.FORECAST_MAX_MONTHS))
+        self.today = today or timezone.localdate()
+        self.this_month = self.today.replace(day=1)
+        self.future = [rollups.shift_month(self.this_month, delta) for delta in range(self.months)]
+
+    def seasonal_projection(self):
+        """Returns (category ids, categories x future months projected cents)."""
+        start = rollups.shift_month(self.this_month, -settings.FORECAST_HISTORY_MONTHS)
+        cents, day_index, category_ids = load_history(self.user, start, self.this_month)
+        if not cents.size:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, self.months))
+
+        categories, codes = np.unique(category_ids, return_inverse=True)
+        first_month = _month_numbers(np.array([start], dtype='datetime64[D]'))[0]
+        month_index = _month_numbers(np.datetime64(start, 'D') + day_index) - first_month
+
+        # Historique borné aux mois avec des transactions : pas de mois vides avant l'inscription ni après la dernière saisie
+        first_seen = month_index.min()
+        history_months = np.arange(first_seen, month_index.max() + 1)
+        totals = np.zeros((len(categories), len(history_months)))
+        np.add.at(totals, (codes, month_index - first_seen), cents)
+
+        averages = seasonal_averages(totals, first_month + history_months)
+        future_months = _month_numbers(np.array(self.future, dtype='datetime64[D]'))
+        projected = averages[:, future_months % 12]
+        # Mois en cours : seulement les jours restants
+        days_in_month = monthrange(self.today.year, self.today.month)[1]
+        projected[:, 0] *= (days_in_month - self.today.day) / days_in_month
+        return categories, projected
+
+    def recurring_projection(self):
+        """Returns the (future months) cents of the active schedules' occurrences, income and expenses (positive) apart."""
+        last_month = self.future[-1]
+        until = last_month.replace(day=monthrange(last_month.year, last_month.month)[1])
+        cents, months = [], []
+        schedules = RecurringSchedule.objects.filter(
+            user=self.user, is_active=True, next_date__isnull=False, next_date__lte=until
+        ).select_related('category')
+        for schedule in schedules:
+            amount = int(Transaction.signed_amount(schedule.amount, schedule.category.type) * 100)
+            dates, _ = recurring.due_occurrences(schedule, until)
+            for day in dates:
+                cents.append(amount)
+                # Occurrences échues pas encore créées : pas encore dans les soldes, comptées ce mois-ci
+                months.append(max(day.replace(day=1), self.this_month))
+
+        income = np.zeros(self.months)
+        expenses = np.zeros(self.months)
+        if cents:
+            cents = np.array(cents, dtype=np.int64)
+            positions = np.searchsorted(np.array(self.future, dtype='datetime64[D]'), np.array(months, dtype='datetime64[D]'))
+            np.add.at(income, positions[cents > 0], cents[cents > 0])
+            np.add.at(expenses, positions[cents < 0], -cents[cents < 0])
+        return income, expenses
+
+    def compute(self):
+        balance = Account.objects.filter(user=self.user, is_active=True).aggregate(total=Sum('balance'))['total'] or 0
+        start_cents = int(balance * 100)
+
+        categories, projected = self.seasonal_projection()
+        income = np.where(projected > 0, projected, 0).sum(axis=0)
+        expenses = np.where(projected < 0, -projected, 0).sum(axis=0)
+        recurring_income, recurring_expenses = self.recurring_projection()
+
+        net = income - expenses + recurring_income - recurring_expenses
+        balances = start_cents + np.cumsum(net)
+
+        category_totals = projected.sum(axis=1)
+        order = np.argsort(-np.abs(category_totals))
+        by_category = []
+        for position in order:
+            category = registry.get(int(categories[position]), self.user.pk)
+            by_category.append({
+                'category': int(categories[position]),
+                'name': category.name if category else None,
+                'projected': round(float(category_totals[position]) / 100, 2),
+            })
+
+        return {
+            'months': self.months,
+            'start_balance': round(start_cents / 100, 2),
+            'end_balance': round(float(balances[-1]) / 100, 2),
+            'series': [
+                {
+                    'month': month.strftime('%Y-%m'),
+                    'income': round(float(income[index] + recurring_income[index]) / 100, 2),
+                    'expenses': round(float(expenses[index] + recurring_expenses[index]) / 100, 2),
+                    'recurring_income': round(float(recurring_income[index]) / 100, 2),
+                    'recurring_expenses': round(float(recurring_expenses[index]) / 100, 2),
+                    'net': round(float(net[index]) / 100, 2),
+                    'balance': round(float(balances[index]) / 100, 2),
+                }
+                for index, month in enumerate(self.future)
+            ],
+            'categories': by_category,
+        }
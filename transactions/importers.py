@@ -0,0 +1,372 @@
+"""
+Bank statement import (CSV, OFX, QIF).
+
+Parsers are generators: the file is read line by line and yields one
+`StatementRow` (or `RowError`) per operation, so memory does not depend on
+the file size. `StatementImporter` consumes them in chunks of `chunk_size`;
+each chunk costs one query to drop rows already imported (content hash,
+unique per user) and one batched bulk_create, then sends
+`transactions_bulk_created` so rollups and cache versions follow. The
+ledger is rebuilt once after the last chunk, from the earliest imported
+date: per chunk, a statement listed newest first would rebuild the whole
+tail of the account again and again.
+
+The hash covers the account, the bank reference when the format has one
+(OFX FITID), otherwise the date, amount, description and an ordinal that
+tells apart identical operations of the same day, counted over the whole
+file (rows need not be sorted; the counter keeps one entry per distinct
+operation). Importing the same file twice creates nothing the second time.
+
+Chunks are committed as they go, so the encoding is checked over the whole
+file first (`check_encoding`): a bad byte near the end must not leave the
+first chunks imported.
+"""
+import codecs
+import csv
+import hashlib
+import re
+from collections import Counter, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from core import statistics
+from core.cache import bump_data_version
+from core.models import Category, CategoryType
+from .models import Transaction
+from .signals import transactions_bulk_created
+from . import ledger, rollups
+
+FORMATS = ('csv', 'ofx', 'qif')
+EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.ofx': 'ofx', '.qfx': 'ofx', '.qif': 'qif'}
+DEFAULT_COLUMNS = {'date': 'date', 'amount': 'amount', 'description': 'description', 'category': 'category'}
+DEFAULT_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d.%m.%Y', '%d-%m-%Y')
+FALLBACK_CATEGORIES = {CategoryType.INCOME: 'Autres revenus', CategoryType.EXPENSE: 'Autres dépenses'}
+MAX_AMOUNT = Decimal('1e10')
+MAX_REPORTED_ERRORS = 100
+
+StatementRow = namedtuple('StatementRow', 'line date amount description category reference')
+RowError = namedtuple('RowError', 'line message')
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_AMOUNT_NOISE = re.compile(r'[\s\u00a0\u202f€$£]')
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be read as a statement of the requested format."""
+
+
+def check_encoding(binary, encoding, block_size=64 * 1024):
+    """Decodes a binary file from start to end without keeping it, then rewinds it."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    offset = 0
+    binary.seek(0)
+    try:
+        while block := binary.read(block_size):
+            decoder.decode(block)
+            offset += len(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f'not a valid {encoding} file (byte {offset + exc.start})')
+    finally:
+        binary.seek(0)
+
+
+def detect_format(filename):
+    for extension, file_format in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def parse_amount(text):
+    value = _AMOUNT_NOISE.sub('', text or '')
+    if ',' in value and '.' in value:
+        # Le dernier séparateur est le séparateur décimal (1.234,56 ou 1,234.56)
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    else:
+        value = value.replace(',', '.')
+    try:
+        amount = Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite():
+        raise ValueError(f'Invalid amount: {text!r}')
+    return amount
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text, date_format=None):
+    # Mise en cache : un relevé répète les mêmes dates sur des milliers de lignes
+    text = text.strip()
+    for candidate in ([date_format] if date_format else DEFAULT_DATE_FORMATS):
+        try:
+            return datetime.strptime(text, candidate).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Invalid date: {text!r}')
+
+
+def parse_csv(lines, columns=None, delimiter=None, date_format=None):
+    """Yields the rows of a CSV statement with a header line; `columns` maps fields to header names."""
+    lines = iter(lines)
+    header = next(lines, '')
+    if delimiter is None:
+        delimiter = max(';,\t', key=header.count)
+    reader = csv.reader(chain([header], lines), delimiter=delimiter)
+    names = [name.strip().lower() for name in next(reader, [])]
+
+    positions = {}
+    for field, column in {**DEFAULT_COLUMNS, **(columns or {})}.items():
+        if column and column.lower() in names:
+            positions[field] = names.index(column.lower())
+    missing = [DEFAULT_COLUMNS.get(field, field) for field in ('date', 'amount') if field not in positions]
+    if missing:
+        raise ImportFormatError(f"Missing CSV columns: {', '.join(missing)}")
+
+    def cell(record, field):
+        position = positions.get(field)
+        if position is None or position >= len(record):
+            return ''
+        return record[position].strip()
+
+    for record in reader:
+        if not any(value.strip() for value in record):
+            continue
+        try:
+            yield StatementRow(
+                reader.line_num,
+                parse_date(cell(record, 'date'), date_format),
+                parse_amount(cell(record, 'amount')),
+                cell(record, 'description'),
+                cell(record, 'category'),
+                None,
+            )
+        except ValueError as exc:
+            yield RowError(reader.line_num, str(exc))
+
+
+def _ofx_row(line, values):
+    posted = values.get('DTPOSTED', '')
+    day = datetime.strptime(posted[:8], '%Y%m%d').date()
+    description = ' '.join(part for part in (values.get('NAME'), values.get('MEMO')) if part)
+    return StatementRow(line, day, parse_amount(values.get('TRNAMT', '')), description, '', values.get('FITID') or None)
+
+
+def parse_ofx(lines):
+    """Yields the STMTTRN records of an OFX 1.x (SGML) or 2.x (XML) statement."""
+    record, start = None, None
+    for number, line in enumerate(lines, 1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and record is not None:
+                    try:
+                        yield _ofx_row(start, record)
+                    except ValueError as exc:
+                        yield RowError(start, str(exc))
+                    record = None
+                elif not closing:
+                    record, start = {}, number
+            elif record is not None and not closing and value.strip():
+                record[tag] = value.strip()
+
+
+def _qif_row(line, values, date_format):
+    raw_date = values.get('D', '').replace("'", '/').replace(' ', '')
+    category = values.get('L', '')
+    if category.startswith('['):
+        # Virement vers un autre compte, pas une catégorie
+        category = ''
+    return StatementRow(
+        line,
+        parse_date(raw_date, date_format),
+        parse_amount(values.get('T') or values.get('U', '')),
+        values.get('P') or values.get('M', ''),
+        category.split(':')[0],
+        None,
+    )
+
+
+def parse_qif(lines, date_format=None):
+    """Yields the records of a QIF statement (one field per line, records end with ^)."""
+    record, start = {}, None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                try:
+                    yield _qif_row(start, record, date_format)
+                except ValueError as exc:
+                    yield RowError(start, str(exc))
+            record = {}
+            continue
+        if not record:
+            start = number
+        record.setdefault(code, value)
+
+
+def parse_statement(lines, file_format, columns=None, delimiter=None, date_format=None):
+    if file_format == 'csv':
+        return parse_csv(lines, columns=columns, delimiter=delimiter, date_format=date_format)
+    if file_format == 'ofx':
+        return parse_ofx(lines)
+    if file_format == 'qif':
+        return parse_qif(lines, date_format=date_format)
+    raise ImportFormatError(f'Unsupported format: {file_format}')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class StatementImporter:
+    """Imports parsed statement rows into one account of a user."""
+
+    def __init__(self, user, account, income_category=None, expense_category=None, chunk_size=None):
+        self.user = user
+        self.account = account
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+
+        # Catégories par nom, celles de l'utilisateur masquant les catégories par défaut
+        categories = Category.objects.filter(Q(user=user) | Q(user__isnull=True)).order_by(F('user').asc(nulls_first=True), 'id')
+        self.categories = {}
+        last_of_type = {}
+        for category in categories:
+            self.categories[category.name.lower()] = category
+            last_of_type[category.type] = category
+        self.defaults = {
+            CategoryType.INCOME: income_category,
+            CategoryType.EXPENSE: expense_category,
+        }
+        for category_type, fallback in FALLBACK_CATEGORIES.items():
+            if self.defaults[category_type] is None:
+                named = self.categories.get(fallback.lower())
+                self.defaults[category_type] = named if named and named.type == category_type else last_of_type.get(category_type)
+
+        self._days = {}
+        self._ledger_since = {}
+        self._ordinals = Counter()
+
+    def row_hash(self, row):
+        if row.reference:
+            source = f'{self.account.pk}|ref|{row.reference}'
+        else:
+            # Compteur sur tout le fichier : rien ne garantit que le relevé soit groupé par jour
+            key = (row.date, row.amount, row.description)
+            ordinal = self._ordinals[key]
+            self._ordinals[key] += 1
+            source = f'{self.account.pk}|{row.date.isoformat()}|{row.amount}|{row.description}|{ordinal}'
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def category_for(self, row):
+        if row.category:
+            category = self.categories.get(row.category.lower())
+            if category is not None:
+                return category
+        return self.defaults[CategoryType.EXPENSE if row.amount < 0 else CategoryType.INCOME]
+
+    def start_of_day(self, day):
+        if day not in self._days:
+            self._days[day] = rollups.start_of_day(day)
+        return self._days[day]
+
+    def build(self, row, category, digest):
+        instance = Transaction(
+            user_id=self.user.pk,
+            account_id=self.account.pk,
+            category_id=category.pk,
+            date=self.start_of_day(row.date),
+            amount=Transaction.signed_amount(row.amount, category.type),
+            description=(row.description or 'Import')[:255],
+            metadata={'reference': row.reference} if row.reference else {},
+            import_hash=digest,
+        )
+        Transaction.category.field.set_cached_value(instance, category)
+        instance.set_denormalized_fields(category.type)
+        return instance
+
+    def run(self, rows):
+        """Returns the import report: rows read, created, duplicates and errors."""
+        result = {'rows': 0, 'created': 0, 'duplicates': 0, 'errors': 0, 'error_details': []}
+        try:
+            for chunk in chunked(rows, self.chunk_size):
+                self.import_chunk(chunk, result)
+        finally:
+            # Lots déjà validés : le solde doit les suivre même si la suite de l'import échoue
+            self.rebuild_ledger()
+        return result
+
+    def rebuild_ledger(self):
+        """Recomputes the running totals and balances from the earliest date imported so far."""
+        if not self._ledger_since:
+            return
+        with transaction.atomic():
+            ledger.rebuild_many(self._ledger_since)
+            statistics.refresh_accounts(self.user.pk)
+            bump_data_version(self.user.pk)
+        self._ledger_since = {}
+
+    def add_error(self, result, line, message):
+        result['errors'] += 1
+        if len(result['error_details']) < MAX_REPORTED_ERRORS:
+            result['error_details'].append({'line': line, 'error': message})
+
+    def import_chunk(self, chunk, result):
+        pending = {}
+        for row in chunk:
+            result['rows'] += 1
+            if isinstance(row, RowError):
+                self.add_error(result, row.line, row.message)
+                continue
+            if not row.amount or abs(row.amount) >= MAX_AMOUNT:
+                self.add_error(result, row.line, f'Invalid amount: {row.amount}')
+                continue
+            category = self.category_for(row)
+            if category is None:
+                self.add_error(result, row.line, 'No category available for this operation')
+                continue
+
+            digest = self.row_hash(row)
+            if digest in pending:
+                result['duplicates'] += 1
+                continue
+            pending[digest] = (row, category)
+
+        if not pending:
+            return
+        existing = set(
+            Transaction.objects.filter(user=self.user, import_hash__in=list(pending))
+            .order_by().values_list('import_hash', flat=True)
+        )
+        result['duplicates'] += len(existing)
+        instances = [
+            self.build(row, category, digest)
+            for digest, (row, category) in pending.items() if digest not in existing
+        ]
+        if not instances:
+            return
+
+        with transaction.atomic():
+            created = Transaction.objects.bulk_create(instances, batch_size=settings.BULK_TRANSACTIONS_BATCH_SIZE)
+            transactions_bulk_created.send(
+                sender=Transaction, user_id=self.user.pk, instances=created, defer_ledger=True
+            )
+        for instance in created:
+            since = self._ledger_since.get(instance.account_id)
+            if since is None or instance.date < since:
+                self._ledger_since[instance.account_id] = instance.date
+        result['created'] += len(created)
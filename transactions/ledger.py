@@ -0,0 +1,292 @@
+"""
+Account ledger.
+
+An account's balance is its opening_balance plus the sum of its
+transactions. Every transaction stores `running_total`, the sum of the
+account's transactions up to and including itself in (date, created_at, id)
+order, so the balance at any point in time is one lookup on the
+txn_account_keyset_idx index: opening_balance + the last running_total
+before that point.
+
+Writes lock the account row (an edit locks it before reading the stored row,
+`lock_stored`), then move Account.balance and the running totals of the
+later transactions with F() expressions over a keyset range; nothing
+re-sums the history. An edit that keeps the account and the date moves the
+row and the later ones in a single UPDATE. Bulk paths (bulk endpoint, statement import) and
+cascades recompute the running totals from the earliest date they touched;
+a statement import does it once, after its last chunk.
+
+Account.balance moving without a post_save, every path that moves it asks
+for today's WealthSnapshot of the account owners to be rewritten on commit.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from core import snapshots
+from core.models import Account
+from .models import TRACKED_FIELDS, Transaction
+from .pagination import keyset_q
+from . import rollups
+
+LEDGER_ORDER = ('date', 'created_at', 'id')
+ACCOUNT_LEDGER_ORDER = ('account_id', *LEDGER_ORDER)
+REBUILD_BATCH_SIZE = 2000
+
+
+def lock_accounts(*account_ids):
+    """Locks the account rows (in id order) until the end of the transaction; returns their owners' ids."""
+    ids = sorted({account_id for account_id in account_ids if account_id is not None})
+    rows = Account.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'user_id')
+    return {user_id for pk, user_id in rows}
+
+
+def _lock_moving(*account_ids):
+    """Locks accounts whose balance is about to move and refreshes their owners' snapshot on commit."""
+    snapshots.take_snapshots_on_commit(lock_accounts(*account_ids))
+
+
+def _total_before(account_id, condition, exclude=None):
+    rows = Transaction.objects.filter(account_id=account_id).filter(condition)
+    if exclude is not None:
+        rows = rows.exclude(pk=exclude)
+    total = rows.order_by('-date', '-created_at', '-id').values_list('running_total', flat=True).first()
+    return total or 0
+
+
+def _shift(account_id, condition, delta, exclude=None):
+    rows = Transaction.objects.filter(account_id=account_id).filter(condition)
+    if exclude is not None:
+        rows = rows.exclude(pk=exclude)
+    rows.update(running_total=F('running_total') + delta)
+
+
+def _move_balance(account_id, delta):
+    Account.objects.filter(pk=account_id).update(balance=F('balance') + delta)
+
+
+def lock_stored(instance):
+    """Locks the accounts of a stored transaction, then returns its stored values (None once deleted).
+
+    Same order as every ledger write, the account before its transactions:
+    once it returns, nothing moves the row or its account until the end of
+    the caller's transaction.
+    """
+    locked = set()
+    account_ids = {instance.account_id}
+    while True:
+        lock_accounts(*account_ids)
+        locked |= account_ids
+        stored = Transaction.objects.filter(pk=instance.pk).values(
+            *TRACKED_FIELDS, 'description', 'created_at', 'running_total'
+        ).first()
+        if stored is None or stored['account_id'] in locked:
+            return stored
+        # La ligne est sur un autre compte (changement de compte) : le verrouiller aussi, puis relire
+        account_ids = {stored['account_id']}
+
+
+def before_save(instance, previous):
+    """Moves the account balances and running totals for the transaction about to be written.
+
+    Runs inside the atomic block of Transaction.save, before the row is
+    written. For an edit, `previous` comes from `lock_stored` and the
+    accounts are already locked.
+    """
+    if instance._state.adding or not previous:
+        # Le déplacement du solde verrouille le compte jusqu'à la fin de la transaction
+        _move_balance(instance.account_id, instance.amount)
+        snapshots.take_snapshots_on_commit([instance.user_id])
+        # Les transactions du même jour déjà en base ont été créées avant : elles précèdent
+        instance.running_total = _total_before(instance.account_id, Q(date__lte=instance.date)) + instance.amount
+        _shift(instance.account_id, Q(date__gt=instance.date), instance.amount)
+        return
+
+    same_account = previous['account_id'] == instance.account_id
+    delta = instance.amount - previous['amount']
+    if same_account and previous['date'] == instance.date:
+        if delta:
+            # Même position : la ligne et les suivantes bougent de la différence, en une requête
+            snapshots.take_snapshots_on_commit([instance.user_id])
+            key = (instance.date, instance.created_at, instance.pk)
+            _shift(instance.account_id, keyset_q(key, lookup='gt') | Q(pk=instance.pk), delta)
+            _move_balance(instance.account_id, delta)
+            instance.running_total = previous['running_total'] + delta
+        return
+
+    snapshots.take_snapshots_on_commit({previous['user_id'], instance.user_id})
+    old_key = (previous['date'], instance.created_at, instance.pk)
+    _shift(previous['account_id'], keyset_q(old_key, lookup='gt'), -previous['amount'])
+
+    new_key = (instance.date, instance.created_at, instance.pk)
+    instance.running_total = _total_before(instance.account_id, keyset_q(new_key), exclude=instance.pk) + instance.amount
+    # Transaction.save n'écrit jamais running_total (valeur chargée peut-être périmée) : écrit ici, sous verrou
+    Transaction.objects.filter(pk=instance.pk).update(running_total=instance.running_total)
+    _shift(instance.account_id, keyset_q(new_key, lookup='gt'), instance.amount, exclude=instance.pk)
+
+    if not same_account:
+        _move_balance(previous['account_id'], -previous['amount'])
+        _move_balance(instance.account_id, instance.amount)
+    elif delta:
+        _move_balance(instance.account_id, delta)
+
+
+def remove(instance):
+    """Takes a deleted transaction out of its account ledger."""
+    # Le déplacement du solde verrouille le compte (déjà verrouillé par Transaction.delete)
+    _move_balance(instance.account_id, -instance.amount)
+    snapshots.take_snapshots_on_commit([instance.user_id])
+    key = (instance.date, instance.created_at, instance.pk)
+    _shift(instance.account_id, keyset_q(key, lookup='gt'), -instance.amount)
+
+
+def rebuild(account_id, since=None):
+    """Recomputes the running totals from `since` (all history when None) and the account balance.
+
+    Returns the number of transactions whose running total changed.
+    """
+    with transaction.atomic():
+        _lock_moving(account_id)
+        rows = Transaction.objects.filter(account_id=account_id)
+        if since is not None:
+            total = _total_before(account_id, Q(date__lt=since))
+            rows = rows.filter(date__gte=since)
+        else:
+            total = 0
+
+        changed = 0
+        last_key = None
+        while True:
+            # Pages par clé : pas de curseur ouvert pendant les mises à jour
+            page = rows.filter(keyset_q(last_key, lookup='gt')) if last_key else rows
+            batch = list(
+                page.order_by(*LEDGER_ORDER)
+                .values_list('date', 'created_at', 'id', 'amount', 'running_total')[:REBUILD_BATCH_SIZE]
+            )
+            if not batch:
+                break
+            updates = []
+            for date, created_at, pk, amount, stored in batch:
+                total += amount
+                if stored != total:
+                    updates.append(Transaction(pk=pk, running_total=total))
+            Transaction.objects.bulk_update(updates, ['running_total'])
+            changed += len(updates)
+            last_key = batch[-1][:3]
+
+        Account.objects.filter(pk=account_id).update(balance=F('opening_balance') + total)
+    return changed
+
+
+def rebuild_many(earliest):
+    """Recomputes several accounts given as {account_id: since}, in one pass over their rows.
+
+    Same result as one `rebuild` per account, with a constant number of
+    queries per REBUILD_BATCH_SIZE rows instead of a few per account.
+    """
+    if len(earliest) <= 1:
+        for account_id, since in earliest.items():
+            rebuild(account_id, since=since)
+        return
+    with transaction.atomic():
+        _lock_moving(*earliest)
+        # Total de chaque compte avant sa date de départ, en une requête
+        before = (
+            Transaction.objects.filter(account_id=OuterRef('pk'), date__lt=OuterRef('since'))
+            .order_by('-date', '-created_at', '-id').values('running_total')[:1]
+        )
+        totals = dict(
+            Account.objects.filter(pk__in=earliest)
+            .annotate(
+                since=Case(*[When(pk=pk, then=Value(since)) for pk, since in earliest.items()], output_field=DateTimeField()),
+                before=Coalesce(Subquery(before), Value(Decimal('0')), output_field=DecimalField()),
+            )
+            .values_list('pk', 'before')
+        )
+
+        by_since = defaultdict(list)
+        for account_id, since in earliest.items():
+            by_since[since].append(account_id)
+        condition = Q()
+        for since, account_ids in by_since.items():
+            condition |= Q(account_id__in=account_ids, date__gte=since)
+        rows = Transaction.objects.filter(condition)
+
+        last_key = None
+        while True:
+            page = rows.filter(keyset_q(last_key, fields=ACCOUNT_LEDGER_ORDER, lookup='gt')) if last_key else rows
+            batch = list(
+                page.order_by(*ACCOUNT_LEDGER_ORDER)
+                .values_list('account_id', 'date', 'created_at', 'id', 'amount', 'running_total')[:REBUILD_BATCH_SIZE]
+            )
+            if not batch:
+                break
+            updates = []
+            for account_id, date, created_at, pk, amount, stored in batch:
+                totals[account_id] += amount
+                if stored != totals[account_id]:
+                    updates.append(Transaction(pk=pk, running_total=totals[account_id]))
+            Transaction.objects.bulk_update(updates, ['running_total'])
+            last_key = batch[-1][:4]
+
+        Account.objects.filter(pk__in=totals).update(
+            balance=F('opening_balance') + Case(
+                *[When(pk=pk, then=Value(total)) for pk, total in totals.items()],
+                output_field=DecimalField(),
+            )
+        )
+
+
+def rebuild_after_bulk(instances):
+    """Recomputes the accounts touched by bulk-created transactions from their earliest date."""
+    earliest = {}
+    for instance in instances:
+        if instance.account_id not in earliest or instance.date < earliest[instance.account_id]:
+            earliest[instance.account_id] = instance.date
+    rebuild_many(earliest)
+
+
+def defer_rebuild(origin, instance):
+    """Records a transaction deleted by a cascade; the origin's own post_delete rebuilds once."""
+    pending = origin.__dict__.setdefault('_ledger_rebuilds', {})
+    if instance.account_id not in pending or instance.date < pending[instance.account_id]:
+        pending[instance.account_id] = instance.date
+
+
+def run_deferred_rebuilds(origin):
+    """Rebuilds the accounts recorded by defer_rebuild; returns their ids."""
+    pending = origin.__dict__.pop('_ledger_rebuilds', {})
+    rebuild_many(pending)
+    return list(pending)
+
+
+def balance_at(account, day):
+    """Returns the account balance at the end of the local day `day`."""
+    end = rollups.start_of_day(day + timedelta(days=1))
+    return account.opening_balance + _total_before(account.pk, Q(date__lt=end))
+
+
+def daily_balances(account, start, end):
+    """Returns [(day, balance)] for every local day from `start` to `end` included."""
+    balance = balance_at(account, start - timedelta(days=1))
+    closing = {}
+    rows = (
+        Transaction.objects
+        .filter(account=account, date__gte=rollups.start_of_day(start), date__lt=rollups.start_of_day(end + timedelta(days=1)))
+        .order_by(*LEDGER_ORDER)
+        .values_list('local_date', 'running_total')
+    )
+    for day, running_total in rows:
+        closing[day] = account.opening_balance + running_total
+
+    series = []
+    day = start
+    while day <= end:
+        balance = closing.get(day, balance)
+        series.append((day, balance))
+        day += timedelta(days=1)
+    return series
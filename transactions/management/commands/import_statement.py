@@ -0,0 +1,93 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from core.models import Account, Category
+from transactions.importers import (
+    FORMATS, ImportFormatError, StatementImporter, check_encoding, detect_format, parse_statement,
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import a bank statement (CSV, OFX or QIF) into an account'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement file')
+        parser.add_argument('--user', required=True, help='Email of the account owner')
+        parser.add_argument('--account', required=True, help='Account id or name')
+        parser.add_argument('--format', choices=FORMATS, help='Statement format (detected from the extension by default)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='File encoding (e.g. latin-1)')
+        parser.add_argument('--delimiter', help='CSV delimiter (detected from the header by default)')
+        parser.add_argument('--date-format', help='strptime format of the dates (e.g. %%m/%%d/%%Y)')
+        parser.add_argument(
+            '--column', action='append', default=[], metavar='FIELD=HEADER',
+            help='CSV header of a field (date, amount, description, category)'
+        )
+        parser.add_argument('--income-category', type=int, help='Category id for uncategorized credits')
+        parser.add_argument('--expense-category', type=int, help='Category id for uncategorized debits')
+        parser.add_argument('--chunk-size', type=int, help='Rows inserted per batch')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user']).first()
+        if not user:
+            raise CommandError(f"User {options['user']} not found")
+
+        accounts = Account.objects.filter(user=user)
+        account_ref = options['account']
+        account = accounts.filter(pk=account_ref).first() if account_ref.isdigit() else None
+        account = account or accounts.filter(name=account_ref).first()
+        if not account:
+            raise CommandError(f'Account {account_ref} not found')
+
+        file_format = options['format'] or detect_format(options['path'])
+        if not file_format:
+            raise CommandError('Cannot detect the statement format, use --format')
+
+        columns = {}
+        for mapping in options['column']:
+            field, _, header = mapping.partition('=')
+            if not header:
+                raise CommandError(f'Invalid column mapping: {mapping}')
+            columns[field.strip()] = header.strip()
+
+        importer = StatementImporter(
+            user, account,
+            income_category=self.get_category(user, options['income_category']),
+            expense_category=self.get_category(user, options['expense_category']),
+            chunk_size=options['chunk_size'],
+        )
+
+        start = time.perf_counter()
+        try:
+            # Encodage vérifié sur tout le fichier avant d'importer le premier lot
+            with open(options['path'], 'rb') as binary:
+                check_encoding(binary, options['encoding'])
+            with open(options['path'], encoding=options['encoding'], newline='') as statement:
+                rows = parse_statement(
+                    statement, file_format, columns=columns,
+                    delimiter=options['delimiter'], date_format=options['date_format'],
+                )
+                result = importer.run(rows)
+        except (OSError, LookupError) as exc:
+            raise CommandError(str(exc))
+        except ImportFormatError as exc:
+            raise CommandError(f'Cannot read the statement: {exc}')
+        elapsed = time.perf_counter() - start
+
+        for error in result['error_details']:
+            self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['error']}"))
+        rate = result['rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully imported {result['created']} transactions "
+            f"({result['rows']} rows, {result['duplicates']} duplicates, {result['errors']} errors) "
+            f"in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        ))
+
+    def get_category(self, user, category_id):
+        if category_id is None:
+            return None
+        category = Category.objects.filter(pk=category_id).first()
+        if not category or (category.user_id and category.user_id != user.pk):
+            raise CommandError(f'Category {category_id} not found')
+        return category
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from core.models import Account
+from transactions import ledger
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute the running totals of transactions and the account balances from their opening balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the accounts of this user email')
+        parser.add_argument('--account', type=int, help='Only rebuild this account id')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('pk')
+        if options['user']:
+            users = User.objects.filter(email=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f"User {options['user']} not found"))
+                return
+            accounts = accounts.filter(user__in=users)
+        if options['account']:
+            accounts = accounts.filter(pk=options['account'])
+
+        account_ids = list(accounts.values_list('pk', flat=True))
+        changed = sum(ledger.rebuild(account_id) for account_id in account_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt {len(account_ids)} account ledgers ({changed} running totals fixed)'
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_date
+from transactions import recurring
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Create the due occurrences of the recurring transaction schedules (to run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Create occurrences up to this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--user', help='Only run the schedules of this user email')
+        parser.add_argument('--shard', help='Only run the users whose id is K modulo N, given as K/N')
+        parser.add_argument('--chunk-size', type=int, help='Users processed per transaction')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['date']:
+            until = parse_date(options['date'])
+            if until is None:
+                raise CommandError('--date must be a date (YYYY-MM-DD)')
+
+        shard = None
+        if options['shard']:
+            try:
+                index, count = (int(part) for part in options['shard'].split('/'))
+            except ValueError:
+                raise CommandError('--shard must be given as K/N')
+            if count < 1 or not 0 <= index < count:
+                raise CommandError('--shard K/N needs 0 <= K < N')
+            shard = (index, count)
+
+        users = None
+        if options['user']:
+            users = User.objects.filter(email=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f"User {options['user']} not found"))
+                return
+
+        created, schedules = recurring.run(until=until, users=users, shard=shard, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully created {created} transactions from {schedules} schedules'))
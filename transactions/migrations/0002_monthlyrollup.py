@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:04
+
+import django.db.models.deletion
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyRollup = apps.get_model('transactions', 'MonthlyRollup')
+    rows = (
+        Transaction.objects
+        .annotate(month=TruncMonth('date', output_field=models.DateField(), tzinfo=ZoneInfo(settings.TIME_ZONE)))
+        .values('user_id', 'month', 'category_id', 'category__type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    MonthlyRollup.objects.bulk_create([
+        MonthlyRollup(
+            user_id=row['user_id'],
+            month=row['month'],
+            category_id=row['category_id'],
+            category_type=row['category__type'],
+            total=row['total'],
+            count=row['count'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_asset'),
+        ('transactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month, in the configured time zone')),
+                ('category_type', models.CharField(max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='rollup_user_month_idx')],
+                'unique_together': {('user', 'month', 'category')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_wealthsnapshot'),
+        ('transactions', '0002_monthlyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='txn_user_keyset_idx'),
+        ),
+    ]
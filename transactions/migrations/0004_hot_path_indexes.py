@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_metadata_index(apps, schema_editor):
+    # Index GIN sur metadata (requêtes de containment), PostgreSQL uniquement
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS txn_metadata_gin_idx '
+            'ON transactions_transaction USING gin (metadata jsonb_path_ops)'
+        )
+
+
+def drop_metadata_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS txn_metadata_gin_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_hot_path_indexes'),
+        ('transactions', '0003_transaction_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='budget_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'date'], name='txn_user_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date', 'created_at', 'id'], name='txn_account_keyset_idx'),
+        ),
+        migrations.RunPython(create_metadata_index, drop_metadata_index),
+    ]
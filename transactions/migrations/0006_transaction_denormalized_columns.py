@@ -0,0 +1,50 @@
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_denormalized_columns(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Category = apps.get_model('core', 'Category')
+    Transaction.objects.update(
+        category_type=Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('type')[:1])
+    )
+
+    tz = ZoneInfo(settings.TIME_ZONE)
+    batch = []
+    for pk, value in Transaction.objects.order_by().values_list('pk', 'date').iterator(chunk_size=2000):
+        day = value.astimezone(tz).date()
+        batch.append(Transaction(pk=pk, local_date=day, month=day.replace(day=1)))
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['local_date', 'month'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['local_date', 'month'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_hot_path_indexes'),
+        ('transactions', '0005_transaction_import_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='category_type',
+            field=models.CharField(editable=False, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='local_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='month',
+            field=models.DateField(editable=False, help_text='First day of the local month', null=True),
+        ),
+        migrations.RunPython(fill_denormalized_columns, migrations.RunPython.noop),
+    ]
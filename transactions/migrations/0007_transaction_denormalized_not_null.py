@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Séparée du remplissage : PostgreSQL refuse de modifier la table dans la même
+    # transaction que des mises à jour avec des contraintes différées en attente
+
+    dependencies = [
+        ('transactions', '0006_transaction_denormalized_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='category_type',
+            field=models.CharField(editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='local_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='month',
+            field=models.DateField(editable=False, help_text='First day of the local month'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'local_date', 'category_type', 'amount'], name='txn_user_day_type_idx'),
+        ),
+    ]
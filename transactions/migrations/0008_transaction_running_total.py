@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def fill_running_totals(apps, schema_editor):
+    # Le solde saisi reste le solde actuel : le solde d'ouverture en est déduit
+    Account = apps.get_model('core', 'Account')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    for account in list(Account.objects.order_by('pk')):
+        total = 0
+        batch = []
+        rows = Transaction.objects.filter(account_id=account.pk).order_by('date', 'created_at', 'id')
+        for pk, amount in list(rows.values_list('pk', 'amount')):
+            total += amount
+            batch.append(Transaction(pk=pk, running_total=total))
+            if len(batch) >= 2000:
+                Transaction.objects.bulk_update(batch, ['running_total'])
+                batch = []
+        if batch:
+            Transaction.objects.bulk_update(batch, ['running_total'])
+        Account.objects.filter(pk=account.pk).update(opening_balance=account.balance - total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_account_opening_balance'),
+        ('transactions', '0007_transaction_denormalized_not_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='running_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(fill_running_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_transaction_running_total'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_key', models.CharField(help_text='YYYY-MM for monthly budgets, YYYY for yearly ones', max_length=7)),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('percentage', models.FloatField(default=0)),
+                ('status', models.CharField(choices=[('good', 'Good'), ('warning', 'Warning'), ('exceeded', 'Exceeded')], default='good', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('budget', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='transactions.budget')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Budget progress',
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_key', models.CharField(max_length=7)),
+                ('previous_status', models.CharField(blank=True, choices=[('good', 'Good'), ('warning', 'Warning'), ('exceeded', 'Exceeded')], max_length=10, null=True)),
+                ('status', models.CharField(choices=[('good', 'Good'), ('warning', 'Warning'), ('exceeded', 'Exceeded')], max_length=10)),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('percentage', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_events', to='transactions.budget')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='budget_event_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from core import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor, 'transactions_transaction', [('description', 'A')])
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor, 'transactions_transaction')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_index'),
+        ('transactions', '0009_budget_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
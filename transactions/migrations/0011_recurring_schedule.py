@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:56
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_index'),
+        ('transactions', '0010_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='occurrence',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('frequency', models.CharField(choices=[('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly'), ('YEARLY', 'Yearly')], default='MONTHLY', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Every `interval` weeks, months or years')),
+                ('start_date', models.DateField(help_text='First occurrence; also gives the day of the month or of the year')),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_date', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.account')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'next_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='schedule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='transactions.recurringschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('schedule', 'occurrence'), name='txn_schedule_occurrence_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringschedule',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'next_date'], name='schedule_user_due_idx'),
+        ),
+    ]
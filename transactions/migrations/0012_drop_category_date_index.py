@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_recurring_schedule'),
+    ]
+
+    operations = [
+        # Les budgets lisent MonthlyRollup : plus aucune requête ne filtre sur (user, category, date)
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_user_category_date_idx',
+        ),
+    ]
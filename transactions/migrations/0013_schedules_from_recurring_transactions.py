@@ -0,0 +1,80 @@
+from calendar import monthrange
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+FREQUENCIES = {'weekly': 'WEEKLY', 'monthly': 'MONTHLY', 'yearly': 'YEARLY'}
+# Au-delà de ce retard, la série saisie à la main est considérée comme arrêtée
+STOPPED_AFTER = timedelta(days=7)
+
+
+def next_occurrence(frequency, start, last):
+    # Même règle que recurring.following, figée ici pour la migration
+    if frequency == 'WEEKLY':
+        return last + timedelta(weeks=1)
+    step = 12 if frequency == 'YEARLY' else 1
+    index = last.year * 12 + last.month - 1 + step
+    year, month = divmod(index, 12)
+    month += 1
+    return start.replace(year=year, month=month, day=min(start.day, monthrange(year, month)[1]))
+
+
+def create_schedules(apps, schema_editor):
+    # Les transactions marquées is_recurring avec metadata['frequency'] deviennent des échéanciers :
+    # une série par (utilisateur, compte, catégorie, libellé, montant, fréquence), occurrences rattachées
+    Transaction = apps.get_model('transactions', 'Transaction')
+    RecurringSchedule = apps.get_model('transactions', 'RecurringSchedule')
+    today = timezone.localdate()
+
+    rows = (
+        Transaction.objects
+        .filter(is_recurring=True, schedule__isnull=True, metadata__has_key='frequency')
+        .order_by('user_id', 'account_id', 'category_id', 'description', 'amount', 'local_date', 'id')
+        .values_list('id', 'user_id', 'account_id', 'category_id', 'description', 'amount', 'local_date', 'metadata')
+    )
+    series = {}
+    for pk, user_id, account_id, category_id, description, amount, day, metadata in rows.iterator(chunk_size=2000):
+        frequency = FREQUENCIES.get(str(metadata.get('frequency', '')).lower())
+        if frequency is None or not amount:
+            continue
+        key = (user_id, account_id, category_id, description, amount, frequency)
+        series.setdefault(key, []).append((pk, day))
+
+    batch = []
+    for (user_id, account_id, category_id, description, amount, frequency), occurrences in series.items():
+        start, last = occurrences[0][1], occurrences[-1][1]
+        next_date = next_occurrence(frequency, start, last)
+        schedule = RecurringSchedule.objects.create(
+            user_id=user_id,
+            account_id=account_id,
+            category_id=category_id,
+            description=description,
+            amount=abs(amount),
+            frequency=frequency,
+            start_date=start,
+            next_date=next_date,
+            # Pas de rattrapage des occurrences d'une série que l'utilisateur n'a plus saisie
+            is_active=next_date >= today - STOPPED_AFTER,
+        )
+        seen = set()
+        for pk, day in occurrences:
+            # Deux saisies le même jour : une seule porte l'occurrence (unique par échéancier)
+            batch.append(Transaction(pk=pk, schedule_id=schedule.pk, occurrence=None if day in seen else day))
+            seen.add(day)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['schedule', 'occurrence'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['schedule', 'occurrence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0012_drop_category_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedules, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import json
 
 
+# Champs dont dépendent le ledger, les rollups, les budgets et les statistiques
+TRACKED_FIELDS = ['user_id', 'category_id', 'category_type', 'account_id', 'date', 'month', 'amount']
+
+
 class Transaction(models.Model):
     amount = models.DecimalField(
         max_digits=12, 
@@ -18,21 +22,108 @@ class Transaction(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     is_recurring = models.BooleanField(default=False)
     metadata = models.JSONField(default=dict, blank=True)
+    # Copies dénormalisées pour filtrer sans jointure ni conversion de date (remplies par save
+    # et les chemins bulk, category_type suivi quand une catégorie change de type)
+    category_type = models.CharField(max_length=10, editable=False)
+    local_date = models.DateField(editable=False)
+    month = models.DateField(editable=False, help_text="First day of the local month")
+    # Somme des transactions du compte jusqu'à celle-ci incluse, dans l'ordre (date, created_at, id) :
+    # solde du compte à ce moment = account.opening_balance + running_total (voir ledger.py)
+    running_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    # Empreinte des lignes importées depuis un relevé (dédoublonnage, voir importers.py)
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # Occurrence générée par un échéancier récurrent (voir recurring.py) : une seule par date
+    schedule = models.ForeignKey(
+        'RecurringSchedule', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='transactions', editable=False
+    )
+    occurrence = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date', '-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'import_hash'], name='txn_user_import_hash_uniq'),
+            models.UniqueConstraint(fields=['schedule', 'occurrence'], name='txn_schedule_occurrence_uniq'),
+        ]
+        indexes = [
+            # Liste, pagination par curseur et filtres de date par utilisateur
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='txn_user_keyset_idx'),
+            # Historique d'un compte (?account=, soldes)
+            models.Index(fields=['account', 'date', 'created_at', 'id'], name='txn_account_keyset_idx'),
+            # Sommes revenus/dépenses par période : parcours d'index seul (montant inclus)
+            models.Index(fields=['user', 'local_date', 'category_type', 'amount'], name='txn_user_day_type_idx'),
+        ]
         
     def __str__(self):
         return f"{self.description} - {self.amount}€ ({self.date.strftime('%Y-%m-%d')})"
     
+    @staticmethod
+    def signed_amount(amount, category_type):
+        """Expenses are stored negative, income positive."""
+        if category_type == 'EXPENSE':
+            return abs(amount) * -1
+        return abs(amount)
+    
+    def get_category_type(self):
+        """Returns the category type, from the loaded category or the registry, without a query if possible."""
+        if not Transaction.category.is_cached(self):
+            from core.registry import registry
+            info = registry.get(self.category_id, self.user_id)
+            if info is not None:
+                return info.type
+        return self.category.type
+    
+    def set_denormalized_fields(self, category_type=None):
+        """Fills category_type, local_date and month from the category and the date."""
+        from .rollups import local_date
+        self.category_type = category_type or self.get_category_type()
+        self.local_date = local_date(self.date)
+        self.month = self.local_date.replace(day=1)
+    
     def save(self, *args, **kwargs):
-        if self.category.type == 'EXPENSE':
-            self.amount = abs(self.amount) * -1
-        else:
-            self.amount = abs(self.amount)
-        super().save(*args, **kwargs)
+        self.set_denormalized_fields()
+        # Décimal dès maintenant : le ledger fait ses calculs avant l'écriture
+        amount = self._meta.get_field('amount').to_python(self.amount)
+        self.amount = self.signed_amount(amount, self.category_type)
+        # Le ledger (signaux pre_save/post_save) déplace les soldes dans la même transaction
+        with transaction.atomic():
+            if self.pk is not None and not kwargs.get('force_insert'):
+                self._load_stored_values()
+            if not self._state.adding and not kwargs.get('force_insert'):
+                update_fields = kwargs.pop('update_fields', None)
+                if update_fields is None:
+                    update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+                # Le total cumulé peut avoir bougé en base depuis le chargement : seul le ledger l'écrit, sous verrou
+                kwargs['update_fields'] = [name for name in update_fields if name != 'running_total'] or ['updated_at']
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        # Pas de point de sauvegarde : une erreur annule de toute façon la suppression entière
+        with transaction.atomic(savepoint=False):
+            # Comme save : les signaux retirent ce qui est en base, pas les valeurs peut-être périmées de l'instance
+            for field, value in (self._load_stored_values() or {}).items():
+                setattr(self, field, value)
+            return super().delete(*args, **kwargs)
+    
+    def _load_stored_values(self):
+        """Locks the row's accounts and keeps its stored values in `_loaded_values` for the signal receivers.
+
+        The deltas (ledger, rollups, budgets, statistics) start from what is
+        in the database, not from the values loaded with the instance: two
+        requests editing the same row would otherwise write back totals that
+        no longer match it. Must run inside the atomic block of the write.
+        """
+        from .ledger import lock_stored
+        stored = lock_stored(self)
+        self._loaded_values = stored
+        if stored is not None and self._state.adding:
+            # Instance construite à la main avec le pk d'une ligne existante : c'est une modification,
+            # à sa position dans le ledger (date, created_at, id)
+            self._state.adding = False
+            self.created_at = self.created_at or stored['created_at']
+        return stored
 
 
 class BudgetPeriod(models.TextChoices):
@@ -59,12 +150,130 @@ class Budget(models.Model):
     
     class Meta:
         unique_together = ['category', 'user', 'period']
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_active=True), name='budget_user_active_idx'),
+        ]
         
     def __str__(self):
         return f"{self.category.name} - {self.monthly_limit}€/{self.period.lower()}"
     
+    def save(self, *args, **kwargs):
+        # Décimal dès maintenant : la progression est recalculée dans post_save
+        self.monthly_limit = self._meta.get_field('monthly_limit').to_python(self.monthly_limit)
+        super().save(*args, **kwargs)
+    
     @property
     def yearly_limit(self):
         if self.period == BudgetPeriod.YEARLY:
             return self.monthly_limit
         return self.monthly_limit * 12
+
+
+class BudgetStatus(models.TextChoices):
+    GOOD = 'good', 'Good'
+    WARNING = 'warning', 'Warning'
+    EXCEEDED = 'exceeded', 'Exceeded'
+
+
+class BudgetProgress(models.Model):
+    """Spending of a budget over its current period, maintained from Transaction writes."""
+    budget = models.OneToOneField(Budget, on_delete=models.CASCADE, related_name='progress')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    period_key = models.CharField(max_length=7, help_text="YYYY-MM for monthly budgets, YYYY for yearly ones")
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    percentage = models.FloatField(default=0)
+    status = models.CharField(max_length=10, choices=BudgetStatus.choices, default=BudgetStatus.GOOD)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Budget progress"
+        
+    def __str__(self):
+        return f"{self.budget_id} {self.period_key}: {self.spent}€ ({self.status})"
+
+
+class BudgetAlertEvent(models.Model):
+    """A budget crossing a threshold (status change) during a period."""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alert_events')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    period_key = models.CharField(max_length=7)
+    previous_status = models.CharField(max_length=10, choices=BudgetStatus.choices, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=BudgetStatus.choices)
+    spent = models.DecimalField(max_digits=14, decimal_places=2)
+    percentage = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='budget_event_user_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.budget_id} {self.period_key}: {self.previous_status} -> {self.status}"
+
+
+class MonthlyRollup(models.Model):
+    """Monthly totals per user and category, maintained from Transaction writes."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month, in the configured time zone")
+    category = models.ForeignKey('core.Category', on_delete=models.CASCADE)
+    category_type = models.CharField(max_length=10)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'month', 'category']
+        indexes = [
+            models.Index(fields=['user', 'month'], name='rollup_user_month_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category_id}: {self.total}€ ({self.count})"
+
+
+class RecurrenceFrequency(models.TextChoices):
+    WEEKLY = 'WEEKLY', 'Weekly'
+    MONTHLY = 'MONTHLY', 'Monthly'
+    YEARLY = 'YEARLY', 'Yearly'
+
+
+class RecurringSchedule(models.Model):
+    """Template of a recurring transaction; `run_recurring` materializes its due occurrences."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    account = models.ForeignKey('core.Account', on_delete=models.CASCADE)
+    category = models.ForeignKey('core.Category', on_delete=models.CASCADE)
+    description = models.CharField(max_length=255)
+    amount = models.DecimalField(
+        max_digits=12, 
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    frequency = models.CharField(
+        max_length=10, 
+        choices=RecurrenceFrequency.choices, 
+        default=RecurrenceFrequency.MONTHLY
+    )
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Every `interval` weeks, months or years")
+    start_date = models.DateField(help_text="First occurrence; also gives the day of the month or of the year")
+    end_date = models.DateField(null=True, blank=True)
+    # Prochaine occurrence pas encore créée (None quand l'échéancier est terminé)
+    next_date = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['user', 'next_date']
+        indexes = [
+            # Échéanciers dus, parcourus par tranches d'utilisateurs
+            models.Index(fields=['user', 'next_date'], condition=models.Q(is_active=True), name='schedule_user_due_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.description} - {self.amount}€/{self.frequency.lower()}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.next_date is None:
+            self.next_date = self.start_date
+        super().save(*args, **kwargs)
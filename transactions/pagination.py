@@ -0,0 +1,126 @@
+"""
+Keyset (cursor) pagination for the transaction list.
+
+Pages are sliced on the (date, created_at, id) key of the default ordering
+instead of an OFFSET, and no COUNT(*) is issued, so every page costs one
+range scan on the txn_user_keyset_idx index whatever its depth.
+
+The order is fixed: `?ordering=` is rejected with a cursor, and `?search=`
+still filters the rows but pages come in date order, not by relevance.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KEYSET_FIELDS = ('date', 'created_at', 'id')
+
+
+def keyset_q(values, fields=KEYSET_FIELDS, lookup='lt'):
+    """Returns a Q matching rows strictly before (`lt`) or after (`gt`) the key `values`."""
+    condition = Q()
+    for index, field in enumerate(fields):
+        equal = {name: value for name, value in zip(fields[:index], values[:index])}
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[index]})
+    # Borne sur la première colonne seule : le planificateur en tire une plage d'index
+    return Q(**{f'{fields[0]}__{lookup}e': values[0]}) & condition
+
+
+class TransactionKeysetPagination(BasePagination):
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_message = 'Cursor pagination has a fixed order (-date, -created_at).'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({api_settings.ORDERING_PARAM: [self.ordering_message]})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        key, reverse = self.decode_cursor(request)
+
+        descending = [f'-{field}' for field in KEYSET_FIELDS]
+        if key is None:
+            rows = list(queryset.order_by(*descending)[:page_size + 1])
+        elif not reverse:
+            rows = list(queryset.filter(keyset_q(key)).order_by(*descending)[:page_size + 1])
+        else:
+            rows = list(queryset.filter(keyset_q(key, lookup='gt')).order_by(*KEYSET_FIELDS)[:page_size + 1])
+
+        has_more = len(rows) > page_size
+        page = rows[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            key = (datetime.fromisoformat(data['d']), datetime.fromisoformat(data['c']), int(data['i']))
+            return key, bool(data.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, transaction, reverse=False):
+        data = {
+            'd': transaction.date.isoformat(),
+            'c': transaction.created_at.isoformat(),
+            'i': transaction.pk,
+            'r': int(reverse),
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,156 @@
+"""
+Recurring transactions.
+
+A RecurringSchedule is the template of a recurring transaction and keeps the
+date of its next occurrence not created yet (`next_date`). `run` walks the
+due schedules of every user (or of one shard of users) in chunks of user
+ids; per chunk, in one transaction: one locked read of the due schedules,
+occurrences computed in memory, one query for those already created, one
+bulk_create of the new transactions and one bulk_update of the schedules.
+
+Generated transactions carry their schedule and occurrence date, unique
+together (txn_schedule_occurrence_uniq), and are inserted with
+ignore_conflicts: a run can be repeated, or overlap another one, without
+creating duplicates. Monthly and yearly occurrences keep the day of
+start_date, moved to the last day of shorter months.
+"""
+from calendar import monthrange
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .models import RecurrenceFrequency, RecurringSchedule, Transaction
+from .signals import transactions_bulk_created
+from . import rollups
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, monthrange(year, month)[1]))
+
+
+def following(schedule, day):
+    """Returns the occurrence of `schedule` after the one of `day`."""
+    if schedule.frequency == RecurrenceFrequency.WEEKLY:
+        return day + timedelta(weeks=schedule.interval)
+    step = schedule.interval * (12 if schedule.frequency == RecurrenceFrequency.YEARLY else 1)
+    # Compté depuis start_date : le 31 reste le 31 après un mois de 30 jours
+    start = schedule.start_date
+    elapsed = (day.year - start.year) * 12 + day.month - start.month
+    return add_months(start, elapsed + step)
+
+
+def due_occurrences(schedule, until):
+    """Returns (the occurrence dates from next_date up to `until`, the next date after them or None)."""
+    dates = []
+    day = schedule.next_date
+    while day is not None and day <= until:
+        if schedule.end_date and day > schedule.end_date:
+            break
+        dates.append(day)
+        day = following(schedule, day)
+    if day is not None and schedule.end_date and day > schedule.end_date:
+        day = None
+    return dates, day
+
+
+def occurrence_transaction(schedule, day):
+    category_type = schedule.category.type
+    instance = Transaction(
+        user_id=schedule.user_id,
+        account_id=schedule.account_id,
+        category=schedule.category,
+        description=schedule.description,
+        amount=Transaction.signed_amount(schedule.amount, category_type),
+        date=rollups.start_of_day(day),
+        is_recurring=True,
+        metadata={'frequency': schedule.frequency.lower()},
+        schedule=schedule,
+        occurrence=day,
+    )
+    instance.set_denormalized_fields(category_type)
+    return instance
+
+
+def materialize(user_ids, until):
+    """Creates the due occurrences of the users' active schedules; returns (transactions, schedules)."""
+    with transaction.atomic():
+        # Verrou sans attente : un autre run en parallèle passe les échéanciers déjà pris
+        schedules = list(
+            RecurringSchedule.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(user_id__in=user_ids, is_active=True, next_date__lte=until)
+            .select_related('category')
+            .order_by('pk')
+        )
+        if not schedules:
+            return 0, 0
+
+        pending = []
+        for schedule in schedules:
+            dates, schedule.next_date = due_occurrences(schedule, until)
+            pending.extend((schedule, day) for day in dates)
+
+        existing = set()
+        if pending:
+            existing = set(
+                Transaction.objects
+                .filter(schedule__in=schedules, occurrence__gte=min(day for _, day in pending), occurrence__lte=until)
+                .order_by().values_list('schedule_id', 'occurrence')
+            )
+        instances = [
+            occurrence_transaction(schedule, day)
+            for schedule, day in pending
+            if (schedule.pk, day) not in existing
+        ]
+        Transaction.objects.bulk_create(
+            instances, batch_size=settings.BULK_TRANSACTIONS_BATCH_SIZE, ignore_conflicts=True
+        )
+
+        now = timezone.now()
+        for schedule in schedules:
+            schedule.updated_at = now
+        RecurringSchedule.objects.bulk_update(schedules, ['next_date', 'updated_at'])
+
+        if instances:
+            # Un seul signal pour le lot : registres, agrégats et statistiques en requêtes groupées
+            transactions_bulk_created.send(sender=Transaction, user_id=None, instances=instances)
+    return len(instances), len(schedules)
+
+
+def run(until=None, users=None, shard=None, chunk_size=None):
+    """Materializes every due occurrence up to `until` (today by default).
+
+    `users` restricts the run to a queryset of users, `shard` to the users
+    whose id is `index` modulo `count` when given as (index, count), so that
+    several processes can share the work. Returns (transactions, schedules).
+    """
+    until = until or timezone.localdate()
+    chunk_size = chunk_size or settings.RECURRING_USERS_PER_CHUNK
+    due = RecurringSchedule.objects.filter(is_active=True, next_date__lte=until)
+    if users is not None:
+        due = due.filter(user__in=users)
+    if shard is not None:
+        index, count = shard
+        due = due.annotate(shard=Mod('user_id', count)).filter(shard=index)
+
+    created = processed = 0
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            due.filter(user_id__gt=last_user_id)
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+            .distinct()[:chunk_size]
+        )
+        if not user_ids:
+            return created, processed
+        chunk_created, chunk_schedules = materialize(user_ids, until)
+        created += chunk_created
+        processed += chunk_schedules
+        last_user_id = user_ids[-1]
@@ -0,0 +1,198 @@
+"""
+Maintenance of the MonthlyRollup table.
+
+Each Transaction contributes its amount and a count of 1 to the row keyed by
+(user, local month, category). Writes go through `apply`, which uses F()
+expressions so concurrent requests never lose an update.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import MonthlyRollup, Transaction
+
+
+def local_date(value):
+    """Returns the calendar date of `value` in the configured time zone."""
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return timezone.localtime(value).date()
+    return value
+
+
+def month_of(value):
+    return local_date(value).replace(day=1)
+
+
+def start_of_day(day):
+    """Returns the aware datetime at which `day` starts in the configured time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def shift_month(month, delta):
+    index = month.year * 12 + month.month - 1 + delta
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def apply(user_id, month, category_id, category_type, total, count):
+    filters = {'user_id': user_id, 'month': month, 'category_id': category_id}
+    updated = MonthlyRollup.objects.filter(**filters).update(
+        total=F('total') + total,
+        count=F('count') + count,
+        category_type=category_type,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRollup.objects.create(
+                category_type=category_type, total=total, count=count, **filters
+            )
+    except IntegrityError:
+        # Une autre requête a créé la ligne entre-temps
+        MonthlyRollup.objects.filter(**filters).update(
+            total=F('total') + total,
+            count=F('count') + count,
+        )
+
+
+def record(instance, sign=1):
+    """Adds (sign=1) or removes (sign=-1) a saved transaction from the rollups."""
+    apply(
+        instance.user_id,
+        instance.month,
+        instance.category_id,
+        instance.category_type,
+        instance.amount * sign,
+        sign,
+    )
+
+
+def unrecord_values(values):
+    """Removes a transaction described by its previously loaded field values."""
+    apply(
+        values['user_id'],
+        values['month'],
+        values['category_id'],
+        values['category_type'],
+        -values['amount'],
+        -1,
+    )
+
+
+def record_change(previous, instance):
+    """Moves an edited transaction from its previous field values to its saved ones.
+
+    Same month and category: a single UPDATE by the difference.
+    """
+    if (previous['user_id'], previous['month'], previous['category_id']) != (
+        instance.user_id, instance.month, instance.category_id
+    ):
+        unrecord_values(previous)
+        record(instance)
+        return
+    apply(
+        instance.user_id,
+        instance.month,
+        instance.category_id,
+        instance.category_type,
+        instance.amount - previous['amount'],
+        0,
+    )
+
+
+def record_many(instances):
+    """Adds a batch of transactions (bulk paths), possibly of several users, in a few batched queries.
+
+    The existing rows are locked and updated with one bulk_update, the missing
+    ones inserted with one bulk_create; if another request created one of them
+    meanwhile, those keys fall back to `apply`.
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    types = {}
+    for instance in instances:
+        key = (instance.user_id, instance.month, instance.category_id)
+        deltas[key][0] += instance.amount
+        deltas[key][1] += 1
+        types[key] = instance.category_type
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        rows = MonthlyRollup.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _, _ in deltas},
+            month__in={month for _, month, _ in deltas},
+            category_id__in={category_id for _, _, category_id in deltas},
+        )
+        existing = {(row.user_id, row.month, row.category_id): row for row in rows}
+        updated = []
+        for key, row in existing.items():
+            if key in deltas:
+                row.total += deltas[key][0]
+                row.count += deltas[key][1]
+                updated.append(row)
+        MonthlyRollup.objects.bulk_update(updated, ['total', 'count'])
+
+        missing = [key for key in deltas if key not in existing]
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.bulk_create([
+                    MonthlyRollup(
+                        user_id=user_id, month=month, category_id=category_id,
+                        category_type=types[user_id, month, category_id],
+                        total=deltas[user_id, month, category_id][0], count=deltas[user_id, month, category_id][1],
+                    )
+                    for user_id, month, category_id in missing
+                ])
+        except IntegrityError:
+            # Une autre requête a créé une de ces lignes entre-temps
+            for key in missing:
+                apply(*key, types[key], *deltas[key])
+
+
+def rebuild(users=None):
+    """Recomputes the rollups from raw transactions. Returns the number of rows written."""
+    queryset = Transaction.objects.all()
+    rollups = MonthlyRollup.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    rows = (
+        queryset
+        .values('user_id', 'month', 'category_id', 'category_type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    objects = [
+        MonthlyRollup(
+            user_id=row['user_id'],
+            month=row['month'],
+            category_id=row['category_id'],
+            category_type=row['category_type'],
+            total=row['total'],
+            count=row['count'],
+        )
+        for row in rows.iterator()
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        MonthlyRollup.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
+
+
+def totals_by_month(user, since):
+    """Returns {(month, category_type): (total, count)} for months >= `since`."""
+    rows = (
+        MonthlyRollup.objects
+        .filter(user=user, month__gte=since)
+        .values('month', 'category_type')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
+    return {(row['month'], row['category_type']): (row['total'], row['count']) for row in rows}
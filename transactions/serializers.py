@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Transaction, Budget
+from django.db.models import Max
+from .models import Transaction, Budget, BudgetAlertEvent, RecurringSchedule
 from core.serializers import CategorySerializer, AccountSerializer
 
 
@@ -24,14 +25,10 @@ class TransactionSerializer(serializers.ModelSerializer):
         
     def validate_category_id(self, value):
         user = self.context['request'].user
-        try:
-            from core.models import Category
-            category = Category.objects.get(id=value)
-            if category.user and category.user != user:
-                raise serializers.ValidationError("Category not found.")
-            return value
-        except Category.DoesNotExist:
+        from core.registry import registry
+        if registry.get(value, user.pk) is None:
             raise serializers.ValidationError("Category not found.")
+        return value
             
     def validate_account_id(self, value):
         user = self.context['request'].user
@@ -62,13 +59,135 @@ class BudgetSerializer(serializers.ModelSerializer):
         
     def validate_category_id(self, value):
         user = self.context['request'].user
+        from core.registry import registry
+        category = registry.get(value, user.pk)
+        if category is None:
+            raise serializers.ValidationError("Category not found.")
+        if category.type != 'EXPENSE':
+            raise serializers.ValidationError("Budgets can only be created for expense categories.")
+        return value
+
+class BudgetAlertEventSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='budget.category.name', read_only=True)
+    
+    class Meta:
+        model = BudgetAlertEvent
+        fields = [
+            'id', 'budget', 'category', 'period_key', 'previous_status', 'status',
+            'spent', 'percentage', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class RecurringScheduleSerializer(serializers.ModelSerializer):
+    category = CategorySerializer(read_only=True)
+    account = AccountSerializer(read_only=True)
+    category_id = serializers.IntegerField(write_only=True)
+    account_id = serializers.IntegerField(write_only=True)
+    
+    class Meta:
+        model = RecurringSchedule
+        fields = [
+            'id', 'description', 'amount', 'category', 'account', 'category_id', 'account_id',
+            'frequency', 'interval', 'start_date', 'end_date', 'next_date', 'is_active',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'next_date', 'created_at', 'updated_at']
+        
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        if instance.next_date is None and 'end_date' in validated_data:
+            # Échéancier terminé dont la fin est repoussée : reprendre après la dernière occurrence créée
+            from .recurring import following
+            last = instance.transactions.aggregate(last=Max('occurrence'))['last']
+            next_date = following(instance, last) if last else instance.start_date
+            end_date = validated_data['end_date']
+            if end_date is None or next_date <= end_date:
+                validated_data['next_date'] = next_date
+        return super().update(instance, validated_data)
+        
+    def validate_category_id(self, value):
+        user = self.context['request'].user
+        from core.registry import registry
+        if registry.get(value, user.pk) is None:
+            raise serializers.ValidationError("Category not found.")
+        return value
+            
+    def validate_account_id(self, value):
+        user = self.context['request'].user
+        from core.models import Account
+        if not Account.objects.filter(id=value, user=user).exists():
+            raise serializers.ValidationError("Account not found.")
+        return value
+    
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Must be at least 1.")
+        return value
+        
+    def validate(self, attrs):
+        if self.instance is not None:
+            # Les occurrences déjà créées suivent la règle : la changer demande un nouvel échéancier
+            errors = {
+                field: "Cannot be changed once the schedule exists; create a new schedule."
+                for field in ('frequency', 'interval', 'start_date')
+                if field in attrs and attrs[field] != getattr(self.instance, field)
+            }
+            if errors:
+                raise serializers.ValidationError(errors)
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if end_date and start_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': "Must be on or after start_date."})
+        return attrs
+
+
+class StatementImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    account_id = serializers.IntegerField()
+    file_format = serializers.ChoiceField(choices=['csv', 'ofx', 'qif'], required=False)
+    encoding = serializers.CharField(default='utf-8-sig')
+    delimiter = serializers.CharField(required=False, max_length=1, trim_whitespace=False)
+    date_format = serializers.CharField(required=False)
+    date_column = serializers.CharField(required=False)
+    amount_column = serializers.CharField(required=False)
+    description_column = serializers.CharField(required=False)
+    category_column = serializers.CharField(required=False)
+    income_category_id = serializers.IntegerField(required=False)
+    expense_category_id = serializers.IntegerField(required=False)
+    
+    def validate_account_id(self, value):
+        user = self.context['request'].user
+        from core.models import Account
+        if not Account.objects.filter(id=value, user=user).exists():
+            raise serializers.ValidationError("Account not found.")
+        return value
+        
+    def validate_encoding(self, value):
+        import codecs
         try:
-            from core.models import Category
-            category = Category.objects.get(id=value)
-            if category.user and category.user != user:
-                raise serializers.ValidationError("Category not found.")
-            if category.type != 'EXPENSE':
-                raise serializers.ValidationError("Budgets can only be created for expense categories.")
-            return value
-        except Category.DoesNotExist:
-            raise serializers.ValidationError("Category not found.")
\ No newline at end of file
+            codecs.lookup(value)
+        except LookupError:
+            raise serializers.ValidationError("Unknown encoding.")
+        return value
+        
+    def validate(self, attrs):
+        user = self.context['request'].user
+        from core.models import Category
+        from .importers import detect_format
+        for field in ('income_category_id', 'expense_category_id'):
+            if field not in attrs:
+                continue
+            category = Category.objects.filter(id=attrs[field]).first()
+            if not category or (category.user and category.user != user):
+                raise serializers.ValidationError({field: "Category not found."})
+            attrs[field.replace('_id', '')] = category
+        if 'file_format' not in attrs:
+            file_format = detect_format(attrs['file'].name)
+            if not file_format:
+                raise serializers.ValidationError({'file_format': "Cannot detect the statement format."})
+            attrs['file_format'] = file_format
+        return attrs
@@ -0,0 +1,195 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+from core.signals import deleted_by_cascade_from
+from core.cache import bump_data_version
+from core import statistics
+from core.models import Account, Category
+from .models import TRACKED_FIELDS, Transaction, Budget, MonthlyRollup, RecurringSchedule
+from . import budgets, ledger, rollups
+from .suggestions import suggestions
+
+# Envoyé après un bulk_create de transactions (pas de post_save dans ce cas),
+# avec `user_id` (None pour un lot de plusieurs utilisateurs) et `instances`
+# (catégories déjà chargées). `defer_ledger=True` : l'expéditeur reconstruit
+# lui-même le ledger une fois tous ses lots écrits (import de relevé)
+transactions_bulk_created = Signal()
+
+
+def totals_unchanged(instance, created):
+    """True for an edit that keeps amount, category, date and account (a description change): no total moves."""
+    previous = getattr(instance, '_loaded_values', None)
+    if created or not previous:
+        return False
+    return all(field in previous and previous[field] == getattr(instance, field) for field in TRACKED_FIELDS)
+
+
+@receiver(pre_save, sender=Transaction)
+def update_ledger_before_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ledger.before_save(instance, getattr(instance, '_loaded_values', None))
+
+
+@receiver(post_delete, sender=Transaction)
+def update_ledger_on_delete(sender, instance, origin=None, **kwargs):
+    # Compte ou utilisateur supprimé : le solde part avec le compte
+    if deleted_by_cascade_from(origin, 'core.Account', settings.AUTH_USER_MODEL):
+        return
+    if deleted_by_cascade_from(origin, 'core.Category'):
+        # Une seule reconstruction par compte touché, après la cascade
+        ledger.defer_rebuild(origin, instance)
+        return
+    ledger.remove(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or totals_unchanged(instance, created):
+        return
+    previous = getattr(instance, '_loaded_values', None)
+    if not created and previous and all(field in previous for field in TRACKED_FIELDS):
+        rollups.record_change(previous, instance)
+        return
+    rollups.record(instance)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    # Les rollups de la catégorie ou de l'utilisateur supprimé partent en cascade
+    if deleted_by_cascade_from(origin, 'core.Category', settings.AUTH_USER_MODEL):
+        return
+    rollups.record(instance, sign=-1)
+
+
+@receiver(post_save, sender=Transaction)
+def update_budget_progress_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or totals_unchanged(instance, created):
+        return
+    previous = getattr(instance, '_loaded_values', None)
+    changes = []
+    if not created and previous and all(field in previous for field in TRACKED_FIELDS):
+        changes += budgets.expense_change(previous, sign=-1)
+    changes += budgets.expense_change(instance.__dict__)
+    budgets.record_spending(changes)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_budget_progress_on_delete(sender, instance, origin=None, **kwargs):
+    # Les budgets de la catégorie ou de l'utilisateur supprimé partent en cascade
+    if deleted_by_cascade_from(origin, 'core.Category', settings.AUTH_USER_MODEL):
+        return
+    budgets.record_spending(budgets.expense_change(instance.__dict__, sign=-1))
+
+
+@receiver(post_save, sender=Transaction)
+def update_statistics_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or totals_unchanged(instance, created):
+        return
+    if created:
+        statistics.record_transactions(instance.user_id, added=[(instance.date, instance.month)])
+        return
+    previous = getattr(instance, '_loaded_values', None)
+    if not previous or not all(field in previous for field in TRACKED_FIELDS):
+        return
+    if all(previous[field] == getattr(instance, field) for field in ('user_id', 'account_id', 'date', 'amount')):
+        return
+    if previous['user_id'] == instance.user_id:
+        # Une seule mise à jour de la ligne de statistiques
+        statistics.record_transactions(
+            instance.user_id, added=[(instance.date, instance.month)], removed=[(previous['date'], previous['month'])]
+        )
+        return
+    statistics.record_transactions(previous['user_id'], removed=[(previous['date'], previous['month'])])
+    statistics.record_transactions(instance.user_id, added=[(instance.date, instance.month)])
+
+
+@receiver(post_delete, sender=Transaction)
+def update_statistics_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_by_cascade_from(origin, settings.AUTH_USER_MODEL):
+        return
+    statistics.record_transactions(instance.user_id, removed=[(instance.date, instance.month)])
+
+
+@receiver(post_save, sender=Transaction)
+def update_suggestions_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        suggestions.record_on_commit([instance])
+        return
+    # Libellé, catégorie ou compte modifié : les compteurs ne se corrigent pas en place
+    previous = getattr(instance, '_loaded_values', None) or {}
+    fields = ('user_id', 'description', 'category_id', 'account_id')
+    if any(field not in previous or previous[field] != getattr(instance, field) for field in fields):
+        for user_id in {previous.get('user_id'), instance.user_id} - {None}:
+            suggestions.invalidate(user_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_suggestions_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_by_cascade_from(origin, settings.AUTH_USER_MODEL):
+        return
+    suggestions.invalidate(instance.user_id, origin)
+
+
+@receiver(post_save, sender=Budget)
+def sync_budget_progress(sender, instance, raw=False, **kwargs):
+    # Limite, période ou catégorie modifiée : repartir des rollups
+    if raw or not instance.is_active:
+        return
+    budgets.BudgetEngine(instance.user_id).sync_progress([instance])
+
+
+@receiver(post_delete, sender=Category)
+def rebuild_ledger_after_category_delete(sender, instance, origin=None, **kwargs):
+    rebuilt = ledger.run_deferred_rebuilds(origin)
+    for user_id in set(Account.objects.filter(pk__in=rebuilt).values_list('user_id', flat=True)):
+        statistics.refresh_accounts(user_id)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=RecurringSchedule)
+@receiver(post_delete, sender=RecurringSchedule)
+def invalidate_user_cache(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(transactions_bulk_created)
+def update_after_bulk_create(sender, user_id, instances, defer_ledger=False, **kwargs):
+    # user_id vaut None quand le lot couvre plusieurs utilisateurs (échéances récurrentes)
+    added = defaultdict(list)
+    for instance in instances:
+        added[instance.user_id].append((instance.date, instance.month))
+    rollups.record_many(instances)
+    if not defer_ledger:
+        ledger.rebuild_after_bulk(instances)
+    budgets.record_spending(
+        change for instance in instances for change in budgets.expense_change(instance.__dict__)
+    )
+    statistics.record_added(added)
+    suggestions.record_on_commit(instances)
+    for changed_user_id in added:
+        bump_data_version(changed_user_id)
+
+
+@receiver(pre_save, sender=Category)
+def load_previous_category_type(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_type = Category.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def sync_category_type(sender, instance, created, raw=False, **kwargs):
+    # Garder les copies de category_type à jour quand une catégorie change de type. L'API et l'admin
+    # refusent ce changement sous des transactions (Category.is_used) : il reste les lignes de rollup vides
+    previous = getattr(instance, '_previous_type', None)
+    if created or raw or previous is None or previous == instance.type:
+        return
+    Transaction.objects.filter(category=instance).update(category_type=instance.type)
+    MonthlyRollup.objects.filter(category=instance).update(category_type=instance.type)
@@ -0,0 +1,211 @@
+"""
+Per-process description suggestions (transaction entry autocomplete).
+
+For each user the index holds one entry per distinct past description (use
+count, last use, usual category and account) and a sorted list of prefix
+keys: the normalized description (lowercase, accents removed) from the start
+of each of its words. A prefix lookup is a bisect into that list, so
+`carr` and `mark` both find "Carrefour Market" without touching the
+database.
+
+Users are loaded lazily with one grouped query and evicted in LRU order
+beyond SUGGESTIONS_MAX_USERS. New transactions are added in place once
+committed; edits and deletes drop the user's index, which is reloaded on the
+next lookup. As with the category registry, other worker processes follow
+through a version key in Django's cache, checked at most every
+CHECK_INTERVAL seconds, and an index older than SUGGESTIONS_TTL is reloaded
+anyway (changes made without signals, like queryset updates).
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from core.cache import _next_version
+
+CHECK_INTERVAL = 1.0
+# Demi-vie de la récence : une description utilisée il y a 90 jours compte moitié moins
+RECENCY_HALF_LIFE_DAYS = 90
+
+
+def _version_key(user_id):
+    return f'suggestion-version:user:{user_id}'
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def prefix_keys(text):
+    """Returns the normalized text from the start of each of its words."""
+    words = normalize(text).split(' ')
+    return [' '.join(words[index:]) for index in range(len(words)) if words[index]]
+
+
+class Suggestion:
+    __slots__ = ('description', 'count', 'last_used', 'uses')
+
+    def __init__(self, description):
+        self.description = description
+        self.count = 0
+        self.last_used = None
+        # (category_id, account_id) -> [nombre, dernière utilisation]
+        self.uses = {}
+
+    def add(self, category_id, account_id, count, last_used):
+        self.count += count
+        self.last_used = last_used if self.last_used is None else max(self.last_used, last_used)
+        use = self.uses.setdefault((category_id, account_id), [0, last_used])
+        use[0] += count
+        use[1] = max(use[1], last_used)
+
+    def usual(self):
+        """Returns the (category_id, account_id) used most often with this description, the latest on ties."""
+        return max(self.uses.items(), key=lambda item: (item[1][0], item[1][1]))[0]
+
+    def score(self, now):
+        age_days = max((now - self.last_used).total_seconds() / 86400, 0)
+        return self.count * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+class UserSuggestions:
+    def __init__(self, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.checked_at = self.loaded_at
+        self.entries = {}
+        self.keys = []
+
+    def add(self, description, category_id, account_id, count, last_used, sort=True):
+        entry = self.entries.get(description)
+        if entry is None:
+            entry = self.entries[description] = Suggestion(description)
+            for key in prefix_keys(description):
+                if sort:
+                    insort(self.keys, (key, description))
+                else:
+                    self.keys.append((key, description))
+        entry.add(category_id, account_id, count, last_used)
+
+    def search(self, prefix, limit, now):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = set()
+        position = bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            matches.add(self.keys[position][1])
+            position += 1
+        return heapq.nlargest(
+            limit,
+            (self.entries[description] for description in matches),
+            key=lambda entry: (entry.score(now), entry.last_used),
+        )
+
+
+class SuggestionIndex:
+    def __init__(self, max_users=None):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # id utilisateur -> UserSuggestions, du moins au plus récemment utilisé
+        self._users = OrderedDict()
+
+    def _load(self, user_id, version):
+        from .models import Transaction
+        index = UserSuggestions(version)
+        rows = (
+            Transaction.objects.filter(user_id=user_id)
+            .values('description', 'category_id', 'account_id')
+            .annotate(count=Count('id'), last_used=Max('date'))
+            .order_by()
+        )
+        for row in rows:
+            index.add(row['description'], row['category_id'], row['account_id'], row['count'], row['last_used'], sort=False)
+        index.keys.sort()
+        return index
+
+    def _get(self, user_id):
+        now = time.monotonic()
+        index = self._users.get(user_id)
+        if index is not None and now - index.checked_at < CHECK_INTERVAL:
+            self._touch(user_id)
+            return index
+
+        version = cache.get_or_set(_version_key(user_id), _next_version, timeout=None)
+        expired = index is not None and now - index.loaded_at > settings.SUGGESTIONS_TTL
+        if index is None or index.version != version or expired:
+            index = self._load(user_id, version)
+        index.checked_at = now
+
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            max_users = self.max_users or settings.SUGGESTIONS_MAX_USERS
+            while len(self._users) > max_users:
+                self._users.popitem(last=False)
+        return index
+
+    def _touch(self, user_id):
+        with self._lock:
+            if user_id in self._users:
+                self._users.move_to_end(user_id)
+
+    def suggest(self, user_id, prefix, limit=None):
+        """Returns the user's past descriptions starting with `prefix` (any word), by frequency and recency."""
+        limit = limit or settings.SUGGESTIONS_DEFAULT_LIMIT
+        return self._get(user_id).search(prefix, limit, timezone.now())
+
+    def _bump(self, user_id):
+        key = _version_key(user_id)
+        version = _next_version(cache.get(key))
+        cache.set(key, version, timeout=None)
+        return version
+
+    def record(self, instances):
+        """Adds committed transactions to the loaded indexes; other processes reload theirs."""
+        by_user = {}
+        for instance in instances:
+            by_user.setdefault(instance.user_id, []).append(instance)
+        for user_id, user_instances in by_user.items():
+            version = self._bump(user_id)
+            with self._lock:
+                index = self._users.get(user_id)
+                if index is None:
+                    continue
+                for instance in user_instances:
+                    index.add(instance.description, instance.category_id, instance.account_id, 1, instance.date)
+                index.version = version
+
+    def record_on_commit(self, instances):
+        instances = list(instances)
+        transaction.on_commit(lambda: self.record(instances))
+
+    def invalidate(self, user_id, origin=None):
+        """Drops the user's index now and makes other processes reload theirs once committed.
+
+        With `origin` (deletion cascades, queryset deletes), only the first call per user counts.
+        """
+        if origin is not None:
+            done = origin.__dict__.setdefault('_suggestions_invalidated', set())
+            if user_id in done:
+                return
+            done.add(user_id)
+        with self._lock:
+            self._users.pop(user_id, None)
+        transaction.on_commit(lambda: self._bump(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+suggestions = SuggestionIndex()
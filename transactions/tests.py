@@ -1,3 +1,1092 @@
-from django.test import TestCase
+import csv
+import importlib
+import json
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Account, AccountType, Asset, AssetType, Category, CategoryType, UserStatistics, WealthSnapshot
+from core.registry import registry
+from core.testing import QueryBudgetTestMixin, create_account, create_category, create_transaction, create_user
+from .analytics import month_buckets
+from .budgets import BudgetEngine
+from .forecast import ForecastEngine
+from .importers import ImportFormatError, RowError, StatementImporter, StatementRow, parse_csv, parse_ofx, parse_qif
+from .pagination import keyset_q
+from .signals import transactions_bulk_created
+from .models import (
+    Budget, BudgetAlertEvent, BudgetPeriod, BudgetProgress, MonthlyRollup, RecurrenceFrequency, RecurringSchedule,
+    Transaction,
+)
+from .suggestions import suggestions
+from .views import RecurringScheduleViewSet, TransactionViewSet
+from . import ledger, recurring, rollups
+
+User = get_user_model()
+
+
+class AnalyticsQueryCountTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='analytics@fintrack.com', username='analytics', password='x')
+        self.account = Account.objects.create(name='Courant', type=AccountType.CHECKING, user=self.user)
+        salary = Category.objects.create(name='Salaire', type=CategoryType.INCOME, user=self.user)
+        expenses = [
+            Category.objects.create(name=f'Dépense {i}', type=CategoryType.EXPENSE, user=self.user)
+            for i in range(8)
+        ]
+        this_month = rollups.month_of(timezone.now())
+        for offset in range(24):
+            month = rollups.shift_month(this_month, -offset)
+            day = timezone.make_aware(datetime(month.year, month.month, 2, 12))
+            Transaction.objects.create(
+                amount=Decimal('3000'), date=day, description='Salaire',
+                category=salary, account=self.account, user=self.user,
+            )
+            for category in expenses:
+                Transaction.objects.create(
+                    amount=Decimal('25.50'), date=day, description=category.name,
+                    category=category, account=self.account, user=self.user,
+                )
+        self.client.force_authenticate(self.user)
+
+    def get_analytics(self, months):
+        with self.assertMaxQueries(3) as queries:
+            response = self.client.get('/api/transactions/analytics/', {'months': months}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries.count
+
+    def test_query_count_does_not_grow_with_months(self):
+        _, short_queries = self.get_analytics(3)
+        data, long_queries = self.get_analytics(24)
+
+        self.assertEqual(short_queries, long_queries)
+        self.assertEqual(len(data['monthly_data']), 24)
+        self.assertEqual(len(data['category_trends']), 8)
+        self.assertEqual(data['insights']['total_income'], 3000.0 * 24)
+        self.assertEqual(data['insights']['total_expenses'], 25.5 * 8 * 24)
+
+    def test_months_are_calendar_months(self):
+        data, _ = self.get_analytics(12)
+
+        self.assertTrue(all(month['income'] == 3000.0 for month in data['monthly_data']))
+        self.assertEqual(
+            [month['month'] for month in data['monthly_data']],
+            [month.strftime('%b') for month in month_buckets(12)]
+        )
+
+
+def rollup_rows(user):
+    rows = MonthlyRollup.objects.filter(user=user, count__gt=0)
+    return sorted(rows.values_list('month', 'category_id', 'category_type', 'total', 'count'))
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('rollups')
+        cls.account = create_account(cls.user)
+        cls.salary = create_category(cls.user, 'Salaire', CategoryType.INCOME)
+        cls.food = create_category(cls.user, 'Courses')
+        cls.rent = create_category(cls.user, 'Loyer')
+        cls.this_month = rollups.month_of(timezone.now())
+        cls.last_month = rollups.shift_month(cls.this_month, -1)
+
+    def day(self, month):
+        return timezone.make_aware(datetime(month.year, month.month, 10, 12))
+
+    def assertMatchesRebuild(self):
+        maintained = rollup_rows(self.user)
+        rollups.rebuild([self.user])
+        self.assertEqual(maintained, rollup_rows(self.user))
+
+    def test_writes_keep_rollups_in_sync(self):
+        create_transaction(self.account, self.salary, '2000', self.day(self.this_month))
+        groceries = create_transaction(self.account, self.food, '40', self.day(self.this_month))
+        create_transaction(self.account, self.food, '60', self.day(self.last_month))
+        self.assertIn((self.this_month, self.food.pk, 'EXPENSE', Decimal('-40.00'), 1), rollup_rows(self.user))
+
+        # Changement de mois, de catégorie et de montant
+        groceries.date = self.day(self.last_month)
+        groceries.save()
+        groceries.category = self.rent
+        groceries.amount = Decimal('500')
+        groceries.save()
+        self.assertIn((self.last_month, self.rent.pk, 'EXPENSE', Decimal('-500.00'), 1), rollup_rows(self.user))
+        self.assertMatchesRebuild()
+
+        groceries.delete()
+        self.assertNotIn(self.rent.pk, [row[1] for row in rollup_rows(self.user)])
+        self.assertMatchesRebuild()
+
+    def test_instance_built_with_an_existing_pk_replaces_the_row(self):
+        groceries = create_transaction(self.account, self.food, '40', self.day(self.this_month))
+        Transaction(
+            pk=groceries.pk, user=self.user, account=self.account, category=self.rent, amount=Decimal('500'),
+            date=self.day(self.last_month), description='Loyer',
+        ).save()
+
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(rollup_rows(self.user), [(self.last_month, self.rent.pk, 'EXPENSE', Decimal('-500.00'), 1)])
+        self.assertMatchesRebuild()
+        self.assertEqual(ledger.rebuild(self.account.pk), 0)
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('-500.00'))
+        self.assertEqual(UserStatistics.objects.get(user=self.user).transaction_count, 1)
+
+    def test_totals_by_month(self):
+        create_transaction(self.account, self.salary, '2000', self.day(self.this_month))
+        create_transaction(self.account, self.food, '40', self.day(self.this_month))
+        create_transaction(self.account, self.rent, '500', self.day(self.this_month))
+        create_transaction(self.account, self.food, '60', self.day(self.last_month))
+
+        self.assertEqual(rollups.totals_by_month(self.user, self.this_month), {
+            (self.this_month, 'INCOME'): (Decimal('2000.00'), 1),
+            (self.this_month, 'EXPENSE'): (Decimal('-540.00'), 2),
+        })
+        self.assertEqual(rollups.totals_by_month(self.user, self.last_month)[self.last_month, 'EXPENSE'],
+                         (Decimal('-60.00'), 1))
+
+
+class LedgerTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('ledger')
+        cls.account = create_account(cls.user, balance=100)
+        cls.savings = create_account(cls.user, 'Épargne')
+        cls.salary = create_category(cls.user, 'Salaire', CategoryType.INCOME)
+        cls.food = create_category(cls.user, 'Courses')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def day(self, number):
+        return timezone.make_aware(datetime(2026, 1, number, 12))
+
+    def assertMatchesRebuild(self, *accounts):
+        maintained = {account.pk: Account.objects.get(pk=account.pk).balance for account in accounts}
+        for account in accounts:
+            self.assertEqual(ledger.rebuild(account.pk), 0)
+        self.assertEqual(maintained, {account.pk: Account.objects.get(pk=account.pk).balance for account in accounts})
+
+    def test_writes_keep_running_totals_in_sync(self):
+        create_transaction(self.account, self.salary, '2000', self.day(5))
+        rent = create_transaction(self.account, self.food, '800', self.day(10))
+        create_transaction(self.account, self.food, '50', self.day(20))
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('1250.00'))
+        self.assertMatchesRebuild(self.account)
+
+        # Avant le salaire, puis sur un autre compte avec un autre montant
+        rent.date = self.day(1)
+        rent.save()
+        self.assertMatchesRebuild(self.account)
+        rent.account = self.savings
+        rent.amount = Decimal('900')
+        rent.save()
+        self.assertMatchesRebuild(self.account, self.savings)
+        self.assertEqual(Account.objects.get(pk=self.savings.pk).balance, Decimal('-900.00'))
+
+        rent.delete()
+        self.assertMatchesRebuild(self.account, self.savings)
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('2050.00'))
+
+    def test_stale_instance_keeps_the_stored_running_total(self):
+        groceries = create_transaction(self.account, self.food, '50', self.day(20))
+        # Une transaction antérieure déplace le total cumulé en base, pas celui de l'instance chargée
+        create_transaction(self.account, self.salary, '2000', self.day(5))
+        groceries.description = 'Marché'
+        groceries.save()
+
+        self.assertEqual(Transaction.objects.get(pk=groceries.pk).running_total, Decimal('1950.00'))
+        self.assertMatchesRebuild(self.account)
+
+    def test_concurrent_edits_of_the_same_row_keep_the_totals(self):
+        rent = create_transaction(self.account, self.food, '1000', self.day(10))
+        first, second = Transaction.objects.get(pk=rent.pk), Transaction.objects.get(pk=rent.pk)
+        first.amount = Decimal('10')
+        first.save()
+        # Chargée avant la première écriture : remet 1000 en base, les totaux doivent suivre
+        second.description = 'Loyer'
+        second.save()
+
+        self.assertEqual(Transaction.objects.get(pk=rent.pk).amount, Decimal('-1000.00'))
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('-900.00'))
+        self.assertMatchesRebuild(self.account)
+        maintained = rollup_rows(self.user)
+        rollups.rebuild([self.user])
+        self.assertEqual(maintained, rollup_rows(self.user))
+
+        # Suppression depuis une instance périmée : le montant en base est retiré
+        first.delete()
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('100.00'))
+        self.assertEqual(rollup_rows(self.user), [])
+
+    def test_balance_set_by_hand_corrects_the_opening_balance(self):
+        create_transaction(self.account, self.food, '30', self.day(5))
+        account = Account.objects.get(pk=self.account.pk)
+        account.balance = Decimal('500')
+        account.save()
+
+        account.refresh_from_db()
+        self.assertEqual((account.balance, account.opening_balance), (Decimal('500.00'), Decimal('530.00')))
+        self.assertEqual(ledger.balance_at(account, date(2026, 1, 4)), Decimal('530.00'))
+        create_transaction(self.account, self.food, '20', self.day(6))
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('480.00'))
+
+    def test_balance_history(self):
+        create_transaction(self.account, self.salary, '2000', self.day(2))
+        create_transaction(self.account, self.food, '50', self.day(4))
+        url = f'/api/accounts/{self.account.pk}/balance_history/'
+
+        response = self.client.get(url, {'start': '2026-01-01', 'end': '2026-01-05'}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['balance'] for row in response.data['balances']], [100, 2100, 2100, 2050, 2050])
+        response = self.client.get(url, {'date': '2026-01-03'}, SERVER_NAME='localhost')
+        self.assertEqual(response.data['balance'], 2100)
+        response = self.client.get(url, {'start': '2026-01-05', 'end': '2026-01-01'}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_ledger_command(self):
+        create_transaction(self.account, self.salary, '2000', self.day(2))
+        create_transaction(self.account, self.food, '50', self.day(4))
+        Transaction.objects.filter(user=self.user).update(running_total=0)
+        Account.objects.filter(pk=self.account.pk).update(balance=0)
+
+        out = StringIO()
+        call_command('rebuild_ledger', '--user', self.user.email, stdout=out)
+        self.assertIn('Successfully rebuilt 2 account ledgers (2 running totals fixed)', out.getvalue())
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('2050.00'))
+
+    def test_todays_snapshot_follows_the_balance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            groceries = create_transaction(self.account, self.food, '30')
+        snapshot = WealthSnapshot.objects.get(user=self.user, date=timezone.localdate())
+        self.assertEqual(snapshot.accounts_total, Decimal('70.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            groceries.delete()
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.accounts_total, Decimal('100.00'))
+
+
+class AsyncEndpointTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='async@fintrack.com', username='async', password='x')
+        account = Account.objects.create(name='Courant', type=AccountType.CHECKING, user=self.user)
+        salary = Category.objects.create(name='Salaire', type=CategoryType.INCOME, user=self.user)
+        food = Category.objects.create(name='Courses', type=CategoryType.EXPENSE, user=self.user)
+        this_month = rollups.month_of(timezone.now())
+        for offset in range(3):
+            month = rollups.shift_month(this_month, -offset)
+            day = timezone.make_aware(datetime(month.year, month.month, 1, 12))
+            Transaction.objects.create(amount=Decimal('2500'), date=day, description='Salaire',
+                                       category=salary, account=account, user=self.user)
+            Transaction.objects.create(amount=Decimal('180.40'), date=day, description='Courses',
+                                       category=food, account=account, user=self.user)
+        Asset.objects.create(name='PEA', asset_type=AssetType.STOCKS, current_value=Decimal('5000'),
+                             purchase_price=Decimal('4000'), user=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    def test_async_endpoints_match_the_sync_ones(self):
+        for path in ('transactions/dashboard_stats/', 'transactions/analytics/', 'assets/portfolio_performance/'):
+            expected = self.client.get(f'/api/{path}', SERVER_NAME='localhost')
+            self.assertEqual(expected.status_code, 200)
+
+            # Mêmes clés de cache que la vue sync
+            response = async_to_sync(self.async_client.get)(f'/api/async/{path}', headers=self.headers)
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertEqual(response.json(), expected.json())
+
+            cache.clear()
+            response = async_to_sync(self.async_client.get)(f'/api/async/{path}', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.json(), expected.json())
+
+    def test_async_endpoints_require_authentication(self):
+        response = async_to_sync(self.async_client.get)('/api/async/transactions/dashboard_stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = async_to_sync(self.async_client.post)('/api/async/transactions/dashboard_stats/', headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+
+class BudgetOverviewTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='budgets@fintrack.com', username='budgets', password='x')
+        self.account = account = Account.objects.create(name='Courant', type=AccountType.CHECKING, user=self.user)
+        self.groceries = groceries = Category.objects.create(name='Courses', type=CategoryType.EXPENSE, user=self.user)
+        Budget.objects.create(category=groceries, monthly_limit=Decimal('200'), period=BudgetPeriod.MONTHLY, user=self.user)
+        Transaction.objects.create(
+            amount=Decimal('-150'), date=timezone.now(), description='Courses',
+            category=groceries, account=account, user=self.user,
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_overview_reports_current_month_spending(self):
+        with self.assertMaxQueries(4):
+            response = self.client.get('/api/budgets/overview/', SERVER_NAME='localhost')
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()['summary']
+        self.assertEqual(summary['total_allocated'], 200.0)
+        self.assertEqual(summary['total_spent'], 150.0)
+        self.assertEqual(summary['overall_percentage'], 75.0)
+
+    def test_alerts_use_the_overview_thresholds(self):
+        engine = BudgetEngine(self.user)
+        # 80 % pile : encore « good » pour l'aperçu comme pour les alertes
+        create_transaction(self.account, self.groceries, '10')
+        self.assertEqual(engine.evaluate()[0]['status'], 'good')
+        self.assertEqual(engine.alerts(), [])
+
+        create_transaction(self.account, self.groceries, '2')
+        self.assertEqual(engine.evaluate()[0]['status'], 'warning')
+        self.assertEqual([alert['status'] for alert in engine.alerts()], ['warning'])
+        create_transaction(self.account, self.groceries, '40')
+        self.assertEqual([alert['status'] for alert in engine.alerts()], ['exceeded'])
+
+
+class BudgetProgressTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('progress')
+        cls.account = create_account(cls.user)
+        cls.food = create_category(cls.user, 'Courses')
+        cls.budget = Budget.objects.create(
+            category=cls.food, monthly_limit=Decimal('100'), period=BudgetPeriod.MONTHLY, user=cls.user,
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def progress(self):
+        return BudgetProgress.objects.values_list('spent', 'status').get(budget=self.budget)
+
+    def test_writes_keep_the_progress_in_sync(self):
+        groceries = create_transaction(self.account, self.food, '50')
+        create_transaction(self.account, self.food, '20')
+        self.assertEqual(self.progress(), (Decimal('70.00'), 'good'))
+
+        groceries.amount = Decimal('90')
+        groceries.save()
+        self.assertEqual(self.progress(), (Decimal('110.00'), 'exceeded'))
+        # Transaction d'un autre mois : hors de la période du budget
+        groceries.date = timezone.now() - timedelta(days=40)
+        groceries.save()
+        self.assertEqual(self.progress(), (Decimal('20.00'), 'good'))
+
+        groceries.delete()
+        maintained = self.progress()
+        BudgetEngine(self.user).sync_progress([Budget.objects.select_related('progress').get(pk=self.budget.pk)])
+        self.assertEqual(self.progress(), maintained)
+
+    def test_threshold_crossings_are_recorded(self):
+        groceries = create_transaction(self.account, self.food, '85')
+        groceries.amount = Decimal('120')
+        groceries.save()
+        create_transaction(self.account, self.food, '5')
+        groceries.delete()
+
+        response = self.client.get('/api/budgets/alert_events/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(event['previous_status'], event['status'], event['category']) for event in response.data['events']],
+            [('exceeded', 'good', 'Courses'), ('warning', 'exceeded', 'Courses'), ('good', 'warning', 'Courses')],
+        )
+
+    def test_new_period_starts_from_the_rollups(self):
+        create_transaction(self.account, self.food, '30', timezone.now() - timedelta(days=40))
+        create_transaction(self.account, self.food, '90')
+        engine = BudgetEngine(self.user)
+        # Progression restée sur le mois dernier, dépassée
+        BudgetProgress.objects.filter(budget=self.budget).update(period_key='2000-01', spent=500, status='exceeded')
+
+        alerts = engine.alerts()
+        self.assertEqual([(alert['spent'], alert['status']) for alert in alerts], [(Decimal('90.00'), 'warning')])
+        progress = BudgetProgress.objects.get(budget=self.budget)
+        self.assertEqual(progress.period_key, engine.period_key(BudgetPeriod.MONTHLY))
+        # Premier statut de la nouvelle période : pas de statut précédent
+        event = BudgetAlertEvent.objects.filter(user=self.user).first()
+        self.assertEqual((event.period_key, event.previous_status, event.status), (progress.period_key, None, 'warning'))
+
+
+class TransactionWriteTests(QueryBudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('writes')
+        cls.account = create_account(cls.user)
+        cls.food = create_category(cls.user, 'Courses')
+        Budget.objects.create(category=cls.food, monthly_limit=Decimal('100'), period=BudgetPeriod.MONTHLY, user=cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.body = {
+            'amount': '12.50', 'description': 'Pain', 'category_id': self.food.pk,
+            'account_id': self.account.pk, 'date': timezone.now().isoformat(),
+        }
+
+    def send(self, action, method, path, data=None):
+        # Rappels de commit compris : l'instantané du jour est écrit pendant la requête en production
+        with self.assertMaxQueries(TransactionViewSet.query_budgets[action]), self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, format='json', SERVER_NAME='localhost')
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def test_writes_stay_within_their_budgets(self):
+        # Registre des catégories chargé au démarrage en production (préchauffage)
+        registry.preload([self.user.pk])
+        # Première création du mois : la ligne de rollup est insérée
+        pk = self.send('create', 'post', '/api/transactions/', self.body).data['id']
+        self.send('create', 'post', '/api/transactions/', self.body)
+        self.send('update', 'put', f'/api/transactions/{pk}/', {**self.body, 'amount': '30'})
+        self.send('partial_update', 'patch', f'/api/transactions/{pk}/', {'amount': '40'})
+        self.send('destroy', 'delete', f'/api/transactions/{pk}/')
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('-12.50'))
+
+    def test_description_edit_leaves_the_totals_alone(self):
+        groceries = create_transaction(self.account, self.food, '50')
+        rows = rollup_rows(self.user)
+        statistics = UserStatistics.objects.values_list('updated_at', flat=True).get(pk=self.user.pk)
+
+        with self.assertMaxQueries(6), mock.patch.object(rollups, 'record') as record:
+            response = self.client.patch(f'/api/transactions/{groceries.pk}/', {'description': 'Marché'},
+                                         format='json', SERVER_NAME='localhost')
+        self.assertEqual(response.data['description'], 'Marché')
+        record.assert_not_called()
+        self.assertEqual(rollup_rows(self.user), rows)
+        self.assertEqual(UserStatistics.objects.values_list('updated_at', flat=True).get(pk=self.user.pk), statistics)
+        self.assertEqual(BudgetProgress.objects.values_list('spent', flat=True).get(user=self.user), Decimal('50.00'))
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('keyset')
+        account = create_account(cls.user)
+        food = create_category(cls.user, 'Courses')
+        start = timezone.now().replace(microsecond=0)
+        # Plusieurs transactions par date : l'ordre se départage sur created_at puis id
+        for index in range(11):
+            create_transaction(account, food, '10', start - timedelta(days=index // 3), f'Achat {index}')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_follow_the_default_order(self):
+        ordered = list(Transaction.objects.filter(user=self.user).order_by('-date', '-created_at', '-id')
+                       .values_list('pk', flat=True))
+        pages, url, params = [], '/api/transactions/', {'pagination': 'cursor', 'page_size': 4}
+        while url:
+            page = self.get(url, **params)
+            pages.append([row['id'] for row in page['results']])
+            url, params = page['next'], {}
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertEqual(sum(pages, []), ordered)
+
+        # Retour en arrière depuis la dernière page
+        previous = self.get(page['previous'])
+        self.assertEqual([row['id'] for row in previous['results']], pages[1])
+        self.assertIsNotNone(previous['next'])
+
+    def test_keyset_is_bounded_on_the_date(self):
+        key = (timezone.now(), timezone.now(), 1)
+
+        self.assertIn(('date__lte', key[0]), keyset_q(key).children)
+        self.assertIn(('date__gte', key[0]), keyset_q(key, lookup='gt').children)
+
+    def test_search_filters_cursor_pages(self):
+        page = self.get('/api/transactions/', pagination='cursor', search='achat')
+        self.assertEqual(len(page['results']), 11)
+
+    def test_ordering_and_bad_cursor_are_rejected(self):
+        response = self.client.get('/api/transactions/', {'pagination': 'cursor', 'ordering': 'amount'},
+                                   SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.json())
+
+        response = self.client.get('/api/transactions/', {'cursor': 'nope'}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkCreateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('bulk')
+        cls.account = create_account(cls.user)
+        cls.food = create_category(cls.user, 'Courses')
+        cls.salary = create_category(cls.user, 'Salaire', CategoryType.INCOME)
+        other = create_user('bulk-other')
+        cls.other_account = create_account(other)
+        cls.other_category = create_category(other, 'Privée')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def row(self, amount='10', category=None, account=None, **extra):
+        return {
+            'amount': amount, 'date': timezone.now().isoformat(), 'description': 'Ligne',
+            'category_id': (category or self.food).pk, 'account_id': (account or self.account).pk, **extra,
+        }
+
+    def post(self, rows):
+        return self.client.post('/api/transactions/bulk/', {'transactions': rows}, format='json', SERVER_NAME='localhost')
+
+    def test_rows_are_created_with_their_side_effects(self):
+        response = self.post([self.row('40'), self.row('2500', self.salary)])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        amounts = Transaction.objects.filter(pk__in=response.json()['ids']).values_list('amount', flat=True)
+        self.assertEqual(sorted(amounts), [Decimal('-40.00'), Decimal('2500.00')])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('2460.00'))
+        totals = rollups.totals_by_month(self.user, rollups.month_of(timezone.now()))
+        self.assertEqual(sum(count for _, count in totals.values()), 2)
+
+    def test_errors_are_reported_per_row_and_nothing_is_created(self):
+        response = self.post([
+            self.row(),
+            self.row('abc'),
+            self.row(account=self.other_account),
+            self.row(category=self.other_category),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3])
+        self.assertIn('amount', errors[1])
+        self.assertEqual(errors[2], {'account_id': ['Account not found.']})
+        self.assertEqual(errors[3], {'category_id': ['Category not found.']})
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_failure_after_insert_rolls_everything_back(self):
+        def fail(**kwargs):
+            raise RuntimeError('signal failed')
+
+        transactions_bulk_created.connect(fail, weak=False)
+        try:
+            with self.assertRaises(RuntimeError), self.assertLogs('django.request', level='ERROR'):
+                self.post([self.row(), self.row()])
+        finally:
+            transactions_bulk_created.disconnect(fail)
+
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    @override_settings(BULK_TRANSACTIONS_MAX_ROWS=2)
+    def test_row_limit(self):
+        self.assertEqual(self.post([self.row()] * 3).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+OFX_STATEMENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260105120000<TRNAMT>-12.50<FITID>A1<NAME>BOULANGERIE</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260106<TRNAMT>1500.00<FITID>A2<NAME>SALAIRE<MEMO>JANVIER</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_STATEMENT = """!Type:Bank
+D05/01/2026
+T-40.00
+PSupermarché
+LCourses:Alimentation
+^
+D06/01/2026
+T-200.00
+PVirement épargne
+L[Livret A]
+^
+"""
+
+
+class StatementImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('import')
+        cls.account = create_account(cls.user)
+        cls.food = create_category(cls.user, 'Courses')
+        cls.other = create_category(cls.user, 'Autres dépenses')
+        cls.salary = create_category(cls.user, 'Salaire', CategoryType.INCOME)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_csv_parser(self):
+        lines = [
+            'Date;Libellé;Montant;Catégorie\n',
+            '05/01/2026;"Café; croissant";-1.234,56;Courses\n',
+            ';;;\n',
+            '2026-01-32;Erreur;-3;\n',
+        ]
+        rows = list(parse_csv(lines, columns={'description': 'libellé', 'amount': 'montant', 'category': 'catégorie'}))
+
+        self.assertEqual(rows[0], StatementRow(2, date(2026, 1, 5), Decimal('-1234.56'), 'Café; croissant', 'Courses', None))
+        self.assertIsInstance(rows[1], RowError)
+        self.assertEqual(rows[1].line, 4)
+        with self.assertRaises(ImportFormatError):
+            list(parse_csv(['libellé,montant\n']))
+
+    def test_ofx_and_qif_parsers(self):
+        ofx = list(parse_ofx(OFX_STATEMENT.splitlines(keepends=True)))
+        self.assertEqual([(row.date, row.amount, row.description, row.reference) for row in ofx], [
+            (date(2026, 1, 5), Decimal('-12.50'), 'BOULANGERIE', 'A1'),
+            (date(2026, 1, 6), Decimal('1500.00'), 'SALAIRE JANVIER', 'A2'),
+        ])
+
+        qif = list(parse_qif(QIF_STATEMENT.splitlines(keepends=True), date_format='%d/%m/%Y'))
+        self.assertEqual([(row.amount, row.description, row.category) for row in qif], [
+            (Decimal('-40.00'), 'Supermarché', 'Courses'),
+            (Decimal('-200.00'), 'Virement épargne', ''),
+        ])
+
+    def test_reimport_creates_nothing(self):
+        rows = [
+            StatementRow(2, date(2026, 1, 5), Decimal('-3.20'), 'Café', 'Courses', None),
+            StatementRow(3, date(2026, 1, 5), Decimal('-3.20'), 'Café', 'Courses', None),
+            StatementRow(4, date(2026, 1, 6), Decimal('-15'), 'Inconnu', '', None),
+        ]
+        first = StatementImporter(self.user, self.account, chunk_size=2).run(rows)
+        second = StatementImporter(self.user, self.account, chunk_size=2).run(rows)
+
+        # Deux cafés identiques le même jour : deux opérations distinctes
+        self.assertEqual((first['created'], first['duplicates']), (3, 0))
+        self.assertEqual((second['created'], second['duplicates']), (0, 3))
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('category__name', 'amount')),
+            [('Autres dépenses', Decimal('-15.00')), ('Courses', Decimal('-3.20')), ('Courses', Decimal('-3.20'))],
+        )
+
+    def test_unsorted_statement_keeps_identical_operations(self):
+        rows = [
+            StatementRow(2, date(2026, 10, 1), Decimal('-4.50'), 'Cafe', '', None),
+            StatementRow(3, date(2026, 10, 2), Decimal('-12'), 'Lunch', '', None),
+            StatementRow(4, date(2026, 10, 1), Decimal('-4.50'), 'Cafe', '', None),
+        ]
+        first = StatementImporter(self.user, self.account).run(rows)
+        second = StatementImporter(self.user, self.account).run(rows)
+
+        self.assertEqual((first['created'], first['duplicates']), (3, 0))
+        self.assertEqual((second['created'], second['duplicates']), (0, 3))
+
+    def test_ledger_is_rebuilt_once_after_the_last_chunk(self):
+        # Relevé du plus récent au plus ancien : chaque lot est antérieur au précédent
+        rows = [
+            StatementRow(2 + i, date(2026, 1, 20 - i), Decimal('-10'), f'Achat {i}', 'Courses', None)
+            for i in range(6)
+        ]
+        with mock.patch.object(ledger, 'rebuild_many', wraps=ledger.rebuild_many) as rebuild_many:
+            result = StatementImporter(self.user, self.account, chunk_size=2).run(rows)
+
+        self.assertEqual(result['created'], 6)
+        rebuild_many.assert_called_once()
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal('-60.00'))
+        self.assertEqual(ledger.rebuild(self.account.pk), 0)
+
+    def post_statement(self, content, name='releve.csv', **data):
+        statement = SimpleUploadedFile(name, content)
+        return self.client.post('/api/transactions/import/',
+                                {'file': statement, 'account_id': self.account.pk, **data}, SERVER_NAME='localhost')
+
+    def test_api_import(self):
+        response = self.post_statement(OFX_STATEMENT.encode(), name='releve.ofx')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1487.50'))
+
+    @override_settings(IMPORT_CHUNK_SIZE=500)
+    def test_bad_byte_late_in_the_file_imports_nothing(self):
+        # Plus grand que le tampon de lecture : les premiers lots seraient déjà importés
+        lines = ['date,description,amount'] + [f'2026-01-{index % 28 + 1:02},Achat {index},-{index}' for index in range(1, 1500)]
+        content = '\n'.join(lines).encode() + b'\n2026-01-10,Caf\xe9,-3\n'
+
+        response = self.post_statement(content)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('utf-8', response.json()['error'])
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+        # Le même fichier dans son encodage
+        response = self.post_statement(content, encoding='latin-1')
+        self.assertEqual(response.json()['created'], 1500)
+
+    def test_command_checks_the_encoding_first(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as statement:
+            statement.write(b'date,description,amount\n2026-01-05,Boulangerie,-2\n2026-01-06,Caf\xe9,-3\n')
+            statement.flush()
+            with self.assertRaisesMessage(CommandError, 'not a valid utf-8-sig file'):
+                call_command('import_statement', statement.name, user=self.user.email, account=str(self.account.pk),
+                             chunk_size=1, stdout=StringIO())
+            self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+            call_command('import_statement', statement.name, user=self.user.email, account=self.account.name,
+                         encoding='latin-1', stdout=StringIO())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+
+class ExportTests(QueryBudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('export')
+        account = create_account(cls.user)
+        cls.food = create_category(cls.user, 'Courses')
+        salary = create_category(cls.user, 'Salaire', CategoryType.INCOME)
+        create_transaction(account, cls.food, '40', description='=HYPERLINK("http://x.test")')
+        create_transaction(account, salary, '2500', description='Salaire')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get('/api/transactions/export/', params, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_escapes_formulas(self):
+        with self.assertMaxQueries(TransactionViewSet.query_budgets['export']):
+            rows = list(csv.DictReader(StringIO(self.export())))
+
+        self.assertEqual(len(rows), 2)
+        expense = next(row for row in rows if row['category'] == 'Courses')
+        self.assertEqual(expense['description'], '\'=HYPERLINK("http://x.test")')
+        self.assertEqual(expense['amount'], '-40.00')
+
+    def test_ndjson_follows_the_list_filters(self):
+        lines = self.export(format='ndjson', category=self.food.pk).splitlines()
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['description'], '=HYPERLINK("http://x.test")')
+
+    def test_streamed_queries_count_against_the_budget(self):
+        with mock.patch.dict(TransactionViewSet.query_budgets, {'export': 0}):
+            with self.assertLogs('core.middleware', level='WARNING') as logs:
+                self.export()
+        self.assertIn('GET /api/transactions/export/ ran 1 queries', logs.output[0])
+
+
+class TransactionSearchTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='search@fintrack.com', username='search', password='x')
+        self.account = Account.objects.create(name='Courant', type=AccountType.CHECKING, user=self.user)
+        self.category = Category.objects.create(name='Sorties', type=CategoryType.EXPENSE, user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def create(self, description):
+        return Transaction.objects.create(
+            amount=Decimal('-5'), date=timezone.now(), description=description,
+            category=self.category, account=self.account, user=self.user,
+        )
+
+    def search(self, text):
+        with self.assertMaxQueries(4):
+            response = self.client.get('/api/transactions/', {'search': text}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return [row['description'] for row in response.json()['results']]
+
+    def test_prefix_terms_ignore_accents(self):
+        self.create('Café crème Opéra')
+        self.create('Cinéma')
+
+        self.assertEqual(self.search('cafe cre'), ['Café crème Opéra'])
+        self.assertEqual(self.search('CINE'), ['Cinéma'])
+        self.assertEqual(self.search('théâtre'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        transaction = self.create('Boulangerie')
+        self.create('Boucherie')
+        self.assertEqual(sorted(self.search('bou')), ['Boucherie', 'Boulangerie'])
+
+        transaction.description = 'Pâtisserie'
+        transaction.save()
+        Transaction.objects.filter(description='Boucherie').delete()
+
+        self.assertEqual(self.search('bou'), [])
+        self.assertEqual(self.search('patiss'), ['Pâtisserie'])
+
+
+class SuggestionTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        suggestions.clear()
+        self.user = User.objects.create_user(email='suggest@fintrack.com', username='suggest', password='x')
+        self.checking = Account.objects.create(name='Courant', type=AccountType.CHECKING, user=self.user)
+        self.card = Account.objects.create(name='Carte', type=AccountType.CHECKING, user=self.user)
+        self.groceries = Category.objects.create(name='Courses', type=CategoryType.EXPENSE, user=self.user)
+        self.leisure = Category.objects.create(name='Loisirs', type=CategoryType.EXPENSE, user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def create(self, description, category, account, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(
+                amount=Decimal('-10'), date=timezone.now() - timedelta(days=days_ago), description=description,
+                category=category, account=account, user=self.user,
+            )
+
+    def suggest(self, q, max_queries=3):
+        # Premier appel : chargement de l'index et du registre des catégories, ensuite rien
+        with self.assertMaxQueries(max_queries):
+            response = self.client.get('/api/transactions/suggest/', {'q': q}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['suggestions']
+
+    def test_ranks_by_frequency_and_recency_with_usual_category(self):
+        for days_ago in (1, 2, 3):
+            self.create('Carrefour Market', self.groceries, self.card, days_ago)
+        self.create('Carrefour Market', self.leisure, self.checking, 4)
+        self.create('Cinéma Carré', self.leisure, self.checking, 400)
+        self.create('Carrefour City', self.groceries, self.checking)
+
+        results = self.suggest('carr')
+
+        self.assertEqual([row['description'] for row in results], ['Carrefour Market', 'Carrefour City', 'Cinéma Carré'])
+        self.assertEqual(results[0]['count'], 4)
+        self.assertEqual((results[0]['category'], results[0]['account']), (self.groceries.pk, self.card.pk))
+        self.assertEqual([row['description'] for row in self.suggest('cine', max_queries=0)], ['Cinéma Carré'])
+
+    def test_index_follows_inserts_and_edits(self):
+        transaction = self.create('Boulangerie', self.groceries, self.card)
+        self.assertEqual(len(self.suggest('boul')), 1)
+
+        self.create('Boulangerie Paul', self.groceries, self.card)
+        self.assertEqual(len(self.suggest('boul')), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction.description = 'Pâtisserie'
+            transaction.save()
+        self.assertEqual([row['description'] for row in self.suggest('boul')], ['Boulangerie Paul'])
+        self.assertEqual([row['description'] for row in self.suggest('pat')], ['Pâtisserie'])
+
+
+class ForecastTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='forecast@fintrack.com', username='forecast', password='x')
+        self.account = Account.objects.create(
+            name='Courant', type=AccountType.CHECKING, balance=Decimal('500'), user=self.user
+        )
+        self.groceries = Category.objects.create(name='Courses', type=CategoryType.EXPENSE, user=self.user)
+        self.salary = Category.objects.create(name='Salaire', type=CategoryType.INCOME, user=self.user)
+        for day, amount in ((date(2025, 4, 10), '-200'), (date(2026, 1, 10), '-100'), (date(2026, 2, 10), '-100')):
+            Transaction.objects.create(
+                amount=Decimal(amount), date=rollups.start_of_day(day), description='Marché',
+                category=self.groceries, account=self.account, user=self.user,
+            )
+        # Échue le 1er mars mais pas encore créée : comptée dans le mois en cours
+        RecurringSchedule.objects.create(
+            user=self.user, account=self.account, category=self.salary, description='Salaire',
+            amount=Decimal('1000'), frequency=RecurrenceFrequency.MONTHLY, start_date=date(2026, 3, 1),
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_projects_schedules_and_seasonal_averages(self):
+        result = ForecastEngine(self.user, months=3, today=date(2026, 3, 15)).compute()
+
+        self.assertEqual(result['start_balance'], 100.0)
+        march, april, may = result['series']
+        self.assertEqual((march['recurring_income'], april['recurring_income'], may['recurring_income']), (1000.0, 1000.0, 1000.0))
+        # Historique d'avril 2025 à février 2026 : avril et mai vus une fois, mars jamais (moyenne des 11 mois,
+        # pour les 16 jours restants)
+        self.assertEqual(april['expenses'], 200.0)
+        self.assertEqual(may['expenses'], 0.0)
+        self.assertEqual(march['expenses'], round(400 / 11 * 16 / 31, 2))
+        self.assertEqual(april['balance'], round(march['balance'] + 800, 2))
+        self.assertEqual(result['end_balance'], may['balance'])
+        self.assertEqual(result['categories'][0]['name'], 'Courses')
+
+    def test_history_leaves_out_schedule_occurrences_only(self):
+        RecurringSchedule.objects.create(
+            user=self.user, account=self.account, category=self.salary, description='Prime',
+            amount=Decimal('300'), frequency=RecurrenceFrequency.YEARLY, start_date=date(2025, 4, 20),
+        )
+        recurring.run(until=date(2026, 3, 1))
+        # Marquée récurrente à la main, sans échéancier : rien ne la projette, elle reste dans les moyennes
+        Transaction.objects.create(
+            amount=Decimal('-110'), date=rollups.start_of_day(date(2025, 5, 10)), description='Assurance',
+            category=self.groceries, account=self.account, user=self.user, is_recurring=True,
+        )
+        result = ForecastEngine(self.user, months=3, today=date(2026, 3, 15)).compute()
+
+        march, april, may = result['series']
+        self.assertEqual(may['expenses'], 110.0)
+        # La prime d'avril 2025 est déjà dans l'historique : comptée une seule fois, par son échéancier
+        self.assertEqual(april['recurring_income'], 1300.0)
+        self.assertEqual(april['income'], 1300.0)
+
+    def test_endpoint_is_cached_per_data_version(self):
+        with self.assertMaxQueries(6):
+            response = self.client.get('/api/transactions/forecast/', {'months': 3}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['series']), 3)
+
+        response = self.client.get('/api/transactions/forecast/', {'months': 3}, SERVER_NAME='localhost')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        Transaction.objects.create(
+            amount=Decimal('-5'), date=timezone.now(), description='Marché',
+            category=self.groceries, account=self.account, user=self.user,
+        )
+        response = self.client.get('/api/transactions/forecast/', {'months': 3}, SERVER_NAME='localhost')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+
+class RecurringScheduleTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='recurring@fintrack.com', username='recurring', password='x')
+        self.account = Account.objects.create(
+            name='Courant', type=AccountType.CHECKING, balance=Decimal('1000'), user=self.user
+        )
+        self.rent = Category.objects.create(name='Loyer', type=CategoryType.EXPENSE, user=self.user)
+
+    def schedule(self, frequency, start_date, **kwargs):
+        return RecurringSchedule.objects.create(
+            user=self.user, account=self.account, category=self.rent, description='Loyer',
+            amount=Decimal('500'), frequency=frequency, start_date=start_date, **kwargs
+        )
+
+    def occurrences(self, schedule):
+        return list(schedule.transactions.order_by('occurrence').values_list('occurrence', flat=True))
+
+    def test_rules_keep_the_start_day(self):
+        monthly = self.schedule(RecurrenceFrequency.MONTHLY, date(2024, 1, 31))
+        yearly = self.schedule(RecurrenceFrequency.YEARLY, date(2020, 2, 29))
+        weekly = self.schedule(RecurrenceFrequency.WEEKLY, date(2024, 1, 1), interval=2, end_date=date(2024, 2, 1))
+
+        recurring.run(until=date(2024, 4, 30))
+
+        self.assertEqual(self.occurrences(monthly), [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        self.assertEqual(self.occurrences(yearly), [date(2020, 2, 29), date(2021, 2, 28), date(2022, 2, 28), date(2023, 2, 28), date(2024, 2, 29)])
+        self.assertEqual(self.occurrences(weekly), [date(2024, 1, 1), date(2024, 1, 15), date(2024, 1, 29)])
+        weekly.refresh_from_db()
+        self.assertIsNone(weekly.next_date)
+
+    def test_run_is_idempotent_and_updates_the_ledger(self):
+        schedule = self.schedule(RecurrenceFrequency.MONTHLY, date(2024, 1, 5))
+
+        self.assertEqual(recurring.run(until=date(2024, 3, 31)), (3, 1))
+        self.assertEqual(recurring.run(until=date(2024, 3, 31)), (0, 0))
+        # Échéancier rembobiné : les occurrences existantes ne sont pas recréées
+        RecurringSchedule.objects.filter(pk=schedule.pk).update(next_date=date(2024, 1, 5))
+        self.assertEqual(recurring.run(until=date(2024, 4, 30)), (1, 1))
+
+        self.assertEqual(schedule.transactions.count(), 4)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('-1000'))
+        self.assertEqual(
+            rollups.totals_by_month(self.user, since=date(2024, 1, 1))[(date(2024, 2, 1), CategoryType.EXPENSE)][0],
+            Decimal('-500')
+        )
+
+    def test_users_of_a_chunk_share_their_queries(self):
+        accounts = []
+        for index in range(5):
+            user = User.objects.create_user(email=f'chunk{index}@fintrack.com', username=f'chunk{index}', password='x')
+            account = Account.objects.create(name='Courant', type=AccountType.CHECKING, balance=Decimal('0'), user=user)
+            category = Category.objects.create(name='Loyer', type=CategoryType.EXPENSE, user=user)
+            RecurringSchedule.objects.create(
+                user=user, account=account, category=category, description='Loyer',
+                amount=Decimal('100'), frequency=RecurrenceFrequency.MONTHLY, start_date=date(2024, 1, 1),
+            )
+            accounts.append(account)
+
+        # Le nombre de requêtes ne dépend pas du nombre d'utilisateurs du lot
+        with self.assertMaxQueries(25):
+            self.assertEqual(recurring.run(until=date(2024, 6, 30)), (30, 5))
+
+        for account in accounts:
+            account.refresh_from_db()
+            self.assertEqual(account.balance, Decimal('-600'))
+            statistics = UserStatistics.objects.get(pk=account.user_id)
+            self.assertEqual(statistics.transaction_count, 6)
+            self.assertEqual(statistics.balance_total, Decimal('-600'))
+
+    def test_api_creates_and_edits_schedules(self):
+        self.client.force_authenticate(self.user)
+        other = create_user('recurring-other')
+        body = {
+            'description': 'Loyer', 'amount': '500', 'category_id': self.rent.pk, 'account_id': self.account.pk,
+            'frequency': 'MONTHLY', 'start_date': '2024-01-05',
+        }
+
+        response = self.client.post('/api/recurring-schedules/', body, format='json', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['next_date'], response.data['category']['name']), ('2024-01-05', 'Loyer'))
+        pk = response.data['id']
+        self.assertEqual(recurring.run(until=date(2024, 2, 29)), (2, 1))
+
+        for invalid in ({'account_id': create_account(other).pk}, {'category_id': create_category(other, 'Loyer').pk},
+                        {'interval': 0}, {'end_date': '2023-12-31'}):
+            response = self.client.post('/api/recurring-schedules/', {**body, **invalid}, format='json', SERVER_NAME='localhost')
+            self.assertEqual(response.status_code, 400, invalid)
+        # La règle est fixée à la création, le reste se modifie
+        response = self.client.patch(f'/api/recurring-schedules/{pk}/', {'frequency': 'WEEKLY'}, format='json', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/recurring-schedules/{pk}/', {'amount': '550'}, format='json', SERVER_NAME='localhost')
+        self.assertEqual(response.data['amount'], '550.00')
+
+        with self.assertMaxQueries(RecurringScheduleViewSet.query_budgets['list']):
+            response = self.client.get('/api/recurring-schedules/', SERVER_NAME='localhost')
+        self.assertEqual([row['id'] for row in response.data['results']], [pk])
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/recurring-schedules/{pk}/', SERVER_NAME='localhost').status_code, 404)
+
+    def test_extending_a_finished_schedule_resumes_it(self):
+        self.client.force_authenticate(self.user)
+        schedule = self.schedule(RecurrenceFrequency.MONTHLY, date(2024, 1, 5), end_date=date(2024, 2, 5))
+        recurring.run(until=date(2024, 6, 30))
+        schedule.refresh_from_db()
+        self.assertIsNone(schedule.next_date)
+
+        response = self.client.patch(f'/api/recurring-schedules/{schedule.pk}/', {'end_date': '2024-04-30'},
+                                     format='json', SERVER_NAME='localhost')
+        self.assertEqual(response.data['next_date'], '2024-03-05')
+        recurring.run(until=date(2024, 6, 30))
+        self.assertEqual(self.occurrences(schedule), [date(2024, 1, 5), date(2024, 2, 5), date(2024, 3, 5), date(2024, 4, 5)])
+
+    def test_migration_turns_recurring_transactions_into_schedules(self):
+        migration = importlib.import_module('transactions.migrations.0013_schedules_from_recurring_transactions')
+        today = timezone.localdate()
+
+        def legacy(day, frequency='monthly', amount='500', description='Loyer'):
+            transaction = create_transaction(self.account, self.rent, amount, rollups.start_of_day(day), description)
+            Transaction.objects.filter(pk=transaction.pk).update(is_recurring=True, metadata={'frequency': frequency})
+
+        this_month = today.replace(day=1)
+        for months in (-2, -1, 0):
+            legacy(rollups.shift_month(this_month, months))
+        legacy(date(2020, 3, 1), 'weekly', '9', 'Journal')
+        legacy(date(2020, 3, 8), 'weekly', '9', 'Journal')
+        legacy(date(2020, 3, 9), 'sometimes', '9', 'Autre')
+
+        migration.create_schedules(django_apps, None)
+
+        rent = RecurringSchedule.objects.get(description='Loyer')
+        self.assertEqual((rent.frequency, rent.amount, rent.start_date, rent.is_active),
+                         ('MONTHLY', Decimal('500.00'), rollups.shift_month(this_month, -2), True))
+        self.assertEqual(rent.next_date, rollups.shift_month(this_month, 1))
+        self.assertEqual(rent.transactions.count(), 3)
+        # Série arrêtée depuis longtemps : pas de rattrapage
+        newspaper = RecurringSchedule.objects.get(description='Journal')
+        self.assertEqual((newspaper.next_date, newspaper.is_active), (date(2020, 3, 15), False))
+        self.assertFalse(RecurringSchedule.objects.filter(description='Autre').exists())
+        self.assertEqual(recurring.run(until=rent.next_date - timedelta(days=1)), (0, 0))
@@ -1,11 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, BudgetViewSet
+from .views import TransactionViewSet, BudgetViewSet, RecurringScheduleViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'budgets', BudgetViewSet, basename='budget')
+router.register(r'recurring-schedules', RecurringScheduleViewSet, basename='recurring-schedule')
 
 urlpatterns = [
+    # Variantes async (requêtes indépendantes en parallèle, voir core/aio.py)
+    path('async/transactions/dashboard_stats/', async_views.dashboard_stats, name='async-dashboard-stats'),
+    path('async/transactions/analytics/', async_views.analytics, name='async-analytics'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
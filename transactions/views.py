@@ -1,15 +1,29 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Sum, Count, Avg, Max, Min
-from django.db.models.functions import TruncMonth, TruncDate
-from datetime import datetime, timedelta
-from calendar import monthrange
+from rest_framework.filters import OrderingFilter
+from django.conf import settings
 import django_filters
-from .models import Transaction, Budget
-from .serializers import TransactionSerializer, BudgetSerializer
+import io
+from core.cache import cached_response
+from core.conditional import ConditionalRequestMixin
+from core.search import FullTextSearchFilter
+from .models import Transaction, Budget, BudgetAlertEvent, RecurringSchedule
+from .serializers import (
+    TransactionSerializer, BudgetSerializer, BudgetAlertEventSerializer, RecurringScheduleSerializer,
+    StatementImportSerializer,
+)
+from .pagination import TransactionKeysetPagination
+from .analytics import AnalyticsEngine
+from .budgets import BudgetEngine
+from .dashboard import DashboardEngine
+from .forecast import ForecastEngine
+from .bulk import create_transactions
+from .importers import ImportFormatError, StatementImporter, check_encoding, parse_statement
+from .exports import CSVExportRenderer, NDJSONExportRenderer, export_response
+from .suggestions import suggestions
 
 
 class TransactionFilter(django_filters.FilterSet):
@@ -21,17 +35,38 @@ class TransactionFilter(django_filters.FilterSet):
             'date': ['gte', 'lte', 'year', 'month'],
             'amount': ['gte', 'lte'],
             'is_recurring': ['exact'],
+            'category_type': ['exact'],
+            'local_date': ['exact', 'gte', 'lte'],
+            'month': ['exact'],
         }
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_class = TransactionFilter
     search_fields = ['description']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-date', '-created_at']
+    # Budgets de requêtes SQL par action (core/querybudget.py), authentification JWT incluse.
+    # L'import fait quelques requêtes par lot de lignes : pas de budget fixe. Une écriture paie un nombre
+    # constant de requêtes : verrou et ledger, une ligne de rollup (insérée la première fois du mois),
+    # la progression de ses budgets, une ligne de statistiques et l'instantané du jour au commit
+    query_budgets = {'list': 4, 'retrieve': 3, 'dashboard_stats': 7, 'analytics': 4, 'bulk': 30,
+                     'export': 3, 'import_statement': None, 'suggest': 3, 'forecast': 6,
+                     'create': 17, 'update': 14, 'partial_update': 14, 'destroy': 11}
+    
+    @property
+    def paginator(self):
+        # Pagination par curseur sur demande (?pagination=cursor ou ?cursor=...)
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = TransactionKeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
     
     def get_queryset(self):
         # Debug: afficher les paramètres reçus
@@ -39,340 +74,182 @@ class TransactionViewSet(viewsets.ModelViewSet):
         print(f"🔍 date_gte param: {self.request.GET.get('date_gte')}")
         print(f"🔍 date_lte param: {self.request.GET.get('date_lte')}")
         
-        return Transaction.objects.filter(user=self.request.user)
+        return Transaction.objects.filter(user=self.request.user).select_related('category', 'account')
     
     @action(detail=False, methods=['get'])
+    @cached_response('dashboard_stats')
     def dashboard_stats(self, request):
-        from core.models import Asset, Account
-        
-        user = request.user
-        now = datetime.now()
-        
-        # Calcul sur les 30 derniers jours (au lieu du mois courant)
-        thirty_days_ago = now - timedelta(days=30)
-        sixty_days_ago = now - timedelta(days=60)
-        
-        queryset = Transaction.objects.filter(user=user)
-        
-        # Stats des 30 derniers jours
-        current_month_transactions = queryset.filter(date__gte=thirty_days_ago.date())
-        previous_month_transactions = queryset.filter(
-            date__gte=sixty_days_ago.date(), 
-            date__lt=thirty_days_ago.date()
-        )
-        
-        current_income = current_month_transactions.filter(category__type='INCOME').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        current_expenses = current_month_transactions.filter(category__type='EXPENSE').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        previous_income = previous_month_transactions.filter(category__type='INCOME').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        previous_expenses = previous_month_transactions.filter(category__type='EXPENSE').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Calcul des variations
-        income_change = ((current_income - previous_income) / previous_income * 100) if previous_income > 0 else 0
-        expenses_change = ((abs(current_expenses) - abs(previous_expenses)) / abs(previous_expenses) * 100) if previous_expenses != 0 else 0
-        
-        # Patrimoine total (assets + comptes)
-        total_assets = Asset.objects.filter(user=user, is_active=True).aggregate(
-            total=Sum('current_value')
-        )['total'] or 0
-        
-        total_accounts = Account.objects.filter(user=user, is_active=True).aggregate(
-            total=Sum('balance')
-        )['total'] or 0
-        
-        total_wealth = total_assets + total_accounts
-        
-        # Épargne ce mois (revenus - dépenses)
-        current_savings = current_income + current_expenses  # expenses are negative
-        previous_savings = previous_income + previous_expenses
-        savings_change = ((current_savings - previous_savings) / abs(previous_savings) * 100) if previous_savings != 0 else 0
-        
-        # Évolution du patrimoine sur 6 mois
-        six_months_ago = now - timedelta(days=180)
-        wealth_evolution = []
+        """Returns the current month figures, the wealth evolution and its composition"""
+        try:
+            wealth_months = int(request.query_params.get('wealth_months', 6))
+        except ValueError:
+            return Response({'wealth_months': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        for i in range(6):
-            month_date = now - timedelta(days=i*30)
-            month_start = month_date.replace(day=1)
-            
-            # Simuler l'évolution du patrimoine (on pourrait stocker l'historique dans le futur)
-            base_wealth = float(total_wealth)
-            variation = (i * 0.02 + (i % 2) * 0.01) * base_wealth  # Simulation d'une croissance
-            month_wealth = base_wealth - variation
-            
-            wealth_evolution.append({
-                'month': month_start.strftime('%b'),
-                'wealth': round(month_wealth, 2)
-            })
-        
-        wealth_evolution.reverse()
-        
-        # Composition du patrimoine
-        assets = Asset.objects.filter(user=user, is_active=True)
-        composition = []
-        
-        # Grouper par type d'asset
-        asset_composition = {}
-        for asset in assets:
-            asset_type = asset.get_asset_type_display()
-            if asset_type not in asset_composition:
-                asset_composition[asset_type] = 0
-            asset_composition[asset_type] += float(asset.current_value)
-        
-        # Ajouter les comptes comme "Liquidités"
-        if total_accounts > 0:
-            asset_composition['Liquidités'] = float(total_accounts)
-        
-        # Convertir en format pour le frontend
-        for name, value in asset_composition.items():
-            composition.append({
-                'name': name,
-                'size': value,
-                'index': len(composition)
-            })
-        
-        return Response({
-            'current_month': {
-                'total_wealth': float(total_wealth),
-                'wealth_change': 4.8,  # Simulation - à remplacer par un calcul réel
-                'income': float(current_income),
-                'income_change': float(income_change),
-                'expenses': float(abs(current_expenses)),
-                'expenses_change': float(expenses_change),
-                'savings': float(current_savings),
-                'savings_change': float(savings_change),
-                'transactions_count': current_month_transactions.count()
-            },
-            'wealth_evolution': wealth_evolution,
-            'wealth_composition': composition
-        })
+        return Response(DashboardEngine(request.user, wealth_months=wealth_months).compute())
     
     @action(detail=False, methods=['get'])
+    @cached_response('analytics')
     def analytics(self, request):
         """Returns comprehensive analytics data for charts and insights"""
-        user = request.user
-        now = datetime.now()
-        
         # Get period parameter (default to 6 months)
-        period_months = int(request.query_params.get('months', 6))
-        start_date = now - timedelta(days=period_months * 30)
-        
-        queryset = Transaction.objects.filter(user=user, date__gte=start_date)
-        
-        # 1. Monthly income vs expenses
-        monthly_data = []
-        for i in range(period_months):
-            month_start = datetime(now.year, now.month, 1) - timedelta(days=i*30)
-            month_start = month_start.replace(day=1)
-            month_end = datetime(month_start.year, month_start.month, monthrange(month_start.year, month_start.month)[1])
-            
-            month_transactions = queryset.filter(date__gte=month_start, date__lte=month_end)
-            
-            income = month_transactions.filter(category__type='INCOME').aggregate(total=Sum('amount'))['total'] or 0
-            expenses = month_transactions.filter(category__type='EXPENSE').aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_data.append({
-                'month': month_start.strftime('%b'),
-                'income': float(income),
-                'expenses': float(abs(expenses))
-            })
+        try:
+            period_months = int(request.query_params.get('months', 6))
+        except ValueError:
+            return Response({'months': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        monthly_data.reverse()  # Chronological order
-        
-        # 2. Category trends
-        category_trends = []
-        categories = queryset.filter(category__type='EXPENSE').values('category__name').distinct()
-        
-        for category in categories:
-            category_name = category['category__name']
-            monthly_amounts = []
-            
-            for i in range(period_months):
-                month_start = datetime(now.year, now.month, 1) - timedelta(days=i*30)
-                month_start = month_start.replace(day=1)
-                month_end = datetime(month_start.year, month_start.month, monthrange(month_start.year, month_start.month)[1])
-                
-                amount = queryset.filter(
-                    category__name=category_name,
-                    date__gte=month_start,
-                    date__lte=month_end
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                monthly_amounts.append({
-                    'month': month_start.strftime('%b'),
-                    'amount': float(abs(amount))
-                })
-            
-            monthly_amounts.reverse()
-            category_trends.append({
-                'category': category_name,
-                'data': monthly_amounts
+        engine = AnalyticsEngine(request.user, months=period_months)
+        return Response(engine.compute())
+    
+    @action(detail=False, methods=['get'])
+    @cached_response('forecast')
+    def forecast(self, request):
+        """Returns the projected balance of the coming months (recurring schedules and seasonal averages)"""
+        try:
+            months = int(request.query_params.get('months', 6))
+        except ValueError:
+            return Response({'months': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(ForecastEngine(request.user, months=months).compute())
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Creates many transactions at once; all or nothing."""
+        rows = request.data.get('transactions') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'Expected a non-empty list of transactions'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_rows = settings.BULK_TRANSACTIONS_MAX_ROWS
+        if len(rows) > max_rows:
+            return Response(
+                {'error': f'At most {max_rows} transactions per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        created, errors = create_transactions(request.user, rows)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'created': len(created), 'ids': [transaction.pk for transaction in created]},
+            status=status.HTTP_201_CREATED
+        )
+
+    
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Returns the user's past descriptions matching ?q= (prefix of any word), with their usual category and account"""
+        from core.registry import registry
+        
+        try:
+            limit = min(int(request.query_params.get('limit', settings.SUGGESTIONS_DEFAULT_LIMIT)), settings.SUGGESTIONS_MAX_LIMIT)
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = []
+        for entry in suggestions.suggest(request.user.pk, request.query_params.get('q', ''), max(limit, 1)):
+            category_id, account_id = entry.usual()
+            category = registry.get(category_id, request.user.pk)
+            results.append({
+                'description': entry.description,
+                'category': category_id,
+                'category_name': category.name if category else None,
+                'account': account_id,
+                'count': entry.count,
+                'last_used': entry.last_used
             })
+        return Response({'suggestions': results})
+    
+    @action(detail=False, methods=['get'], renderer_classes=[CSVExportRenderer, NDJSONExportRenderer])
+    def export(self, request):
+        """Streams every transaction matching the list filters as CSV (default) or NDJSON."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, request.accepted_renderer.format)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_statement(self, request):
+        """Imports a CSV, OFX or QIF bank statement into one of the user's accounts."""
+        serializer = StatementImportSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        from core.models import Account
+        account = Account.objects.get(id=params['account_id'], user=request.user)
+        columns = {
+            field: params[f'{field}_column']
+            for field in ('date', 'amount', 'description', 'category')
+            if params.get(f'{field}_column')
+        }
+        importer = StatementImporter(
+            request.user, account,
+            income_category=params.get('income_category'),
+            expense_category=params.get('expense_category'),
+        )
         
-        # 3. Financial insights
-        total_income = queryset.filter(category__type='INCOME').aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses = queryset.filter(category__type='EXPENSE').aggregate(total=Sum('amount'))['total'] or 0
-        
-        savings = total_income + total_expenses  # expenses are negative
-        avg_monthly_savings = savings / period_months if period_months > 0 else 0
-        savings_rate = (savings / total_income * 100) if total_income > 0 else 0
-        
-        # Biggest expense
-        biggest_expense = queryset.filter(category__type='EXPENSE').order_by('amount').first()
-        biggest_expense_data = None
-        if biggest_expense:
-            biggest_expense_data = {
-                'amount': float(abs(biggest_expense.amount)),
-                'description': biggest_expense.description,
-                'category': biggest_expense.category.name,
-                'date': biggest_expense.date.strftime('%Y-%m-%d')
-            }
-        
-        return Response({
-            'monthly_data': monthly_data,
-            'category_trends': category_trends,
-            'insights': {
-                'avg_monthly_savings': float(avg_monthly_savings),
-                'savings_rate': float(savings_rate),
-                'biggest_expense': biggest_expense_data,
-                'total_income': float(total_income),
-                'total_expenses': float(abs(total_expenses)),
-                'period_months': period_months
-            }
-        })
+        # Encodage vérifié sur tout le fichier : les lots sont validés au fil de l'import
+        try:
+            check_encoding(params['file'].file, params['encoding'])
+        except ImportFormatError as e:
+            return Response({'error': f'Cannot read the statement: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        # Lecture ligne à ligne du fichier uploadé (écrit sur disque au-delà de FILE_UPLOAD_MAX_MEMORY_SIZE)
+        statement = io.TextIOWrapper(params['file'].file, encoding=params['encoding'], newline='')
+        try:
+            rows = parse_statement(
+                statement, params['file_format'], columns=columns,
+                delimiter=params.get('delimiter'), date_format=params.get('date_format'),
+            )
+            result = importer.run(rows)
+        except ImportFormatError as e:
+            return Response({'error': f'Cannot read the statement: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            statement.detach()
+        
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['category', 'period', 'is_active']
     ordering_fields = ['monthly_limit', 'created_at']
     ordering = ['category__name']
+    query_budgets = {'list': 4, 'retrieve': 3, 'alerts': 4, 'overview': 4, 'alert_events': 3}
     
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        return Budget.objects.filter(user=self.request.user).select_related('category')
     
     @action(detail=False, methods=['get'])
+    @cached_response('alerts')
     def alerts(self, request):
-        user = request.user
-        now = datetime.now()
-        current_month_start = now.replace(day=1)
-        
-        budgets = self.get_queryset().filter(is_active=True)
-        alerts = []
-        
-        for budget in budgets:
-            spent = Transaction.objects.filter(
-                user=user,
-                category=budget.category,
-                date__gte=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            spent_abs = abs(spent)
-            limit = budget.monthly_limit
-            percentage = (spent_abs / limit * 100) if limit > 0 else 0
-            
-            if percentage >= 80:
-                alerts.append({
-                    'budget_id': budget.id,
-                    'category': budget.category.name,
-                    'spent': spent_abs,
-                    'limit': limit,
-                    'percentage': round(percentage, 1),
-                    'status': 'exceeded' if percentage > 100 else 'warning'
-                })
-        
-        return Response({'alerts': alerts})
+        """Returns the budgets above 80% of their monthly or yearly limit"""
+        return Response({'alerts': BudgetEngine(request.user).alerts()})
+    
+    @action(detail=False, methods=['get'])
+    def alert_events(self, request):
+        """Returns the latest threshold crossings of the user's budgets"""
+        events = (
+            BudgetAlertEvent.objects.filter(user=request.user)
+            .select_related('budget__category')[:settings.BUDGET_ALERT_EVENTS_LIMIT]
+        )
+        return Response({'events': BudgetAlertEventSerializer(events, many=True).data})
     
     @action(detail=False, methods=['get'])
+    @cached_response('overview')
     def overview(self, request):
         """Returns budget overview with spending analysis"""
-        user = request.user
-        now = datetime.now()
-        current_month_start = now.replace(day=1)
-        
-        budgets = self.get_queryset().filter(is_active=True)
-        budget_overview = []
-        
-        total_allocated = 0
-        total_spent = 0
-        over_budget_count = 0
-        
-        for budget in budgets:
-            # Calculer les dépenses du mois courant pour cette catégorie
-            spent = Transaction.objects.filter(
-                user=user,
-                category=budget.category,
-                date__gte=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            spent_abs = abs(spent)
-            limit = budget.monthly_limit
-            percentage = (spent_abs / limit * 100) if limit > 0 else 0
-            remaining = limit - spent_abs
-            
-            # Status
-            if percentage > 100:
-                status = 'exceeded'
-                over_budget_count += 1
-            elif percentage > 80:
-                status = 'warning'
-            else:
-                status = 'good'
-            
-            budget_overview.append({
-                'id': budget.id,
-                'category': {
-                    'id': budget.category.id,
-                    'name': budget.category.name,
-                    'color': budget.category.color,
-                    'icon': budget.category.icon
-                },
-                'allocated': float(limit),
-                'spent': spent_abs,
-                'remaining': float(remaining),
-                'percentage': round(percentage, 1),
-                'status': status,
-                'days_left': (datetime(now.year, now.month + 1, 1) - now).days if now.month < 12 else (datetime(now.year + 1, 1, 1) - now).days
-            })
-            
-            total_allocated += limit
-            total_spent += spent_abs
-        
-        # Stats globales
-        total_remaining = total_allocated - total_spent
-        overall_percentage = (total_spent / total_allocated * 100) if total_allocated > 0 else 0
-        
-        # Données pour le graphique des dépenses
-        expense_data = []
-        for budget_item in budget_overview:
-            if budget_item['spent'] > 0:
-                expense_data.append({
-                    'name': budget_item['category']['name'],
-                    'value': budget_item['spent'],
-                    'color': budget_item['category']['color']
-                })
-        
-        return Response({
-            'summary': {
-                'total_allocated': float(total_allocated),
-                'total_spent': float(total_spent),
-                'total_remaining': float(total_remaining),
-                'overall_percentage': round(overall_percentage, 1),
-                'over_budget_count': over_budget_count,
-                'budget_count': budgets.count()
-            },
-            'budgets': budget_overview,
-            'expense_chart_data': expense_data
-        })
+        return Response(BudgetEngine(request.user).overview())
+
+
+class RecurringScheduleViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
+    """Recurring transactions; `run_recurring` creates their due occurrences."""
+    serializer_class = RecurringScheduleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['account', 'category', 'frequency', 'is_active']
+    ordering_fields = ['next_date', 'amount', 'created_at']
+    ordering = ['next_date', 'id']
+    query_budgets = {'list': 4, 'retrieve': 3}
+    
+    def get_queryset(self):
+        return RecurringSchedule.objects.filter(user=self.request.user).select_related('category', 'account')